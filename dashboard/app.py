@@ -8,16 +8,16 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.append(project_root)
 
-from stable_baselines3 import PPO
-from rl_agent.er_env import EREnv
+from rl_agent.model_registry import DEFAULT_AGENT_PATH, load_policy
 import streamlit as st
-import plotly.express as px
-import pandas as pd
 import numpy as np
-from scripts.simulation_backend import run_er_simulation
-
-# Path to plots
-plots_dir = os.path.join(current_dir, "..", "plots")
+from scripts.simulation_backend import ENGINES
+from scripts.job_service import JobService
+from scripts.replications import DEFAULT_CONFIG, stack_results
+from scripts.result_store import ResultStore
+from scripts.staffing_grid import DEFAULT_GRID_PATH, StaffingGrid
+from scripts.eda_tables import (DAY_ORDER, TIME_OF_DAY_ORDER, URGENCY_ORDER, load_tables as load_eda_tables,
+                                mean_wait, ordered, wait_histogram)
 
 # -------------------------------
 # Dashboard Title
@@ -39,12 +39,9 @@ if use_rl:
         "🔮 A pre-trained PPO agent dynamically suggests the optimal number of doctors and nurses "
         "to minimize patient wait times and maximize resource utilization."
     )
-    agent_path = os.path.join(os.path.dirname(__file__), "..", "rl_agent", "trained_agent.zip")
-    agent = PPO.load(agent_path)
-
-    env = EREnv()
-    obs, _ = env.reset()
-    action, _ = agent.predict(obs)
+    # Loaded once per process and re-read only when the checkpoint changes
+    agent = load_policy(DEFAULT_AGENT_PATH)
+    action = agent.predict(agent.reset_observation, deterministic=True)
     num_doctors, num_nurses = action + 1  # add 1 to avoid 0 doctors/nurses
     st.sidebar.success(f"👨‍⚕️ RL Recommended Doctors: {num_doctors}")
     st.sidebar.success(f"👩‍⚕️ RL Recommended Nurses: {num_nurses}")
@@ -55,31 +52,91 @@ else:
 
 arrival_rate = st.sidebar.slider("Patient Arrival Rate (patients per hour)", 1, 60, 10, key="arrival_rate_slider")
 sim_duration = st.sidebar.slider("Simulation Duration (minutes)", 60, 480, 240, key="sim_duration_slider")
+engine = st.sidebar.selectbox(
+    "Simulation Engine", ENGINES, index=0, key="engine_select",
+    help="'simpy' runs the discrete-event model; 'kernel' runs the same model on a lighter event loop; "
+         "'numpy' computes the same queue in batch and is much faster."
+)
 
-# -------------------------------
-# Run Simulation Button
-# -------------------------------
-if st.sidebar.button("Run Simulation", key="run_simulation_button"):
-    with st.spinner("Running multiple simulations, please wait..."):
+n_runs = st.sidebar.slider("Replications", 10, 100, 10, step=10, key="n_runs_slider")
+use_grid = st.sidebar.checkbox(
+    "Use precomputed staffing grid when available", value=True, key="use_grid_checkbox",
+    help="Serves metrics instantly from scripts/staffing_grid.py results when the grid was simulated with the "
+         "selected engine on the current model and data; anything else is simulated live."
+)
+reuse_runs = st.sidebar.checkbox(
+    "Reuse stored simulation runs", value=True, key="reuse_runs_checkbox",
+    help="Shows earlier runs of the same configuration from the result store (data/result_store) instead of "
+         "simulating again; uncheck to draw fresh replications."
+)
+
+
+@st.cache_resource
+def load_staffing_grid(mtime):
+    # mtime is part of the cache key so a re-run sweep is picked up
+    return StaffingGrid(DEFAULT_GRID_PATH)
+
+
+@st.cache_resource
+def get_result_store():
+    return ResultStore()
+
+
+@st.cache_resource
+def get_job_service():
+    # One service per server process: identical requests from different
+    # sessions share a job, and simulations run off the script thread.
+    # Every replication is kept in the result store for later reuse.
+    return JobService(store=get_result_store())
+
+
+def format_ci(ci95, metric):
+    half_width = ci95[metric]
+    return f"95% CI ± {half_width:.2f}" if np.isfinite(half_width) else "95% CI: needs at least 2 runs"
+
+
+def render_eda(key=""):
+    # Charts are drawn from small cached aggregate tables, never row-level data
+    import plotly.express as px
+
+    tables = load_eda_tables()
+    col1, col2 = st.columns(2)
+    labels, counts = ordered(tables['visits_by_hour'], TIME_OF_DAY_ORDER)
+    col1.plotly_chart(px.bar(x=labels, y=counts, labels={'x': 'Time of Day', 'y': 'Number of Visits'},
+                             title="Patient Visits by Time of Day", template="plotly_white"),
+                      use_container_width=True, key=f"eda_hour{key}")
+    labels, counts = ordered(tables['visits_by_day'], DAY_ORDER)
+    col2.plotly_chart(px.bar(x=labels, y=counts, labels={'x': 'Day of Week', 'y': 'Number of Visits'},
+                             title="Patient Visits by Day of Week", template="plotly_white"),
+                      use_container_width=True, key=f"eda_day{key}")
+
+    col3, col4 = st.columns(2)
+    labels, means = mean_wait(tables, 'wait_by_hospital')
+    col3.plotly_chart(px.bar(x=labels, y=means, labels={'x': 'Hospital', 'y': 'Average Wait Time (minutes)'},
+                             title="Average Wait Time by Hospital", template="plotly_white"),
+                      use_container_width=True, key=f"eda_hospital{key}")
+    labels, means = mean_wait(tables, 'wait_by_urgency', URGENCY_ORDER)
+    col4.plotly_chart(px.bar(x=labels, y=means, labels={'x': 'Urgency Level', 'y': 'Average Wait Time (minutes)'},
+                             title="Average Wait Time by Urgency Level", template="plotly_white"),
+                      use_container_width=True, key=f"eda_urgency{key}")
 
-        N_RUNS = 10
-        all_results = []
+    edges, counts = wait_histogram(tables, bins=30)
+    st.plotly_chart(px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                           labels={'x': 'Total Wait Time (minutes)', 'y': 'Frequency'},
+                           title="Distribution of Total Wait Time (min)", template="plotly_white"),
+                    use_container_width=True, key=f"eda_wait{key}")
 
-        for _ in range(N_RUNS):
-            result = run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time=sim_duration)
-            all_results.append(result)
+    columns = tables['correlation']['columns']
+    st.plotly_chart(px.imshow(np.array(tables['correlation']['matrix'], dtype=float), x=columns, y=columns,
+                              color_continuous_scale='RdBu_r', zmin=-1, zmax=1, text_auto='.2f',
+                              title="Correlation Heatmap of Key Variables"),
+                    use_container_width=True, key=f"eda_corr{key}")
 
-        # Average key metrics
-        avg_wait = np.mean([r['Average Wait Time (min)'] for r in all_results])
-        patients_treated = np.mean([r['Total Patients Treated'] for r in all_results])
-        doctor_utilization = np.mean([r['Doctor Utilization (%)'] for r in all_results])
-        nurse_utilization = np.mean([r['Nurse Utilization (%)'] for r in all_results])
 
-        # Pick wait times and queue lengths from the first run (for plotting)
-        first_run = all_results[0]
-        wait_times = first_run['All Wait Times']
-        time_points = first_run['Time Points']
-        queue_lengths = first_run['Queue Lengths']
+def render_results(means, ci95, wait_times, time_points, queue_lengths, grid_result=None, n_done=n_runs, key=""):
+    # Plotting libraries are only imported once there is something to plot
+    import plotly.express as px
+    import pandas as pd
 
     # Divider
     st.markdown("---")
@@ -89,14 +146,23 @@ if st.sidebar.button("Run Simulation", key="run_simulation_button"):
     # -------------------------------
     st.subheader("Simulation Results (Key Metrics)")
     col1, col2 = st.columns(2)
-    col1.metric("Average Wait Time (min)", f"{avg_wait:.2f}")
-    col2.metric("Patients Treated", f"{patients_treated:.0f}")
+    col1.metric("Average Wait Time (min)", f"{means['Average Wait Time (min)']:.2f}")
+    col1.caption(format_ci(ci95, 'Average Wait Time (min)'))
+    col2.metric("Patients Treated", f"{means['Total Patients Treated']:.0f}")
+    col2.caption(format_ci(ci95, 'Total Patients Treated'))
 
     col3, col4 = st.columns(2)
-    col3.metric("Doctor Utilization (%)", f"{doctor_utilization:.2f}")
-    col4.metric("Nurse Utilization (%)", f"{nurse_utilization:.2f}")
+    col3.metric("Doctor Utilization (%)", f"{means['Doctor Utilization (%)']:.2f}")
+    col3.caption(format_ci(ci95, 'Doctor Utilization (%)'))
+    col4.metric("Nurse Utilization (%)", f"{means['Nurse Utilization (%)']:.2f}")
+    col4.caption(format_ci(ci95, 'Nurse Utilization (%)'))
 
-    st.info("🧠 Metrics shown are averaged over multiple simulation runs to ensure stability and smoothness.")
+    if grid_result is not None:
+        how = "interpolated from" if grid_result['interpolated'] else "looked up in"
+        st.info(f"⚡ Metrics {how} the precomputed staffing grid ({grid_result['engine']} engine, "
+                f"at least {n_runs} runs per cell).")
+    else:
+        st.info(f"🧠 Metrics shown are averaged over {n_done} simulation runs to ensure stability and smoothness.")
 
     # Divider
     st.markdown("---")
@@ -110,10 +176,19 @@ if st.sidebar.button("Run Simulation", key="run_simulation_button"):
             pd.DataFrame({'Wait Time (min)': wait_times}),
             x="Wait Time (min)",
             nbins=20,
-            title="Histogram of Patient Wait Times",
+            title="Histogram of Patient Wait Times (all runs)",
+            template="plotly_white"
+        )
+        st.plotly_chart(fig_hist, use_container_width=True, key=f"wait_hist{key}")
+    elif grid_result is not None:
+        fig_hist = px.histogram(
+            pd.DataFrame({'Average Wait Time (min)': grid_result['samples']['Average Wait Time (min)']}),
+            x="Average Wait Time (min)",
+            nbins=20,
+            title="Histogram of Per-Run Average Wait Times (nearest grid cell)",
             template="plotly_white"
         )
-        st.plotly_chart(fig_hist, use_container_width=True)
+        st.plotly_chart(fig_hist, use_container_width=True, key=f"wait_hist{key}")
     else:
         st.write("No wait time data available.")
 
@@ -127,17 +202,19 @@ if st.sidebar.button("Run Simulation", key="run_simulation_button"):
     if time_points and queue_lengths:
         df_queue = pd.DataFrame({
             'Time (min)': time_points,
-            'Total Queue Length': queue_lengths
+            'Mean Queue Length': queue_lengths
         })
         fig_line = px.line(
             df_queue,
             x="Time (min)",
-            y="Total Queue Length",
-            title="ER Queue Length Over Simulation Time",
+            y="Mean Queue Length",
+            title="ER Queue Length Over Simulation Time (mean across runs)",
             markers=True,
             template="plotly_white"
         )
-        st.plotly_chart(fig_line, use_container_width=True)
+        st.plotly_chart(fig_line, use_container_width=True, key=f"queue_line{key}")
+    elif grid_result is not None:
+        st.write("Queue traces are only kept for live runs; uncheck the precomputed grid option to see them.")
     else:
         st.write("No queue data available.")
 
@@ -148,10 +225,95 @@ if st.sidebar.button("Run Simulation", key="run_simulation_button"):
     # Additional EDA Plots
     # -------------------------------
     with st.expander("📊 More EDA Plots"):
-        st.markdown("These static plots provide additional insights into the ER dataset.")
-        st.image(os.path.join(plots_dir, "avg_wait_time_by_hospital.png"), caption="Average Wait Time by Hospital", use_container_width=True)
-        st.image(os.path.join(plots_dir, "avg_wait_time_by_urgency.png"), caption="Average Wait Time by Urgency Level", use_container_width=True)
-        st.image(os.path.join(plots_dir, "correlation_heatmap.png"), caption="Correlation Heatmap", use_container_width=True)
+        st.markdown("These plots provide additional insights into the ER dataset.")
+        render_eda(key)
+
+
+def render_replications(replications, completed):
+    means, ci95 = replications['means'], replications['ci95']
+
+    # Wait times pooled over all runs, queue length averaged across runs (for plotting)
+    all_wait_times = replications['wait_times']
+    wait_times = all_wait_times[~np.isnan(all_wait_times)].tolist()
+    time_points = replications['time_points'].tolist()
+    queue_lengths = np.nanmean(replications['queue_lengths'], axis=0).tolist() if time_points else []
+    render_results(means, ci95, wait_times, time_points, queue_lengths, n_done=completed, key=f"_{completed}")
+
+
+# -------------------------------
+# Run Simulation Button
+# -------------------------------
+# Live runs go through the job service. The session keeps its job across
+# reruns, so results stream in without blocking the UI; changing any
+# parameter releases (and, if nobody else needs it, cancels) the job.
+# Configurations with enough runs in the result store are shown from there.
+job_service = get_job_service()
+config = {
+    'num_doctors': int(num_doctors),
+    'num_nurses': int(num_nurses),
+    'arrival_rate': arrival_rate,
+    'sim_time': sim_duration,
+    'engine': engine,
+}
+params = (config, n_runs)
+job = st.session_state.get('job')
+if job is not None and st.session_state.get('job_params') != params:
+    job_service.release(job)
+    job = st.session_state['job'] = None
+
+if st.sidebar.button("Run Simulation", key="run_simulation_button"):
+    grid_result = None
+    if use_grid and os.path.exists(DEFAULT_GRID_PATH):
+        grid = load_staffing_grid(os.path.getmtime(DEFAULT_GRID_PATH))
+        grid_result = grid.lookup(int(num_doctors), int(num_nurses), arrival_rate, sim_duration,
+                                  min_replications=n_runs, engine=engine)
+
+    stored = []
+    if grid_result is None and reuse_runs:
+        stored = get_result_store().find({**DEFAULT_CONFIG, **config}, n_runs, traces=True)
+
+    if grid_result is not None or len(stored) == n_runs:
+        if job is not None:
+            job_service.release(job)
+            job = st.session_state['job'] = None
+        if grid_result is not None:
+            # The grid keeps per-run metrics only, not patient-level traces
+            render_results(grid_result['means'], grid_result['ci95'], [], [], [], grid_result=grid_result)
+        else:
+            st.info(f"💾 Loaded {n_runs} stored runs of this configuration from the result store.")
+            render_replications(stack_results(stored), n_runs)
+    elif job is None or job.finished:
+        # Re-running a finished configuration draws a fresh set of replications
+        if job is not None:
+            job_service.release(job)
+        job = st.session_state['job'] = job_service.submit(config, n_runs)
+        st.session_state['job_params'] = params
+
+if job is not None:
+    progress = st.empty()
+    results = st.empty()
+    rendered = -1  # replications done at the last render; the charts' keys depend on it
+    while True:
+        job.wait(rendered, timeout=0.5)
+        snapshot = job.snapshot()
+        if snapshot['status'] == 'failed':
+            progress.error(f"Simulation failed: {snapshot['error']}")
+            break
+        # Both from the snapshot, so a job finishing meanwhile still gets its final render
+        completed, finished = snapshot['completed'], snapshot['status'] in ('done', 'cancelled')
+        if finished:
+            progress.empty()
+        else:
+            progress.progress(completed / job.n, text=f"Running simulations: {completed}/{job.n} replications done...")
+        # A wait that timed out brings nothing new: drawing the same charts
+        # again in this run would repeat their element keys
+        if completed != rendered:
+            if snapshot['results'] is not None:
+                with results.container():
+                    render_replications(snapshot['results'], completed)
+            rendered = completed
+        if finished:
+            break
 
 # -------------------------------
 # About Section (Always Visible)
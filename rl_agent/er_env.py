@@ -1,5 +1,7 @@
 import sys
 import os
+from collections import OrderedDict
+from functools import partial
 
 # Add the project root directory to sys.path to import 'scripts'
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,41 +12,289 @@ sys.path.append(project_root)
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-from scripts.simulation_backend import run_er_simulation
+from scripts.simulation_backend import MODEL_VERSION, URGENCY_LEVELS
+from scripts.result_store import run_stored
+from scripts.incremental_engine import IncrementalSimulation
+from scripts.instrumentation import count, timer
+
+EPISODIC_OBSERVATION_SIZE = 8
+
+
+def observation_size(urgency=None):
+    """Base observation, plus the average wait of every urgency level when urgency is set."""
+    return 4 if urgency is None else 4 + len(URGENCY_LEVELS)
+
+
+def simulate_actions(actions, seeds, arrival_rate, sim_time, engine='simpy', urgency=None, store=None):
+    """
+    Runs one simulation per staffing action (0-based [doctors, nurses]).
+    Returns (observations, rewards) as arrays; shared by EREnv and ERVecEnv.
+    With store (a ResultStore), runs already stored for the same staffing and
+    seed are loaded instead of simulated.
+    """
+    observations = np.zeros((len(actions), observation_size(urgency)), dtype=np.float32)
+    rewards = np.zeros(len(actions))
+    for i, (action, seed) in enumerate(zip(actions, seeds)):
+        num_doctors, num_nurses = np.asarray(action) + 1  # to ensure at least 1
+        config = {'num_doctors': int(num_doctors), 'num_nurses': int(num_nurses), 'arrival_rate': arrival_rate,
+                  'sim_time': sim_time, 'engine': engine, 'urgency': urgency}
+        results = run_stored(store, config, seed)
+        observations[i, :4] = [
+            results['Average Wait Time (min)'],
+            results['Doctor Utilization (%)'],
+            results['Nurse Utilization (%)'],
+            results['Total Patients Treated'],
+        ]
+        if urgency is not None:
+            observations[i, 4:] = [results[f'{level} Average Wait Time (min)'] for level in URGENCY_LEVELS]
+        # Reward: Negative avg wait time (the lower the wait, the higher the reward)
+        rewards[i] = -results['Average Wait Time (min)']
+    return observations, rewards
+
+
+class RewardCache:
+    """
+    Memoized reward surface over the staffing action space.
+    Each key (doctors, nurses, arrival_rate, sim_time, engine, urgency mode, model version)
+    holds a pool of up to sample_cap simulated [observation..., reward] rows.
+    Until the pool is full every visit simulates and adds to it; after that,
+    visits sample a row from the pool instead of simulating. Least recently
+    used keys are evicted beyond max_entries. With a path, the cache is loaded
+    from / saved to an .npz file so it survives across training runs.
+    """
+
+    def __init__(self, sample_cap=32, max_entries=1024, path=None, seed=None):
+        self.sample_cap = sample_cap
+        self.max_entries = max_entries
+        self.path = path
+        self.rng = np.random.default_rng(seed)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def make_key(num_doctors, num_nurses, arrival_rate, sim_time, engine, urgency=None):
+        return f"{int(num_doctors)}|{int(num_nurses)}|{arrival_rate}|{sim_time}|{engine}|{urgency}|{MODEL_VERSION}"
+
+    def sample(self, key):
+        """Returns (observation, reward) from a full pool, or None if key still needs simulating."""
+        pool = self.entries.get(key)
+        if pool is None or len(pool) < self.sample_cap:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        row = pool[self.rng.integers(len(pool))]
+        return row[:-1].astype(np.float32), float(row[-1])
+
+    def add(self, key, observation, reward):
+        pool = self.entries.setdefault(key, [])
+        if len(pool) < self.sample_cap:
+            pool.append(np.append(np.asarray(observation, dtype=np.float64), reward))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'samples': sum(len(pool) for pool in self.entries.values()),
+        }
+
+    def save(self, path=None):
+        path = path or self.path
+        keys = list(self.entries)
+        pools = [np.array(self.entries[k]) for k in keys]
+        # Observation sizes differ between urgency modes: pad rows with NaN
+        width = max((p.shape[1] for p in pools), default=5)
+        rows = np.full((sum(len(p) for p in pools), width), np.nan)
+        offset = 0
+        for p in pools:
+            rows[offset:offset + len(p), :p.shape[1]] = p
+            offset += len(p)
+        np.savez(path,
+                 keys=np.array(keys, dtype=str),
+                 lengths=np.array([len(p) for p in pools], dtype=np.int64),
+                 rows=rows)
+
+    def load(self, path=None):
+        path = path or self.path
+        with np.load(path, allow_pickle=False) as data:
+            offsets = np.concatenate([[0], np.cumsum(data['lengths'])])
+            rows = data['rows']
+            for i, key in enumerate(data['keys'].tolist()):
+                # Results from another model version are never reused
+                if key.endswith(f"|{MODEL_VERSION}"):
+                    pool = rows[offsets[i]:offsets[i + 1]][:self.sample_cap]
+                    self.entries[key] = list(pool[:, ~np.isnan(pool).all(axis=0)])
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def cached_simulate_actions(actions, seeds, arrival_rate, sim_time, engine, cache, simulate=simulate_actions,
+                            urgency=None):
+    """
+    simulate_actions() with a RewardCache in front: only actions whose pool is
+    not full yet are simulated (through simulate), the rest are sampled.
+    """
+    actions = np.asarray(actions).reshape(len(seeds), -1)
+    observations = np.zeros((len(actions), observation_size(urgency)), dtype=np.float32)
+    rewards = np.zeros(len(actions))
+    keys = [cache.make_key(a[0] + 1, a[1] + 1, arrival_rate, sim_time, engine, urgency) for a in actions]
+
+    misses = []
+    for i, key in enumerate(keys):
+        cached = cache.sample(key)
+        if cached is None:
+            misses.append(i)
+        else:
+            observations[i], rewards[i] = cached
+
+    if misses:
+        miss_obs, miss_rewards = simulate(actions[misses], [seeds[i] for i in misses],
+                                          arrival_rate, sim_time, engine, urgency)
+        observations[misses] = miss_obs
+        rewards[misses] = miss_rewards
+        for i, obs, reward in zip(misses, miss_obs, miss_rewards):
+            cache.add(keys[i], obs, reward)
+    return observations, rewards
+
 
 class EREnv(gym.Env):
-    def __init__(self):
+    """
+    Staffing environment. By default every episode is one step: the action
+    fixes the staffing, one whole simulation runs and its averages are
+    observed. With episodic=True the environment keeps a live simulation
+    (see scripts.incremental_engine): each step applies the action's staffing
+    for decision_interval minutes, observes the current queues and the
+    interval's utilization and waits, and the episode ends at horizon.
+    checkpoint() / restore() save and roll back the episode, e.g. to branch
+    rollouts from one state.
+    """
+
+    def __init__(self, engine='simpy', cache=None, urgency=None, episodic=False, decision_interval=60,
+                 horizon=24 * 60, initial_staffing=(3, 5), result_store=None):
         super(EREnv, self).__init__()
 
         # Actions: Allocate doctors and nurses (each from 1 to 10)
         self.action_space = spaces.MultiDiscrete([10, 10])  # [doctors, nurses]
 
-        # Observation: [Average Wait, Doctor Utilization, Nurse Utilization, Patients Treated]
-        self.observation_space = spaces.Box(low=0, high=np.inf, shape=(4,), dtype=np.float32)
+        self.urgency = urgency
+        self.episodic = episodic
+        if episodic:
+            if urgency is not None or cache is not None or result_store is not None:
+                raise ValueError("Episodic EREnv supports neither urgency classes, a RewardCache nor a ResultStore")
+            # Observation: [Nurse Queue, Doctor Queue, Nurse Utilization, Doctor Utilization,
+            #               Average Wait, Patients Treated (last interval), Doctors, Nurses]
+            shape = (EPISODIC_OBSERVATION_SIZE,)
+        else:
+            # Observation: [Average Wait, Doctor Utilization, Nurse Utilization, Patients Treated]; with an
+            # urgency mode (see simulation_backend.URGENCY_MODES) followed by the average wait per urgency level
+            shape = (observation_size(urgency),)
+        self.observation_space = spaces.Box(low=0, high=np.inf, shape=shape, dtype=np.float32)
 
         # Static parameters
         self.arrival_rate = 10
         self.sim_time = 240
+        self.engine = engine  # see simulation_backend.ENGINES
+        self._seed_seq = np.random.SeedSequence()
+        self._seeded = False  # reset(seed=...) was called
+        self.cache = cache  # optional RewardCache shared across steps
+        self.result_store = result_store  # optional ResultStore: seeded runs are reused across sessions
 
-    def step(self, action):
-        num_doctors, num_nurses = action + 1  # to ensure at least 1
-        results = run_er_simulation(num_doctors, num_nurses, self.arrival_rate, self.sim_time)
+        # Episodic mode
+        self.decision_interval = decision_interval
+        self.horizon = horizon
+        self.initial_staffing = initial_staffing  # (doctors, nurses) at reset
+        self._sim = None
 
-        avg_wait = results['Average Wait Time (min)']
-        doctor_util = results['Doctor Utilization (%)']
-        nurse_util = results['Nurse Utilization (%)']
-        patients_treated = results['Total Patients Treated']
+    def step(self, action):
+        count('env/steps')
+        with timer('env/step'):
+            if self.episodic:
+                return self._step_episode(action)
+            return self._step_once(action)
 
-        observation = np.array([avg_wait, doctor_util, nurse_util, patients_treated])
-
-        # Reward: Negative avg wait time (the lower the wait, the higher the reward)
-        reward = -avg_wait
+    def _step_once(self, action):
+        if self.cache is not None:
+            observations, rewards = cached_simulate_actions([action], self._seed_seq.spawn(1), self.arrival_rate,
+                                                            self.sim_time, self.engine, self.cache,
+                                                            simulate=partial(simulate_actions,
+                                                                             store=self._store),
+                                                            urgency=self.urgency)
+        else:
+            observations, rewards = simulate_actions([action], self._seed_seq.spawn(1), self.arrival_rate,
+                                                     self.sim_time, self.engine, self.urgency, self._store)
+        observation = observations[0]
+        reward = float(rewards[0])
 
         done = True  # Each episode is one simulation
         info = {}
 
         return observation, reward, done, False, info
 
-    def reset(self, seed=None):
-        observation = np.array([0.0, 0.0, 0.0, 0.0])
+    @property
+    def _store(self):
+        # Runs from OS entropy are never asked for again: storing them would only grow the store
+        return self.result_store if self._seeded else None
+
+    def _episode_observation(self, interval=None):
+        sim = self._sim
+        queues = sim.queue_lengths()
+        observation = np.zeros(EPISODIC_OBSERVATION_SIZE, dtype=np.float32)
+        observation[[0, 1]] = queues['nurse'], queues['doctor']
+        observation[[6, 7]] = sim.capacity['doctor'], sim.capacity['nurse']
+        if interval is not None:
+            # Over the servers on duty during the interval, including staff
+            # finishing a patient after a staffing cut, so at most 100%
+            observation[2] = 100 * interval['busy']['nurse'] / interval['on_duty']['nurse']
+            observation[3] = 100 * interval['busy']['doctor'] / interval['on_duty']['doctor']
+            if len(interval['waits']):
+                observation[4] = interval['waits'].mean()
+            observation[5] = len(interval['waits'])
+        return observation
+
+    def _step_episode(self, action):
+        if self._sim is None:
+            raise RuntimeError("Call reset() before step()")
+        num_doctors, num_nurses = np.asarray(action) + 1
+        self._sim.set_staffing(int(num_doctors), int(num_nurses))
+        until = min(self._sim.now + self.decision_interval, self.horizon)
+        duration = until - self._sim.now
+        interval = self._sim.advance(until)
+        # Reward: minus the patient-hours spent waiting during the interval, so the
+        # episode return is minus the total waiting time
+        reward = -sum(interval['queue'].values()) * duration / 60
+        terminated = until >= self.horizon
+        return self._episode_observation(interval), float(reward), terminated, False, {'waits': interval['waits']}
+
+    def checkpoint(self):
+        """Snapshot of the live episode (episodic mode) for restore()."""
+        return self._sim.checkpoint()
+
+    def restore(self, checkpoint):
+        self._sim.restore(checkpoint)
+
+    def reset(self, seed=None, options=None):
+        with timer('env/reset'):
+            return self._reset(seed)
+
+    def _reset(self, seed):
+        super().reset(seed=seed)
+        if seed is not None:
+            # Each step draws its own child seed, so seeded episodes are reproducible
+            self._seed_seq = np.random.SeedSequence(seed)
+            self._seeded = True
+        if self.episodic:
+            num_doctors, num_nurses = self.initial_staffing
+            self._sim = IncrementalSimulation(num_doctors, num_nurses, self.arrival_rate,
+                                              seed=self._seed_seq.spawn(1)[0])
+            return self._episode_observation(), {}
+        observation = np.zeros(self.observation_space.shape, dtype=np.float32)
         return observation, {}
@@ -0,0 +1,133 @@
+import sys
+import os
+import time
+
+# Add the project root directory to sys.path to import 'scripts'
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.append(project_root)
+
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+from rl_agent.er_env import EREnv, cached_simulate_actions, simulate_actions
+from scripts.replications import get_pool
+from scripts.instrumentation import add_time, count
+
+
+class ERVecEnv(VecEnv):
+    """
+    Native vectorized EREnv: one call to step() simulates a whole batch of
+    staffing actions. Every sub-environment is a one-step episode, so each step
+    auto-resets and returns the simulated observation as 'terminal_observation'.
+    With workers > 1 the batch is split into sub-batches run in worker processes.
+    With a RewardCache, only actions whose result pool is not yet full are simulated.
+    With a ResultStore, the runs of a seeded env (seed given here or to seed())
+    are stored and reused by later runs; an unseeded env does not use it.
+    """
+
+    render_mode = None
+
+    def __init__(self, num_envs=8, engine='numpy', workers=1, seed=None, cache=None, urgency=None,
+                 result_store=None):
+        template = EREnv(engine=engine, urgency=urgency)
+        self.arrival_rate = template.arrival_rate
+        self.sim_time = template.sim_time
+        self.engine = engine
+        self.urgency = urgency
+        self.workers = workers
+        self.cache = cache
+        self.result_store = result_store
+        self._seed_seq = np.random.SeedSequence(seed)
+        self._seeded = seed is not None
+        self._actions = None
+
+        # Throughput counters
+        self.total_steps = 0
+        self.total_step_time = 0.0
+
+        super().__init__(num_envs, template.observation_space, template.action_space)
+
+    @property
+    def steps_per_second(self):
+        """Environment steps (single simulations) per second of step_wait time."""
+        return self.total_steps / self.total_step_time if self.total_step_time else 0.0
+
+    def _reset_observations(self):
+        return np.zeros((self.num_envs,) + self.observation_space.shape, dtype=np.float32)
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self._seed_seq = np.random.SeedSequence(self._seeds[0])
+            self._seeded = True
+            self._seeds = [None] * self.num_envs
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._reset_observations()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(self.num_envs, -1)
+
+    def _simulate(self, actions, seeds, arrival_rate, sim_time, engine, urgency=None):
+        # Unseeded runs are never asked for again, so they are not stored
+        store = self.result_store if self._seeded else None
+        workers = min(self.workers, len(actions))
+        if workers <= 1:
+            return simulate_actions(actions, seeds, arrival_rate, sim_time, engine, urgency, store)
+        chunks = np.array_split(np.arange(len(actions)), workers)
+        futures = [
+            get_pool(workers).submit(simulate_actions, actions[idx], [seeds[i] for i in idx],
+                                     arrival_rate, sim_time, engine, urgency, store)
+            for idx in chunks
+        ]
+        parts = [f.result() for f in futures]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def step_wait(self):
+        start = time.perf_counter()
+        seeds = self._seed_seq.spawn(self.num_envs)
+        if self.cache is not None:
+            observations, rewards = cached_simulate_actions(self._actions, seeds, self.arrival_rate, self.sim_time,
+                                                            self.engine, self.cache, simulate=self._simulate,
+                                                            urgency=self.urgency)
+        else:
+            observations, rewards = self._simulate(self._actions, seeds, self.arrival_rate,
+                                                   self.sim_time, self.engine, self.urgency)
+        elapsed = time.perf_counter() - start
+        self.total_step_time += elapsed
+        self.total_steps += self.num_envs
+        add_time('vec_env/step', elapsed)
+        count('env/steps', self.num_envs)
+
+        # Each episode is one simulation: report it as terminal and auto-reset
+        dones = np.ones(self.num_envs, dtype=bool)
+        infos = [
+            {'terminal_observation': observations[i], 'TimeLimit.truncated': False}
+            for i in range(self.num_envs)
+        ]
+        return self._reset_observations(), rewards.astype(np.float32), dones, infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+if __name__ == "__main__":
+    # Throughput vs batch size
+    for workers in sorted({1, os.cpu_count() or 1}):
+        for num_envs in (1, 8, 32, 128):
+            env = ERVecEnv(num_envs=num_envs, workers=workers, seed=0)
+            env.reset()
+            for _ in range(max(1, 256 // num_envs)):
+                env.step(np.array([env.action_space.sample() for _ in range(num_envs)]))
+            print(f"workers={workers:<3} batch={num_envs:<4} {env.steps_per_second:10.1f} steps/s")
@@ -0,0 +1,134 @@
+import sys
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Add the project root directory to sys.path to import 'rl_agent'
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.append(project_root)
+
+import numpy as np
+from rl_agent.er_env import EREnv
+
+# -------------------------------
+# Agent checkpoint registry
+# -------------------------------
+# load_policy(path) deserializes each checkpoint once per process. Later calls
+# only stat the file: an unchanged mtime returns the loaded policy, a changed
+# mtime re-hashes the file and reloads only if the contents differ. Predictions
+# go through a table of per-observation action probabilities, so repeated
+# queries (the dashboard always asks for the reset observation) skip torch, and
+# a batch of new observations costs one forward pass. torch and
+# stable_baselines3 are imported on the first load, not with this module.
+
+DEFAULT_AGENT_PATH = os.path.join(current_dir, "trained_agent.zip")
+
+# Training schedules are not needed for inference and may not unpickle across versions
+_INFERENCE_OBJECTS = {'lr_schedule': lambda _: 0.0, 'clip_range': lambda _: 0.0}
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CachedPolicy:
+    """
+    A loaded agent with memoized action distributions.
+    For the MultiDiscrete staffing action space the table row of an
+    observation holds the probabilities of each action dimension, shape
+    (dimensions, choices); the least recently used rows are evicted beyond
+    max_entries.
+    """
+
+    def __init__(self, model, path, mtime, digest, max_entries=4096, seed=None):
+        self.model = model
+        self.path = path
+        self.mtime = mtime
+        self.digest = digest
+        self.max_entries = max_entries
+        self.rng = np.random.default_rng(seed)
+        self.table = OrderedDict()
+        self._table_lock = threading.Lock()
+        self.nvec = np.atleast_1d(getattr(model.action_space, 'nvec', getattr(model.action_space, 'n', None)))
+        self.reset_observation, _ = EREnv().reset()
+        self.action_probabilities(self.reset_observation)
+
+    def _forward(self, observations):
+        import torch
+
+        with torch.no_grad():
+            obs_tensor, _ = self.model.policy.obs_to_tensor(observations)
+            distribution = self.model.policy.get_distribution(obs_tensor).distribution
+        distributions = distribution if isinstance(distribution, list) else [distribution]
+        probs = np.zeros((len(observations), len(self.nvec), self.nvec.max()))
+        for j, d in enumerate(distributions):
+            probs[:, j, :self.nvec[j]] = d.probs.cpu().numpy()
+        return probs
+
+    def action_probabilities(self, observations):
+        """Action probabilities for a batch of observations, shape (batch, dimensions, choices)."""
+        shape = self.model.observation_space.shape
+        observations = np.asarray(observations, dtype=np.float32).reshape((-1,) + shape)
+        keys = [o.tobytes() for o in observations]
+        with self._table_lock:
+            missing = [i for i, key in enumerate(keys) if key not in self.table]
+            if missing:
+                for i, row in zip(missing, self._forward(observations[missing])):
+                    self.table[keys[i]] = row
+            rows = []
+            for key in keys:
+                self.table.move_to_end(key)
+                rows.append(self.table[key])
+            while len(self.table) > self.max_entries:
+                self.table.popitem(last=False)
+        return np.stack(rows)
+
+    def predict(self, observations, deterministic=False):
+        """
+        Actions for one observation or a batch, like PPO.predict (without the
+        recurrent state): the most likely choice per dimension if
+        deterministic, otherwise a sample from the policy.
+        """
+        single = np.shape(observations) == self.model.observation_space.shape
+        probs = self.action_probabilities(observations)
+        if deterministic:
+            actions = probs.argmax(axis=-1)
+        else:
+            u = self.rng.random(probs.shape[:-1] + (1,))
+            actions = np.minimum((u > probs.cumsum(axis=-1)).sum(axis=-1), self.nvec - 1)
+        if not hasattr(self.model.action_space, 'nvec'):
+            actions = actions[:, 0]
+        return actions[0] if single else actions
+
+
+def load_policy(path=DEFAULT_AGENT_PATH):
+    """Returns the CachedPolicy for an agent checkpoint, loading it only when the file changed."""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached.mtime == mtime:
+            return cached
+        digest = file_hash(path)
+        if cached is not None and cached.digest == digest:
+            cached.mtime = mtime
+            return cached
+        from stable_baselines3 import PPO
+
+        model = PPO.load(path, device='cpu', custom_objects=_INFERENCE_OBJECTS)
+        _cache[path] = CachedPolicy(model, path, mtime, digest)
+        return _cache[path]
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
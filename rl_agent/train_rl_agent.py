@@ -8,19 +8,86 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir))
 sys.path.append(project_root)
 
+import time
+from contextlib import ExitStack
 from stable_baselines3 import PPO
-from rl_agent.er_env import EREnv
+from stable_baselines3.common.callbacks import BaseCallback
+from rl_agent.er_env import RewardCache
+from rl_agent.er_vec_env import ERVecEnv
+from scripts.instrumentation import add_time, instrumentation, instrumented, profile
 
-# Create the environment
-env = EREnv()
+# Training settings
+N_ENVS = 8       # staffing actions simulated per batched step
+WORKERS = 1      # >1 runs sub-batches in worker processes
+ENGINE = 'numpy'
+CACHE_SAMPLES = 32  # simulated results kept per staffing action before sampling from them
+INSTRUMENT = True   # time rollouts, PPO updates and simulation phases (see scripts/instrumentation.py)
+PROFILE_PATH = None  # e.g. "train.prof" to capture a cProfile of training
 
-# Create the PPO agent
-model = PPO("MlpPolicy", env, verbose=1)
+
+class ThroughputCallback(BaseCallback):
+    """
+    Logs env steps/s and simulated minutes/s of every rollout (perf/ in the
+    PPO log) and times rollouts and PPO updates as instrumentation timers.
+    Simulated minutes count every step's ER time, including steps answered
+    from the reward cache.
+    """
+
+    def __init__(self, sim_time, verbose=0):
+        super().__init__(verbose)
+        self.sim_time = sim_time
+        self.rollout_start = None
+        self.rollout_steps = 0
+        self.update_start = None
+
+    def _on_rollout_start(self):
+        now = time.perf_counter()
+        if self.update_start is not None:
+            add_time('ppo/update', now - self.update_start)
+        self.rollout_start = now
+        self.rollout_steps = self.num_timesteps
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        now = time.perf_counter()
+        elapsed = now - self.rollout_start
+        steps = self.num_timesteps - self.rollout_steps
+        add_time('ppo/rollout', elapsed)
+        self.logger.record('perf/env_steps_per_sec', steps / elapsed)
+        self.logger.record('perf/sim_minutes_per_sec', steps * self.sim_time / elapsed)
+        self.update_start = now
+
+    def _on_training_end(self):
+        if self.update_start is not None:
+            add_time('ppo/update', time.perf_counter() - self.update_start)
+
+
+# Reward cache persisted next to the agent so later runs start warm
+cache = RewardCache(sample_cap=CACHE_SAMPLES, path=os.path.join(current_dir, "reward_cache.npz"))
+
+# Create the vectorized environment
+env = ERVecEnv(num_envs=N_ENVS, engine=ENGINE, workers=WORKERS, cache=cache)
+
+# Create the PPO agent (keep the default 2048-step rollout across all envs)
+model = PPO("MlpPolicy", env, n_steps=2048 // N_ENVS, verbose=1)
 
 # Train the agent
 print("Starting training...")
-model.learn(total_timesteps=10000)  # You can increase this for better results
+with ExitStack() as stack:
+    if INSTRUMENT:
+        stack.enter_context(instrumented())
+    if PROFILE_PATH:
+        stack.enter_context(profile(PROFILE_PATH))
+    model.learn(total_timesteps=10000,  # You can increase this for better results
+                callback=ThroughputCallback(env.sim_time))
 print("Training complete!")
+print(f"Environment throughput: {env.steps_per_second:.1f} steps/s")
+print(f"Reward cache: {cache.stats()}")
+if INSTRUMENT:
+    print(instrumentation.format_report())
+cache.save()
 
 # Save the trained agent
 save_path = os.path.join(current_dir, "rl_agent", "trained_agent")
@@ -0,0 +1,33 @@
+# Simulation core. Names are resolved on first access, so `import scripts`
+# is free and e.g. `from scripts import run_er_simulation` only loads the
+# backend (numpy + simpy), never pandas, torch or the plotting stack.
+import importlib
+
+_EXPORTS = {
+    'run_er_simulation': 'scripts.simulation_backend',
+    'ENGINES': 'scripts.simulation_backend',
+    'MODEL_VERSION': 'scripts.simulation_backend',
+    'run_replications': 'scripts.replications',
+    'confidence_interval': 'scripts.replications',
+    'RandomStreams': 'scripts.random_streams',
+    'StatsCollector': 'scripts.stats_collector',
+    'get_service_means': 'scripts.parameter_store',
+    'ArrivalProfile': 'scripts.arrival_profile',
+    'fit_arrival_profile': 'scripts.arrival_profile',
+    'ShiftSchedule': 'scripts.shift_schedule',
+    'run_network_simulation': 'scripts.hospital_network',
+    'load_hospitals': 'scripts.hospital_network',
+    'ResultStore': 'scripts.result_store',
+    'instrumentation': 'scripts.instrumentation',
+    'instrumented': 'scripts.instrumentation',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'scripts' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+
+from scripts.parameter_store import DEFAULT_DATA_PATH, dataset_key
+from scripts.eda_tables import DAY_ORDER, TIME_OF_DAY_ORDER
+
+# -------------------------------
+# Time-varying arrival rates
+# -------------------------------
+# Arrivals follow a non-homogeneous Poisson process whose rate is
+# arrival_rate * m(t), with m a weekly, piecewise-constant multiplier that
+# averages 1 (so arrival_rate stays the mean number of patients per hour).
+# m is fitted from the visit counts per Day_of_Week x Visit_Hour in the cleaned
+# data. Arrival times are sampled by inversion: unit-rate Poisson points
+# (cumulative sums of exponentials, drawn in blocks) are mapped through the
+# inverse of the cumulative intensity, which is piecewise linear and so can be
+# inverted with one np.interp call per block. Unlike thinning no draws are
+# rejected, and with the same seed a busier profile moves arrivals earlier
+# rather than replacing them (common random numbers still apply).
+
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+
+# Clock hours covered by each Visit_Hour label; Night runs past midnight
+TIME_OF_DAY_HOURS = {
+    'Early Morning': (6, 9),
+    'Late Morning': (9, 12),
+    'Afternoon': (12, 17),
+    'Evening': (17, 22),
+    'Night': (22, 30),
+}
+
+_cache = {}
+
+
+class ArrivalProfile:
+    """
+    Weekly arrival-rate multipliers, constant within equal-length bins
+    (hourly by default) and normalized to average 1. Times are minutes since
+    Monday 00:00 and wrap around every period.
+    """
+
+    def __init__(self, multipliers, period=WEEK_MINUTES):
+        multipliers = np.asarray(multipliers, dtype=float)
+        if multipliers.ndim != 1 or len(multipliers) == 0 or (multipliers <= 0).any():
+            raise ValueError("multipliers must be a non-empty 1-d array of positive rates")
+        self.multipliers = multipliers / multipliers.mean()
+        self.period = period
+        self.edges = np.linspace(0, period, len(multipliers) + 1)
+        # Cumulative intensity at the bin edges, in multiplier-minutes
+        self.cumulative = np.concatenate([[0.0], np.cumsum(self.multipliers * np.diff(self.edges))])
+
+    def multiplier(self, t):
+        """Rate multiplier at time(s) t."""
+        idx = np.searchsorted(self.edges, np.mod(t, self.period), side='right') - 1
+        return self.multipliers[np.minimum(idx, len(self.multipliers) - 1)]
+
+    def integral(self, t):
+        """Integral of the multiplier from 0 to t."""
+        cycles, rest = np.divmod(t, self.period)
+        return cycles * self.cumulative[-1] + np.interp(rest, self.edges, self.cumulative)
+
+    def inverse(self, u):
+        """Time t at which integral(t) == u."""
+        cycles, rest = np.divmod(u, self.cumulative[-1])
+        return cycles * self.period + np.interp(rest, self.cumulative, self.edges)
+
+    def arrival_times(self, arrival_rate, sim_time, stream, start_minute=0):
+        """
+        Arrival times in [0, sim_time) for a run starting start_minute into
+        the week, from stream's exponentials drawn in blocks.
+        """
+        mean_gap = 60 / arrival_rate
+        offset = self.integral(start_minute)
+        horizon = self.integral(start_minute + sim_time) - offset
+        expected = horizon / mean_gap
+        block = int(expected + 5 * np.sqrt(expected) + 10)
+        unit = np.cumsum(stream.exponentials(mean_gap, block))
+        while unit[-1] < horizon:
+            unit = np.concatenate([unit, unit[-1] + np.cumsum(stream.exponentials(mean_gap, block))])
+        arrivals = self.inverse(offset + unit) - start_minute
+        return arrivals[arrivals < sim_time]
+
+    def hourly_rates(self, arrival_rate):
+        """Patients per hour in each bin for a mean rate of arrival_rate."""
+        return arrival_rate * self.multipliers
+
+
+def _visit_counts(data_path):
+    import pandas as pd
+
+    columns = ['Day_of_Week', 'Visit_Hour']
+    if os.path.isdir(data_path):
+        df = pd.read_parquet(data_path, columns=columns)
+    else:
+        df = pd.read_csv(data_path, usecols=columns)
+    counts = df.groupby(columns, observed=True).size()
+    return {(str(day), str(hour)): int(n) for (day, hour), n in counts.items()}
+
+
+def fit_arrival_profile(data_path=DEFAULT_DATA_PATH):
+    """
+    Hourly ArrivalProfile from the visits per day of week and time of day:
+    each Visit_Hour block's count is spread evenly over its clock hours (Night
+    continues into the next morning). Fitted at most once per (path, mtime).
+    """
+    key = dataset_key(data_path)
+    profile = _cache.get(key)
+    if profile is not None:
+        return profile
+
+    counts = _visit_counts(key[0])
+    rates = np.zeros(7 * 24)
+    for d, day in enumerate(DAY_ORDER):
+        for label in TIME_OF_DAY_ORDER:
+            first, last = TIME_OF_DAY_HOURS[label]
+            hours = (d * 24 + np.arange(first, last)) % len(rates)
+            rates[hours] += counts.get((day, label), 0) / (last - first)
+    if (rates <= 0).any():
+        raise ValueError(f"{data_path} has no visits for some day and time of day; cannot fit arrival rates")
+
+    for old_key in [k for k in _cache if k[0] == key[0]]:
+        del _cache[old_key]
+    profile = _cache[key] = ArrivalProfile(rates)
+    return profile
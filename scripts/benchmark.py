@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import math
+import time
+import heapq
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from scripts.simulation_backend import ENGINES, run_er_simulation
+from scripts.parameter_store import get_service_means
+
+# -------------------------------
+# Simulation benchmark suite
+# -------------------------------
+# Times run_er_simulation over a grid of arrival rates, staffing levels,
+# horizons and engines, EREnv.step in both modes, the dashboard's
+# 10-replication job and the cold imports (see import_benchmark). Every case
+# reports wall time (best of the repeats, as timeit does) and, where meaningful, throughput
+# and peak traced memory (tracemalloc, measured in a separate run so it does
+# not slow down the timed ones). Results are written as JSON and compared
+# with a stored baseline; the run fails if any metric regresses by more than
+# the threshold. Baselines are machine-specific: record one per host with
+# --save-baseline. Shared or throttled hosts also drift over time, so every
+# run times a fixed calibration workload and the baseline's timings are
+# scaled by the ratio of the two calibrations before comparing. Independently
+# of the baseline, every engine must keep its minimum speedup over SimPy on
+# the same simulation case (see MIN_SPEEDUPS), and the report shows each
+# engine's peak traced memory relative to SimPy's.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(script_dir, "benchmark_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+ARRIVAL_RATES = (1, 10, 30, 60)
+HORIZONS = (240, 24 * 60, 7 * 24 * 60)
+QUICK_RATES = (10, 60)
+QUICK_HORIZONS = (240, 24 * 60)
+TARGET_UTILIZATION = 0.85
+EVENTS_PER_PATIENT = 7  # arrival, then a start and an end for each of the three services
+
+# Metrics checked against the baseline, with the absolute change below which
+# a difference is treated as timing noise. The throughputs are derived from
+# wall_time and so are reported but not checked again.
+CHECKED_METRICS = {
+    'wall_time': 0.002,  # seconds
+    'cold_wall_time': 0.002,
+    'peak_memory_mb': 1.0,
+}
+
+# Minimum wall-time speedup of an engine over SimPy on the same case, checked
+# on cases with at least SPEEDUP_MIN_PATIENTS patients: on shorter runs the
+# per-run setup shared by every engine dominates
+MIN_SPEEDUPS = {'numpy': 10.0, 'kernel': 3.0}
+SPEEDUP_MIN_PATIENTS = 1000
+
+
+def staffing_levels(arrival_rate):
+    """The dashboard default (3 doctors, 5 nurses) and staffing sized for TARGET_UTILIZATION."""
+    means = get_service_means(use_sidecar=True)
+    nurse_load = arrival_rate / 60 * (means['registration'] + means['triage'])
+    doctor_load = arrival_rate / 60 * means['consultation']
+    balanced = (math.ceil(doctor_load / TARGET_UTILIZATION), math.ceil(nurse_load / TARGET_UTILIZATION))
+    return {'default': (3, 5), 'balanced': balanced}
+
+
+def _timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def calibrate(repeats=5):
+    """Best-of time of a fixed heap and sort workload, a proxy for the current machine speed."""
+    def work():
+        rng = np.random.default_rng(0)
+        heap = []
+        for x in rng.random(20000).tolist():
+            heapq.heappush(heap, x)
+        while heap:
+            heapq.heappop(heap)
+        np.sort(rng.random(200000))
+
+    return _timed(work, repeats)[0]
+
+
+def _peak_memory_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_simulation(engine, arrival_rate, num_doctors, num_nurses, sim_time, repeats):
+    def run():
+        return run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time, engine=engine, seed=0)
+
+    run()  # warm-up: parameter tables, imports, first-call overheads
+    wall_time, result = _timed(run, repeats)
+    patients = result['Total Patients Treated']
+    return {
+        'wall_time': wall_time,
+        'peak_memory_mb': _peak_memory_mb(run),
+        'patients': patients,
+        'patients_per_sec': patients / wall_time,
+        'events_per_sec': EVENTS_PER_PATIENT * patients / wall_time,
+        'sim_minutes_per_sec': sim_time / wall_time,
+    }
+
+
+def bench_env(steps, repeats, **env_kwargs):
+    from rl_agent.er_env import EREnv
+
+    env = EREnv(**env_kwargs)
+    env.reset(seed=0)
+    env.action_space.seed(0)
+    actions = [env.action_space.sample() for _ in range(steps)]
+
+    def run():
+        env.reset()
+        for action in actions:
+            if env.step(action)[2] and env.episodic:
+                env.reset()
+
+    run()
+    wall_time, _ = _timed(run, repeats)
+    return {'wall_time': wall_time, 'steps_per_sec': steps / wall_time}
+
+
+def bench_dashboard_job(repeats, n=10):
+    from scripts.job_service import JobService
+
+    # The dashboard's defaults; a new seed per run so the job is never shared
+    config = {'num_doctors': 3, 'num_nurses': 5, 'arrival_rate': 10, 'sim_time': 240, 'engine': 'simpy'}
+    service = JobService()
+    seeds = iter(range(repeats + 1))
+
+    def run():
+        job = service.submit(config, n, seed=next(seeds))
+        job.result()
+        service.release(job)
+
+    try:
+        cold = _timed(run, 1)[0]  # includes starting the worker processes
+        wall_time, _ = _timed(run, repeats)
+    finally:
+        service.shutdown()
+    return {'cold_wall_time': cold, 'wall_time': wall_time, 'sim_minutes_per_sec': n * config['sim_time'] / wall_time}
+
+
+def run_suite(repeats=5, quick=False, include=None, imports=True, verbose=True):
+    """Runs every case (whose name contains include, if given); returns {case: {metric: value}}."""
+    cases = {}
+    for arrival_rate in (QUICK_RATES if quick else ARRIVAL_RATES):
+        for level, (num_doctors, num_nurses) in staffing_levels(arrival_rate).items():
+            for sim_time in (QUICK_HORIZONS if quick else HORIZONS):
+                for engine in ENGINES:
+                    name = f"sim/{engine}/rate={arrival_rate}/{level}({num_doctors}d,{num_nurses}n)/{sim_time}min"
+                    cases[name] = (bench_simulation, engine, arrival_rate, num_doctors, num_nurses, sim_time, repeats)
+    for engine in ENGINES:
+        cases[f"env/one-shot/{engine}"] = (lambda engine=engine: bench_env(50, repeats, engine=engine),)
+    cases["env/episodic"] = (lambda: bench_env(240, repeats, episodic=True),)
+    cases["dashboard/10-replications"] = (bench_dashboard_job, repeats)
+
+    results = {}
+    for name, (fn, *args) in cases.items():
+        if include and include not in name:
+            continue
+        results[name] = fn(*args)
+        if verbose:
+            print(f"{name:<58} {format_metrics(results[name])}")
+
+    if imports and (not include or 'import' in include):
+        from scripts import import_benchmark
+
+        for r in import_benchmark.run(repeats=repeats):
+            results[f"import/{r['module']}"] = {'wall_time': r['seconds']}
+            if verbose:
+                print(f"{'import/' + r['module']:<58} {format_metrics(results['import/' + r['module']])}")
+    return results
+
+
+def format_metrics(metrics):
+    parts = []
+    for metric, value in metrics.items():
+        if metric.endswith('wall_time'):
+            parts.append(f"{metric}={value * 1000:.1f}ms")
+        else:
+            parts.append(f"{metric}={value:,.1f}")
+    return "  ".join(parts)
+
+
+def environment():
+    import simpy
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'simpy': simpy.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, speed=1.0):
+    """
+    Regressions of results against baseline: a list of (case, metric, base,
+    new, relative change) for every checked metric that grew by more than
+    threshold (and by more than its noise floor). Baseline timings are first
+    multiplied by speed, the ratio of this run's calibration to the
+    baseline's. Cases or metrics missing from either side are skipped.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base_metrics = baseline.get(name, {})
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if metric not in CHECKED_METRICS or not base:
+                continue
+            if metric.endswith('wall_time'):
+                base *= speed
+            change = value / base - 1
+            if change > threshold and value - base > CHECKED_METRICS[metric]:
+                regressions.append((name, metric, base, value, change))
+    return regressions
+
+
+def _simpy_pairs(results):
+    """(case, engine, metrics, SimPy's metrics) for every simulation case SimPy also ran, SimPy excluded."""
+    for name, metrics in results.items():
+        kind, engine, *case = name.split('/')
+        simpy = results.get('/'.join([kind, 'simpy', *case]))
+        if kind == 'sim' and engine != 'simpy' and simpy is not None:
+            yield name, engine, metrics, simpy
+
+
+def check_speedups(results, min_speedups=MIN_SPEEDUPS):
+    """
+    Speedups of each engine over SimPy on the simulation cases both ran: a
+    list of (case, speedup, minimum), and the cases below their minimum.
+    """
+    speedups, too_slow = [], []
+    for name, engine, metrics, simpy in _simpy_pairs(results):
+        if engine not in min_speedups or metrics['patients'] < SPEEDUP_MIN_PATIENTS:
+            continue
+        entry = (name, simpy['wall_time'] / metrics['wall_time'], min_speedups[engine])
+        speedups.append(entry)
+        if entry[1] < entry[2]:
+            too_slow.append(entry)
+    return speedups, too_slow
+
+
+def memory_ratios(results):
+    """
+    Each engine's peak traced memory over SimPy's on the simulation cases
+    both ran: a list of (case, ratio). Only long runs and runs where SimPy's
+    peak is above the noise floor (patients piling up in the queues, so
+    per-patient objects dominate) are listed.
+    """
+    return [(name, metrics['peak_memory_mb'] / simpy['peak_memory_mb'])
+            for name, _, metrics, simpy in _simpy_pairs(results)
+            if metrics['patients'] >= SPEEDUP_MIN_PATIENTS
+            or simpy['peak_memory_mb'] > CHECKED_METRICS['peak_memory_mb']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation, environment and dashboard paths.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="fewer arrival rates and no 7-day horizon")
+    parser.add_argument("--filter", default=None, help="only cases whose name contains this")
+    parser.add_argument("--no-imports", action="store_true", help="skip the cold-import timings")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    results = run_suite(args.repeats, args.quick, args.filter, not args.no_imports)
+    calibration = (calibration + calibrate()) / 2
+    report = {'environment': dict(environment(), calibration=calibration), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    speedups, too_slow = check_speedups(results)
+    for name, speedup, minimum in speedups:
+        print(f"{'TOO SLOW' if speedup < minimum else 'speedup'} {name}: {speedup:.1f}x over simpy "
+              f"(minimum {minimum:.0f}x)")
+    for name, ratio in memory_ratios(results):
+        print(f"memory {name}: peak {ratio:.2f}x simpy's")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        sys.exit(1 if too_slow else 0)
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        sys.exit(1 if too_slow else 0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    speed = calibration / baseline['environment'].get('calibration', calibration)
+    print(f"Machine speed relative to the baseline: {1 / speed:.2f}x")
+    regressions = compare(results, baseline['results'], args.threshold, speed)
+    for name, metric, base, value, change in regressions:
+        print(f"REGRESSION {name} {metric}: {base:.4g} -> {value:.4g} ({change:+.0%})")
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%} against {args.baseline}, "
+          f"{len(too_slow)} engines below their minimum speedup")
+    sys.exit(1 if regressions or too_slow else 0)
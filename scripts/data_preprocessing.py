@@ -1,43 +1,213 @@
+import os
+import json
+import hashlib
+import glob
+import argparse
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-# Load your actual dataset
-df = pd.read_csv(r'C:\Users\shiva\Desktop\ER-Simulation-Analysis\data\er_wait_time.csv')
+# -------------------------------
+# Streaming preprocessing to partitioned Parquet
+# -------------------------------
+# Raw ER extracts are read in chunks with compact dtypes and written to a
+# Parquet dataset partitioned as hospital=<Hospital ID>/month=<YYYY-MM>, one
+# file per raw file and partition. A manifest records which raw files (by size
+# and mtime) produced which files, so re-runs only process new or changed raw
+# files, a changed file's old output is replaced, and the output of a raw file
+# that is no longer among the inputs is removed: the dataset always mirrors the
+# raw files it was last built from.
 
-# Quick overview of data
-print(df.head())
-print(df.info())
-print(df.isnull().sum())
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.join(script_dir, "..", "data")
+DEFAULT_RAW_PATHS = [os.path.join(data_dir, "er_wait_time.csv"), os.path.join(data_dir, "raw")]
+DEFAULT_OUTPUT_DIR = os.path.join(data_dir, "processed")
+MANIFEST_NAME = "_manifest.json"
+CHUNK_ROWS = 200_000
 
-# Convert 'Visit Date' to datetime
-df['Visit Date'] = pd.to_datetime(df['Visit Date'])
+CATEGORY_COLUMNS = ['Hospital ID', 'Hospital Name', 'Region', 'Day of Week', 'Season', 'Time of Day',
+                    'Urgency Level', 'Patient Outcome']
+RAW_DTYPES = {
+    **{column: 'category' for column in CATEGORY_COLUMNS},
+    'Visit ID': 'string',
+    'Patient ID': 'string',
+    'Nurse-to-Patient Ratio': 'int8',
+    'Specialist Availability': 'int8',
+    'Facility Size (Beds)': 'int16',
+    'Time to Registration (min)': 'int16',
+    'Time to Triage (min)': 'int16',
+    'Time to Medical Professional (min)': 'int16',
+    'Total Wait Time (min)': 'int16',
+    'Patient Satisfaction': 'int8',
+}
 
-# Feature Engineering (specific to your dataset)
-# Total time metrics are already present as "Total Wait Time (min)"
-# Creating more relevant metrics clearly
+# Raw column -> name used by the analysis and simulation scripts. Columns are
+# renamed rather than duplicated.
+RENAMES = {
+    'Total Wait Time (min)': 'Total_Wait_Time',
+    'Time to Registration (min)': 'Time_to_Registration',
+    'Time to Triage (min)': 'Time_to_Triage',
+    'Time to Medical Professional (min)': 'Time_to_Medical_Professional',
+    'Time of Day': 'Visit_Hour',
+    'Day of Week': 'Day_of_Week',
+}
 
-# Define total wait time clearly
-df['Total_Wait_Time'] = df['Total Wait Time (min)']
+_category = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ('Visit ID', pa.string()),
+    ('Patient ID', pa.string()),
+    ('Hospital ID', _category),
+    ('Hospital Name', _category),
+    ('Region', _category),
+    ('Visit Date', pa.timestamp('ns')),
+    ('Day_of_Week', _category),
+    ('Season', _category),
+    ('Visit_Hour', _category),
+    ('Urgency Level', _category),
+    ('Nurse-to-Patient Ratio', pa.int8()),
+    ('Specialist Availability', pa.int8()),
+    ('Facility Size (Beds)', pa.int16()),
+    ('Time_to_Registration', pa.int16()),
+    ('Time_to_Triage', pa.int16()),
+    ('Time_to_Medical_Professional', pa.int16()),
+    ('Total_Wait_Time', pa.int16()),
+    ('Patient Outcome', _category),
+    ('Patient Satisfaction', pa.int8()),
+    ('Total_Processing_Time', pa.int16()),
+    ('Additional_Wait', pa.int16()),
+])
 
-# Define treatment-related times explicitly
-df['Time_to_Registration'] = df['Time to Registration (min)']
-df['Time_to_Triage'] = df['Time to Triage (min)']
-df['Time_to_Medical_Professional'] = df['Time to Medical Professional (min)']
 
-# Compute total processing time explicitly (registration + triage + medical professional)
-df['Total_Processing_Time'] = (
-    df['Time_to_Registration'] +
-    df['Time_to_Triage'] +
-    df['Time_to_Medical_Professional']
-)
+def transform_chunk(chunk):
+    """Renames raw columns and adds the derived ones, in place."""
+    chunk.rename(columns=RENAMES, inplace=True)
+    # Total processing time (registration + triage + medical professional)
+    chunk['Total_Processing_Time'] = (
+        chunk['Time_to_Registration'] + chunk['Time_to_Triage'] + chunk['Time_to_Medical_Professional']
+    )
+    # Waiting after meeting the medical professional
+    chunk['Additional_Wait'] = chunk['Total_Wait_Time'] - chunk['Total_Processing_Time']
+    return chunk
 
-# Check if there's waiting after meeting medical professional
-df['Additional_Wait'] = df['Total_Wait_Time'] - df['Total_Processing_Time']
 
-# Extract hour and day of the week
-df['Visit_Hour'] = df['Time of Day']
-df['Day_of_Week'] = df['Day of Week']
+def find_raw_files(paths=DEFAULT_RAW_PATHS):
+    """Expands files and directories (all *.csv inside) into a sorted list of raw files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.csv")))
+        elif os.path.exists(path):
+            files.append(path)
+    return sorted({os.path.abspath(f) for f in files})
 
-# Save cleaned data
-df.to_csv('C:/Users/shiva/Desktop/ER-Simulation-Analysis/data/cleaned_er_data.csv', index=False)
 
-print("Data preprocessing completed successfully and saved to cleaned_er_data.csv.")
+def _file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def load_manifest(output_dir=DEFAULT_OUTPUT_DIR):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def process_file(raw_path, output_dir=DEFAULT_OUTPUT_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    Streams one raw CSV into the partitioned dataset. Returns the number of
+    rows and the written files relative to output_dir.
+    """
+    # Raw files with the same name in different directories get distinct parts
+    stem = os.path.splitext(os.path.basename(raw_path))[0]
+    stem = f"{stem}-{hashlib.sha1(raw_path.encode()).hexdigest()[:8]}"
+    writers = {}
+    rows = 0
+    try:
+        for chunk in pd.read_csv(raw_path, dtype=RAW_DTYPES, parse_dates=['Visit Date'], chunksize=chunk_rows):
+            transform_chunk(chunk)
+            month = chunk['Visit Date'].dt.strftime('%Y-%m')
+            for (hospital, visit_month), part in chunk.groupby([chunk['Hospital ID'], month], observed=True):
+                key = (str(hospital), visit_month)
+                if key not in writers:
+                    part_dir = os.path.join(output_dir, f"hospital={key[0]}", f"month={key[1]}")
+                    os.makedirs(part_dir, exist_ok=True)
+                    path = os.path.join(part_dir, f"{stem}.parquet")
+                    writers[key] = (path, pq.ParquetWriter(path + ".tmp", SCHEMA))
+                writers[key][1].write_table(pa.Table.from_pandas(part, schema=SCHEMA, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        for _, writer in writers.values():
+            writer.close()
+
+    # Files only appear under their final names once the whole raw file is done
+    for path, _ in writers.values():
+        os.replace(path + ".tmp", path)
+    return rows, sorted(os.path.relpath(path, output_dir) for path, _ in writers.values())
+
+
+def _remove_parts(entry, output_dir):
+    for part in entry['parts']:
+        part_path = os.path.join(output_dir, part)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def preprocess(raw_paths=DEFAULT_RAW_PATHS, output_dir=DEFAULT_OUTPUT_DIR, chunk_rows=CHUNK_ROWS, force=False):
+    """
+    Processes every raw file that is new or changed since the last run, and
+    removes the output of raw files no longer found under raw_paths.
+    Returns the list of raw files processed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    raw_files = find_raw_files(raw_paths)
+
+    # Raw files deleted or moved out of the inputs since the last run
+    removed = sorted(set(manifest) - set(raw_files))
+    for raw_path in removed:
+        _remove_parts(manifest.pop(raw_path), output_dir)
+        print(f"Removed the output of {raw_path}: it is no longer a raw input")
+    if removed:
+        _save_manifest(manifest, output_dir)
+
+    processed = []
+    for raw_path in raw_files:
+        signature = _file_signature(raw_path)
+        previous = manifest.get(raw_path)
+        if not force and previous is not None and previous['signature'] == signature:
+            continue
+
+        # Drop the output of an earlier version of this file
+        if previous is not None:
+            _remove_parts(previous, output_dir)
+
+        rows, parts = process_file(raw_path, output_dir, chunk_rows)
+        manifest[raw_path] = {'signature': signature, 'rows': rows, 'parts': parts}
+        _save_manifest(manifest, output_dir)
+        processed.append(raw_path)
+        print(f"Processed {raw_path}: {rows} rows into {len(parts)} partitions")
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess raw ER extracts into partitioned Parquet.")
+    parser.add_argument("raw", nargs="*", default=DEFAULT_RAW_PATHS, help="raw CSV files or directories of them; output of any other raw file is removed")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="reprocess every raw file")
+    args = parser.parse_args()
+
+    processed = preprocess(args.raw, args.output, args.chunk_rows, args.force)
+    if not processed:
+        print("Nothing to do: all raw files are up to date.")
+    else:
+        print(f"Data preprocessing completed successfully, dataset saved to {args.output}.")
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.parameter_store import DEFAULT_DATA_PATH, MANIFEST_NAME
+
+# -------------------------------
+# Aggregated EDA tables
+# -------------------------------
+# The EDA figures only need a few group-by aggregates and a correlation
+# matrix. compute_tables() gets all of them in one chunked pass over the
+# dataset (cleaned CSV or the Parquet dataset from data_preprocessing.py), and
+# load_tables() caches the result as a small JSON file keyed by a fingerprint
+# of the dataset, so plots and the dashboard never touch row-level data again
+# until the dataset changes.
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+DEFAULT_CACHE_DIR = os.path.join(data_dir, "eda_cache")
+CHUNK_ROWS = 200_000
+TABLES_VERSION = 2  # bump when the tables change, so cached files from older code are not reused
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+TIME_OF_DAY_ORDER = ['Early Morning', 'Late Morning', 'Afternoon', 'Evening', 'Night']
+URGENCY_ORDER = ['Low', 'Medium', 'High', 'Critical']
+
+WAIT_COLUMN = 'Total_Wait_Time'
+COUNT_COLUMNS = {'visits_by_hour': 'Visit_Hour', 'visits_by_day': 'Day_of_Week'}
+MEAN_WAIT_COLUMNS = {'wait_by_hospital': 'Hospital Name', 'wait_by_urgency': 'Urgency Level'}
+CORRELATION_COLUMNS = [
+    'Nurse-to-Patient Ratio', 'Specialist Availability', 'Facility Size (Beds)',
+    'Time_to_Registration', 'Time_to_Triage', 'Time_to_Medical_Professional',
+    'Total_Wait_Time', 'Total_Processing_Time', 'Additional_Wait', 'Patient Satisfaction'
+]
+
+_cache = {}
+
+
+def dataset_fingerprint(data_path=DEFAULT_DATA_PATH):
+    """Short hash identifying the dataset's current contents (file stats, or the Parquet manifest)."""
+    data_path = os.path.abspath(data_path)
+    digest = hashlib.sha256(f"{TABLES_VERSION}:{data_path}".encode())
+    if os.path.isdir(data_path):
+        with open(os.path.join(data_path, MANIFEST_NAME), 'rb') as f:
+            digest.update(f.read())
+    else:
+        stat = os.stat(data_path)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _iter_chunks(data_path, columns, chunk_rows):
+    import pandas as pd
+
+    if os.path.isdir(data_path):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(data_path, format='parquet', partitioning='hive', exclude_invalid_files=True)
+        for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(data_path, usecols=columns, chunksize=chunk_rows)
+
+
+def _add_counts(table, values, weights=None):
+    # Counts (or weight sums) per label of one chunk, merged into a {label: total} dict
+    totals = values.value_counts() if weights is None else weights.groupby(values, observed=True).sum()
+    for label, total in totals.items():
+        if total:
+            table[str(label)] = table.get(str(label), 0) + (int(total) if weights is None else float(total))
+
+
+def compute_tables(data_path=DEFAULT_DATA_PATH, chunk_rows=CHUNK_ROWS):
+    """
+    One pass over the dataset. Returns a dict of plain (JSON-ready) tables:
+    visit counts per time of day and day of week, wait-time sums/counts per
+    hospital and urgency level, counts per whole wait minute, and the
+    correlation matrix of CORRELATION_COLUMNS.
+    """
+    columns = sorted(set(COUNT_COLUMNS.values()) | set(MEAN_WAIT_COLUMNS.values()) | set(CORRELATION_COLUMNS))
+    counts = {name: {} for name in COUNT_COLUMNS}
+    wait_sums = {name: {} for name in MEAN_WAIT_COLUMNS}
+    wait_counts = {name: {} for name in MEAN_WAIT_COLUMNS}
+    wait_minutes = {}
+    k = len(CORRELATION_COLUMNS)
+    n, mean, m2 = 0, np.zeros(k), np.zeros((k, k))
+
+    for chunk in _iter_chunks(data_path, columns, chunk_rows):
+        for name, column in COUNT_COLUMNS.items():
+            _add_counts(counts[name], chunk[column])
+        for name, column in MEAN_WAIT_COLUMNS.items():
+            _add_counts(wait_sums[name], chunk[column], chunk[WAIT_COLUMN].astype(np.float64))
+            _add_counts(wait_counts[name], chunk[column])
+        _add_counts(wait_minutes, chunk[WAIT_COLUMN].round().astype(np.int64))
+
+        # Co-moments merged chunk by chunk (Chan et al.), as in RunningStats
+        x = chunk[CORRELATION_COLUMNS].to_numpy(dtype=np.float64)
+        if len(x) == 0:
+            continue
+        chunk_mean = x.mean(axis=0)
+        centred = x - chunk_mean
+        delta = chunk_mean - mean
+        total = n + len(x)
+        m2 += centred.T @ centred + np.outer(delta, delta) * n * len(x) / total
+        mean += delta * len(x) / total
+        n = total
+
+    std = np.sqrt(np.diag(m2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = m2 / np.outer(std, std)
+
+    minutes = sorted(wait_minutes, key=int)
+    return {
+        'rows': n,
+        **counts,
+        **{name: {'sum': wait_sums[name], 'count': wait_counts[name]} for name in MEAN_WAIT_COLUMNS},
+        'wait_minutes': {'minutes': [int(m) for m in minutes], 'counts': [wait_minutes[m] for m in minutes]},
+        'correlation': {'columns': CORRELATION_COLUMNS, 'matrix': np.round(corr, 6).tolist()},
+    }
+
+
+def load_tables(data_path=DEFAULT_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    """Returns the EDA tables for the dataset, computing them only if its fingerprint is new."""
+    fingerprint = dataset_fingerprint(data_path)
+    tables = _cache.get(fingerprint)
+    if tables is not None:
+        return tables
+
+    path = os.path.join(cache_dir, f"{fingerprint}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            tables = json.load(f)
+    else:
+        tables = compute_tables(data_path)
+        tables['fingerprint'] = fingerprint
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(tables, f)
+        os.replace(path + ".tmp", path)
+    _cache[fingerprint] = tables
+    return tables
+
+
+def ordered(table, order=None):
+    """(labels, values) of a {label: value} table, in the given order where known, else sorted."""
+    order = order or []
+    labels = [l for l in order if l in table] + sorted(l for l in table if l not in order)
+    return labels, [table[l] for l in labels]
+
+
+def mean_wait(tables, name, order=None):
+    """(labels, mean total wait in minutes) for 'wait_by_hospital' or 'wait_by_urgency'."""
+    labels, sums = ordered(tables[name]['sum'], order)
+    counts = [tables[name]['count'][l] for l in labels]
+    return labels, [s / c for s, c in zip(sums, counts)]
+
+
+def wait_histogram(tables, bins=30):
+    """(bin edges, counts) of total wait time, rebinned from the per-minute counts."""
+    minutes = np.asarray(tables['wait_minutes']['minutes'], dtype=float)
+    counts = np.asarray(tables['wait_minutes']['counts'], dtype=float)
+    hist, edges = np.histogram(minutes, bins=bins, weights=counts)
+    return edges, hist
+
+
+def wait_density(tables, points=200):
+    """(x, density) Gaussian KDE of total wait time (Scott's rule), from the per-minute counts."""
+    minutes = np.asarray(tables['wait_minutes']['minutes'], dtype=float)
+    counts = np.asarray(tables['wait_minutes']['counts'], dtype=float)
+    n = counts.sum()
+    mean = np.dot(minutes, counts) / n
+    std = np.sqrt(np.dot((minutes - mean) ** 2, counts) / max(n - 1, 1))
+    bandwidth = 1.06 * std * n ** -0.2 or 1.0
+    x = np.linspace(minutes.min() - 3 * bandwidth, minutes.max() + 3 * bandwidth, points)
+    z = (x[:, None] - minutes[None, :]) / bandwidth
+    density = (np.exp(-0.5 * z ** 2) @ counts) / (n * bandwidth * np.sqrt(2 * np.pi))
+    return x, density
@@ -0,0 +1,299 @@
+import os
+import sys
+import multiprocessing
+import numpy as np
+
+# Add project root to sys.path so worker processes can import the backend
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from scripts.incremental_engine import RESOURCES, IncrementalSimulation
+from scripts.parameter_store import DEFAULT_DATA_PATH, dataset_key, get_service_means
+
+# -------------------------------
+# Multi-hospital network
+# -------------------------------
+# Every hospital in the dataset is simulated at once, each with the service
+# means fitted from its own rows, its own staffing and its share of the
+# network's arrivals. Hospitals are IncrementalSimulations partitioned over
+# worker processes. Without diversion they never interact, so every worker
+# runs its hospitals to the end in one go. With diversion, a hospital whose
+# queues (nurse plus doctor) reach the threshold sends new arrivals to the
+# least busy hospital of its region that is not itself diverting, where they
+# are admitted transfer_time minutes later. The workers then synchronize
+# every transfer_time minutes: they exchange the diverted patients and
+# publish their queue lengths, which decide the diversions of the next
+# window. A patient diverted during a window always arrives after it ends
+# (the transfer time is the lookahead), so nothing else has to be
+# exchanged. Results do not depend on the number of workers: every hospital
+# has its own random streams (a child of the seed) and sees the same
+# published state at the same times.
+
+_cache = {}
+
+
+def _hospital_rows(data_path):
+    import pandas as pd
+
+    columns = ['Hospital ID', 'Hospital Name', 'Region', 'Facility Size (Beds)']
+    if os.path.isdir(data_path):
+        df = pd.read_parquet(data_path, columns=columns)
+    else:
+        df = pd.read_csv(data_path, usecols=columns)
+    grouped = df.groupby('Hospital ID', sort=True, observed=True)
+    return [
+        {'id': str(key), 'name': str(rows['Hospital Name'].iloc[0]), 'region': str(rows['Region'].iloc[0]),
+         'beds': int(rows['Facility Size (Beds)'].median()), 'visits': len(rows)}
+        for key, rows in grouped
+    ]
+
+
+def load_hospitals(data_path=DEFAULT_DATA_PATH):
+    """
+    The dataset's hospitals, ordered by ID: id, name, region, median beds,
+    visits, share of all visits and the service means fitted from their
+    rows. Read at most once per (path, mtime).
+    """
+    key = dataset_key(data_path)
+    hospitals = _cache.get(key)
+    if hospitals is not None:
+        return hospitals
+
+    hospitals = _hospital_rows(key[0])
+    total = sum(h['visits'] for h in hospitals)
+    for h in hospitals:
+        h['share'] = h['visits'] / total
+        h['means'] = get_service_means(data_path, group='hospital', key=h['id'], use_sidecar=True)
+
+    for old_key in [k for k in _cache if k[0] == key[0]]:
+        del _cache[old_key]
+    _cache[key] = hospitals
+    return hospitals
+
+
+class _Partition:
+    """The hospitals one worker simulates, with their accumulated statistics."""
+
+    def __init__(self, specs):
+        self.sims = {}
+        self.stats = {}
+        for spec in specs:
+            sim = IncrementalSimulation(spec['num_doctors'], spec['num_nurses'], spec['arrival_rate'],
+                                        seed=spec['seed'], means=spec['means'])
+            self.sims[spec['id']] = sim
+            self.stats[spec['id']] = {'waits': [], 'queue': dict.fromkeys(RESOURCES, 0.0),
+                                      'busy': dict.fromkeys(RESOURCES, 0.0), 'transfers_in': 0}
+
+    def advance(self, until, transfers, thresholds):
+        """
+        Admits the transfers ({hospital: [(time, arrival)]}), sets the
+        diversion thresholds and runs every hospital to until. Returns the
+        diverted arrivals and the queue lengths at until, per hospital.
+        """
+        diverted, queues = {}, {}
+        for hospital_id, sim in self.sims.items():
+            stats = self.stats[hospital_id]
+            for time, arrival in transfers.get(hospital_id, ()):
+                sim.transfer(time, arrival)
+                stats['transfers_in'] += 1
+            sim.divert_threshold = thresholds.get(hospital_id)
+            start = sim.now
+            interval = sim.advance(until)
+            stats['waits'].append(interval['waits'])
+            for r in RESOURCES:
+                stats['queue'][r] += interval['queue'][r] * (until - start)
+                stats['busy'][r] += interval['busy'][r] * (until - start)
+            diverted[hospital_id], sim.diverted = sim.diverted, []
+            queues[hospital_id] = sum(sim.queue_lengths().values())
+        return diverted, queues
+
+    def results(self):
+        return {
+            hospital_id: {'waits': np.concatenate(stats['waits']), 'queue': stats['queue'], 'busy': stats['busy'],
+                          'transfers_in': stats['transfers_in'],
+                          'capacity': dict(self.sims[hospital_id].capacity)}
+            for hospital_id, stats in self.stats.items()
+        }
+
+
+def _partition_worker(conn, specs):
+    partition = _Partition(specs)
+    while True:
+        message = conn.recv()
+        if message is None:
+            conn.send(partition.results())
+            conn.close()
+            return
+        conn.send(partition.advance(*message))
+
+
+class _LocalPartition:
+    """In-process stand-in for a worker, with the same request/reply protocol."""
+
+    def __init__(self, specs):
+        self.partition = _Partition(specs)
+        self.reply = None
+
+    def send(self, message):
+        self.reply = self.partition.results() if message is None else self.partition.advance(*message)
+
+    def recv(self):
+        return self.reply
+
+
+def _partition_specs(specs, workers):
+    """Splits the hospitals over workers, busiest first onto the least loaded worker."""
+    parts = [[] for _ in range(workers)]
+    load = np.zeros(workers)
+    for spec in sorted(specs, key=lambda s: -s['arrival_rate']):
+        w = int(np.argmin(load))
+        parts[w].append(spec)
+        load[w] += spec['arrival_rate']
+    return [p for p in parts if p]
+
+
+def run_network_simulation(arrival_rate, sim_time=24 * 60, staffing=(3, 5), diversion_threshold=None,
+                           transfer_time=15, workers=None, seed=None, data_path=DEFAULT_DATA_PATH):
+    """
+    Simulates every hospital of the dataset for sim_time minutes.
+    arrival_rate is the network's patients per hour, split by each
+    hospital's share of the visits. staffing is one (doctors, nurses) pair
+    for every hospital or a {hospital ID: (doctors, nurses)} dict.
+    diversion_threshold (queued patients) enables diversion within a region
+    with a transfer_time-minute transfer. workers=None uses every core (at
+    most one per hospital), workers=1 runs in-process.
+    Returns network totals and per-hospital metrics under 'Hospitals'.
+    """
+    hospitals = load_hospitals(data_path)
+    if isinstance(staffing, dict):
+        missing = [h['id'] for h in hospitals if h['id'] not in staffing]
+        if missing:
+            raise KeyError(f"No staffing given for hospitals {missing}")
+    if diversion_threshold is not None and transfer_time <= 0:
+        raise ValueError("Diversion needs a positive transfer_time")
+
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    specs = []
+    for i, h in enumerate(hospitals):
+        num_doctors, num_nurses = staffing[h['id']] if isinstance(staffing, dict) else staffing
+        specs.append({
+            'id': h['id'], 'num_doctors': int(num_doctors), 'num_nurses': int(num_nurses),
+            'arrival_rate': arrival_rate * h['share'], 'means': h['means'],
+            'seed': np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key + (i,)),
+        })
+
+    workers = min(workers or os.cpu_count() or 1, len(specs))
+    parts = _partition_specs(specs, workers)
+    owner = {spec['id']: w for w, part in enumerate(parts) for spec in part}
+    if len(parts) == 1:
+        conns = [_LocalPartition(parts[0])]
+        processes = []
+    else:
+        conns, processes = [], []
+        for part in parts:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_partition_worker, args=(child, part), daemon=True)
+            process.start()
+            conns.append(parent)
+            processes.append(process)
+
+    region_peers = {h['id']: [g['id'] for g in hospitals if g['region'] == h['region'] and g['id'] != h['id']]
+                    for h in hospitals}
+    queues = {h['id']: 0 for h in hospitals}
+    pending = {h['id']: [] for h in hospitals}  # transfers not yet sent to their hospital
+    diverted_out = dict.fromkeys(queues, 0)
+    window = sim_time if diversion_threshold is None else transfer_time
+    now = 0.0
+    try:
+        while now < sim_time:
+            until = min(now + window, sim_time)
+            # Diversion targets for this window, from the queues published at now
+            targets, thresholds = {}, {}
+            if diversion_threshold is not None:
+                for hospital_id, peers in region_peers.items():
+                    open_peers = [p for p in peers if queues[p] < diversion_threshold]
+                    if open_peers:
+                        targets[hospital_id] = min(open_peers, key=lambda p: queues[p])
+                        thresholds[hospital_id] = diversion_threshold
+            for w, conn in enumerate(conns):
+                transfers = {}
+                for hospital_id in [s['id'] for s in parts[w]]:
+                    due = [tr for tr in pending[hospital_id] if tr[0] < until]
+                    pending[hospital_id] = [tr for tr in pending[hospital_id] if tr[0] >= until]
+                    if due:
+                        transfers[hospital_id] = due
+                conn.send((until, transfers, thresholds))
+            for conn in conns:
+                diverted, published = conn.recv()
+                queues.update(published)
+                for hospital_id, times in diverted.items():
+                    if not times:
+                        continue
+                    diverted_out[hospital_id] += len(times)
+                    pending[targets[hospital_id]].extend((t + transfer_time, t) for t in times)
+            now = until
+        for conn in conns:
+            conn.send(None)
+        results = {}
+        for conn in conns:
+            results.update(conn.recv())
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    per_hospital = {}
+    for h in hospitals:
+        r = results[h['id']]
+        waits = r['waits']
+        per_hospital[h['id']] = {
+            'Hospital Name': h['name'],
+            'Region': h['region'],
+            'Doctors': r['capacity']['doctor'],
+            'Nurses': r['capacity']['nurse'],
+            'Arrival Rate (per hour)': round(arrival_rate * h['share'], 2),
+            'Average Wait Time (min)': round(float(waits.mean()), 2) if len(waits) else 0,
+            'Wait Time P90 (min)': round(float(np.percentile(waits, 90)), 2) if len(waits) else 0,
+            'Total Patients Treated': len(waits),
+            'Doctor Utilization (%)': round(float(100 * r['busy']['doctor'] / sim_time / r['capacity']['doctor']), 2),
+            'Nurse Utilization (%)': round(float(100 * r['busy']['nurse'] / sim_time / r['capacity']['nurse']), 2),
+            'Avg Queue Length': round(float(sum(r['queue'].values()) / sim_time), 2),
+            'Patients Diverted Out': diverted_out[h['id']],
+            'Patients Diverted In': r['transfers_in'],
+        }
+    all_waits = np.concatenate([results[h['id']]['waits'] for h in hospitals])
+    return {
+        'Average Wait Time (min)': round(float(all_waits.mean()), 2) if len(all_waits) else 0,
+        'Wait Time P90 (min)': round(float(np.percentile(all_waits, 90)), 2) if len(all_waits) else 0,
+        'Total Patients Treated': len(all_waits),
+        'Patients Diverted': sum(diverted_out.values()),
+        'Patients In Transfer': sum(len(p) for p in pending.values()),
+        'Hospitals': per_hospital,
+    }
+
+
+if __name__ == "__main__":
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate every hospital in the dataset as one network.")
+    parser.add_argument("--arrival-rate", type=float, default=50, help="network patients per hour")
+    parser.add_argument("--sim-time", type=float, default=24 * 60)
+    parser.add_argument("--doctors", type=int, default=3)
+    parser.add_argument("--nurses", type=int, default=5)
+    parser.add_argument("--diversion-threshold", type=int, default=None)
+    parser.add_argument("--transfer-time", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    network = run_network_simulation(args.arrival_rate, args.sim_time, (args.doctors, args.nurses),
+                                     args.diversion_threshold, args.transfer_time, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    for hospital_id, metrics in network.pop('Hospitals').items():
+        print(f"{hospital_id} {metrics}")
+    print(network)
+    print(f"{elapsed:.2f}s")
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+# -------------------------------
+# Import-time benchmark
+# -------------------------------
+# Cold-start cost of the dashboard and of every worker process is dominated by
+# imports. Each module below is imported in a fresh interpreter (so nothing is
+# cached in sys.modules) and timed; the run fails if a module exceeds its
+# budget or drags in a heavy dependency it is not supposed to need.
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+HEAVY_MODULES = ('pandas', 'torch', 'stable_baselines3', 'plotly', 'matplotlib', 'streamlit')
+
+# module -> (budget in seconds, heavy modules it may import)
+MODULES = {
+    'scripts': (0.05, ()),
+    'scripts.simulation_backend': (0.5, ()),
+    'scripts.replications': (0.5, ()),
+    'scripts.job_service': (0.5, ()),
+    'scripts.staffing_grid': (0.5, ()),
+    'scripts.eda_tables': (0.5, ()),
+    'scripts.incremental_engine': (0.5, ()),
+    'scripts.hospital_network': (0.5, ()),
+    'scripts.result_store': (0.5, ()),
+    'rl_agent.er_env': (0.8, ()),
+    'rl_agent.model_registry': (0.8, ()),
+    'rl_agent.er_vec_env': (5.0, ('torch', 'stable_baselines3', 'pandas', 'matplotlib')),
+}
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module, repeats=5):
+    """Returns (median seconds, heavy modules loaded) for importing module in fresh interpreters."""
+    times, heavy = [], []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             cwd=project_root, capture_output=True, text=True, check=True)
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(probe['seconds'])
+        heavy = probe['heavy']
+    return statistics.median(times), heavy
+
+
+def run(modules=MODULES, repeats=5):
+    """Times every module; returns a list of result dicts with an 'ok' flag each."""
+    results = []
+    for module, (budget, allowed) in modules.items():
+        seconds, heavy = time_import(module, repeats)
+        unexpected = [m for m in heavy if m not in allowed]
+        results.append({
+            'module': module,
+            'seconds': seconds,
+            'budget': budget,
+            'unexpected_imports': unexpected,
+            'ok': seconds <= budget and not unexpected,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time cold imports of the project modules.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(repeats=args.repeats)
+    for r in results:
+        status = "ok" if r['ok'] else "FAIL"
+        extra = f"  pulls in {', '.join(r['unexpected_imports'])}" if r['unexpected_imports'] else ""
+        print(f"{r['module']:<30} {r['seconds'] * 1000:8.1f} ms  (budget {r['budget'] * 1000:6.0f} ms)  {status}{extra}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
@@ -0,0 +1,183 @@
+import heapq
+from collections import deque
+import numpy as np
+
+from scripts.instrumentation import count
+from scripts.parameter_store import DEFAULT_DATA_PATH, get_service_means
+from scripts.random_streams import RandomStreams
+from scripts.stats_collector import TimeWeightedStat
+
+# -------------------------------
+# Incremental simulation for step-wise control
+# -------------------------------
+# The batch engines simulate a whole horizon with fixed staffing. Here the same
+# model (shared FIFO nurse queue for registration and triage, FIFO doctor
+# queue, per-patient draws from the same random streams) is kept as explicit
+# state that can be advanced by any interval, have its staffing changed in
+# between, and be checkpointed. The work per advance() is proportional to the
+# events in the interval. All patient records are immutable tuples, so a
+# checkpoint only copies the queues and the lists of patients in service.
+# With constant staffing the sample path is the same as run_er_simulation's
+# for the same seed. For networks of hospitals (see hospital_network) arrivals
+# can be diverted away while the queues are long, and patients diverted from
+# elsewhere can be admitted at a later time.
+
+RESOURCES = ('nurse', 'doctor')
+
+
+class IncrementalSimulation:
+    """
+    ER model advanced in steps. advance(until) processes every event before
+    until and returns the interval's statistics; set_staffing() changes the
+    number of doctors and nurses in between (busy staff above a reduced
+    capacity finish their patient first, as with shift changes).
+    """
+
+    def __init__(self, num_doctors, num_nurses, arrival_rate, data_path=DEFAULT_DATA_PATH, seed=None, means=None):
+        if means is None:
+            means = get_service_means(data_path, use_sidecar=True)
+        self.means = (means['registration'], means['triage'], means['consultation'])
+        self.mean_gap = 60 / arrival_rate
+        self.streams = RandomStreams(seed)
+        self.now = 0.0
+        self.capacity = {'nurse': num_nurses, 'doctor': num_doctors}
+        self.queues = {r: deque() for r in RESOURCES}      # (patient, stage) in request order
+        self.in_service = {r: [] for r in RESOURCES}       # heaps of (end, seq, patient, stage)
+        self.treated = 0
+        self._seq = 0
+        self.next_arrival = self.streams['arrivals'].exponential(self.mean_gap)
+        # Diversion: while divert_threshold is set and at least that many
+        # patients are queued, arrivals are not admitted but appended to
+        # diverted; transfers holds (admission time, original arrival) of
+        # patients diverted here from elsewhere
+        self.divert_threshold = None
+        self.diverted = []
+        self.transfers = []
+
+    # Patients are (arrival, registration, triage, consultation); stage 0 is
+    # registration, 1 triage, 2 consultation
+
+    def _start(self, resource, patient, stage):
+        self._seq += 1
+        heapq.heappush(self.in_service[resource], (self.now + patient[stage + 1], self._seq, patient, stage))
+
+    def _dispatch(self, resource):
+        queue, busy, capacity = self.queues[resource], self.in_service[resource], self.capacity[resource]
+        while queue and len(busy) < capacity:
+            self._start(resource, *queue.popleft())
+
+    def _request(self, resource, patient, stage):
+        self.queues[resource].append((patient, stage))
+        self._dispatch(resource)
+
+    def set_staffing(self, num_doctors, num_nurses):
+        self.capacity['doctor'] = num_doctors
+        self.capacity['nurse'] = num_nurses
+        for resource in RESOURCES:
+            self._dispatch(resource)
+
+    def queue_lengths(self):
+        return {r: len(self.queues[r]) for r in RESOURCES}
+
+    def transfer(self, time, arrival):
+        """Admits a patient at time who first arrived elsewhere at arrival (waits count from arrival)."""
+        heapq.heappush(self.transfers, (time, arrival))
+
+    def _admit(self, arrival):
+        streams = self.streams
+        patient = (arrival,
+                   streams['registration'].exponential(self.means[0]),
+                   streams['triage'].exponential(self.means[1]),
+                   streams['consultation'].exponential(self.means[2]))
+        self._request('nurse', patient, 0)
+
+    def advance(self, until):
+        """
+        Runs the model up to (not including) time until. Returns the wait
+        times of patients who finished in the interval and the time-weighted
+        queue lengths, busy servers and servers on duty over it, per
+        resource. Staff above a reduced capacity count as on duty until they
+        finish their patient, so busy never exceeds on_duty.
+        """
+        start = self.now
+        capacity = self.capacity
+        queue_stats = {r: TimeWeightedStat(start, len(self.queues[r])) for r in RESOURCES}
+        busy_stats = {r: TimeWeightedStat(start, len(self.in_service[r])) for r in RESOURCES}
+        on_duty_stats = {r: TimeWeightedStat(start, max(capacity[r], len(self.in_service[r]))) for r in RESOURCES}
+        # Per resource: its queue and servers with their stats; a stat is only
+        # updated when its level changes (on_duty only moves while busy > capacity)
+        tracked = [(self.queues[r], self.in_service[r], queue_stats[r], busy_stats[r], on_duty_stats[r], capacity[r])
+                   for r in RESOURCES]
+        waits = []
+        nurses, doctors = self.in_service['nurse'], self.in_service['doctor']
+        queues, transfers = self.queues, self.transfers
+        events = 0
+
+        while True:
+            t_arrival = self.next_arrival
+            t_nurse = nurses[0][0] if nurses else np.inf
+            t_doctor = doctors[0][0] if doctors else np.inf
+            t_transfer = transfers[0][0] if transfers else np.inf
+            t = min(t_arrival, t_nurse, t_doctor, t_transfer)
+            if t >= until:
+                break
+            self.now = t
+            events += 1
+            if t == t_nurse:
+                _, _, patient, stage = heapq.heappop(nurses)
+                # The freed nurse goes to the head of the queue before the
+                # patient's next request joins its end
+                self._dispatch('nurse')
+                if stage == 0:
+                    self._request('nurse', patient, 1)
+                else:
+                    self._request('doctor', patient, 2)
+            elif t == t_doctor:
+                _, _, patient, _ = heapq.heappop(doctors)
+                waits.append(t - patient[0])
+                self.treated += 1
+                self._dispatch('doctor')
+            elif t == t_transfer:
+                self._admit(heapq.heappop(transfers)[1])
+            else:
+                threshold = self.divert_threshold
+                if threshold is not None and len(queues['nurse']) + len(queues['doctor']) >= threshold:
+                    self.diverted.append(t)
+                else:
+                    self._admit(t)
+                self.next_arrival = t + self.streams['arrivals'].exponential(self.mean_gap)
+            for queue, in_service, queue_stat, busy_stat, on_duty_stat, servers in tracked:
+                if len(queue) != queue_stat.level:
+                    queue_stat.update(t, len(queue))
+                busy = len(in_service)
+                if busy != busy_stat.level:
+                    busy_stat.update(t, busy)
+                    if max(servers, busy) != on_duty_stat.level:
+                        on_duty_stat.update(t, max(servers, busy))
+
+        self.now = until
+        count('incremental/events', events)
+        count('sim_minutes', until - start)
+        return {
+            'waits': np.array(waits),
+            'queue': {r: queue_stats[r].mean(until) for r in RESOURCES},
+            'busy': {r: busy_stats[r].mean(until) for r in RESOURCES},
+            'on_duty': {r: on_duty_stats[r].mean(until) for r in RESOURCES},
+        }
+
+    def checkpoint(self):
+        """Copy of the simulation state for restore(); O(patients in the system)."""
+        return (self.now, self.next_arrival, self.treated, self._seq, dict(self.capacity),
+                {r: deque(q) for r, q in self.queues.items()},
+                {r: list(h) for r, h in self.in_service.items()},
+                self.streams.get_state(), list(self.diverted), list(self.transfers))
+
+    def restore(self, checkpoint):
+        (self.now, self.next_arrival, self.treated, self._seq, capacity, queues, in_service,
+         stream_state, diverted, transfers) = checkpoint
+        self.capacity = dict(capacity)
+        self.diverted = list(diverted)
+        self.transfers = list(transfers)
+        self.queues = {r: deque(q) for r, q in queues.items()}
+        self.in_service = {r: list(h) for r, h in in_service.items()}
+        self.streams.set_state(stream_state)
@@ -0,0 +1,173 @@
+import os
+import io
+import time
+from contextlib import contextmanager
+
+# -------------------------------
+# Opt-in instrumentation
+# -------------------------------
+# Named timers and counters for the simulation, the environments and
+# training, e.g. time spent loading parameters, per engine phase and in PPO
+# updates, events processed and random draws per stream. Instrumentation is
+# off unless enabled (instrumented() or ER_INSTRUMENT=1): a disabled timer()
+# returns a shared no-op context manager and count() returns at once, and
+# both are only used per run or per step, never per event. Counts that
+# change per event (draws, SimPy events) are read from state the code keeps
+# anyway at the end of a run. profile() wraps a block in cProfile, or in
+# pyinstrument's sampling profiler when it is installed and sampling=True.
+
+ENV_VAR = 'ER_INSTRUMENT'
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('instrumentation', 'name', 'start')
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentation.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    """Named timers (calls, seconds) and counters, recorded only while enabled."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timers = {}
+        self.counters = {}
+
+    def timer(self, name):
+        """Context manager adding the time spent in its block to timer name."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        """Adds one call taking seconds to timer name (for code that times itself anyway)."""
+        if self.enabled:
+            total = self.timers.get(name)
+            if total is None:
+                self.timers[name] = [1, seconds]
+            else:
+                total[0] += 1
+                total[1] += seconds
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    def report(self):
+        """Timers and counters as a JSON-serializable dict, timers slowest first."""
+        timers = sorted(self.timers.items(), key=lambda item: -item[1][1])
+        return {
+            'timers': {
+                name: {'calls': calls, 'seconds': seconds, 'mean_ms': 1000 * seconds / calls}
+                for name, (calls, seconds) in timers
+            },
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def format_report(self):
+        report = self.report()
+        lines = [f"{'timer':<32} {'calls':>8} {'total (s)':>10} {'mean (ms)':>10}"]
+        for name, t in report['timers'].items():
+            lines.append(f"{name:<32} {t['calls']:>8} {t['seconds']:>10.3f} {t['mean_ms']:>10.3f}")
+        lines.append(f"{'counter':<32} {'value':>8}")
+        for name, value in report['counters'].items():
+            lines.append(f"{name:<32} {value:>8,.0f}")
+        return "\n".join(lines)
+
+
+# Process-wide instance used by the simulation, the environments and training
+instrumentation = Instrumentation(enabled=os.environ.get(ENV_VAR, '') not in ('', '0'))
+
+
+def timer(name):
+    return instrumentation.timer(name)
+
+
+def add_time(name, seconds):
+    instrumentation.add_time(name, seconds)
+
+
+def count(name, n=1):
+    instrumentation.count(name, n)
+
+
+@contextmanager
+def instrumented(reset=True):
+    """Enables instrumentation for the block (cleared first unless reset=False) and yields it."""
+    was_enabled = instrumentation.enabled
+    if reset:
+        instrumentation.reset()
+    instrumentation.enabled = True
+    try:
+        yield instrumentation
+    finally:
+        instrumentation.enabled = was_enabled
+
+
+@contextmanager
+def profile(path=None, sampling=False, top=30):
+    """
+    Profiles the block. With path the profile is written there (cProfile
+    stats for pstats/snakeviz, or pyinstrument HTML when sampling=True),
+    otherwise the top entries by cumulative time are printed.
+    """
+    if sampling:
+        try:
+            from pyinstrument import Profiler
+        except ImportError as exc:
+            raise ImportError("Sampling profiles need pyinstrument (pip install pyinstrument)") from exc
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            if path:
+                with open(path, 'w') as f:
+                    f.write(profiler.output_html())
+            else:
+                print(profiler.output_text())
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        else:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+            print(out.getvalue())
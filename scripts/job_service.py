@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import asyncio
+import threading
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.replications import DEFAULT_CONFIG, _run_replication, get_pool, stack_results
+
+# -------------------------------
+# Local job service for replication batches
+# -------------------------------
+# JobService runs replication batches off the caller's thread: an asyncio event
+# loop in a background thread schedules small batches of replications on the
+# shared process pool. Submitting a configuration that is already running
+# returns the same Job (identical in-flight requests share the work), partial
+# results can be read while the job runs, and a job is cancelled once every
+# caller that submitted it has released it. Everything runs in-process; there
+# is no external broker. With a ResultStore, replications go through the store
+# (see replications.run_replications).
+
+PENDING, RUNNING, DONE, CANCELLED, FAILED = 'pending', 'running', 'done', 'cancelled', 'failed'
+
+
+def job_key(config, n, seed=None):
+    """Canonical key of a request; identical keys share one in-flight job."""
+    return json.dumps({'config': {**DEFAULT_CONFIG, **config}, 'n': n, 'seed': seed}, sort_keys=True, default=str)
+
+
+def _run_batch(config, seed_seqs, store=None):
+    return [_run_replication(config, s, store) for s in seed_seqs]
+
+
+class Job:
+    """One batch of n replications, possibly shared by several callers."""
+
+    def __init__(self, key, config, n, seed=None):
+        self.key = key
+        self.config = config
+        self.n = n
+        self.seed_seq = np.random.SeedSequence(seed)
+        self.status = PENDING
+        self.error = None
+        self.completed = 0
+        self.subscribers = 0
+        self._results = [None] * n
+        self._future = None
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, CANCELLED, FAILED)
+
+    def _update(self, start=None, batch=(), status=None, error=None):
+        with self._changed:
+            if batch:
+                self._results[start:start + len(batch)] = batch
+                self.completed += len(batch)
+            if status is not None:
+                self.status = status
+                self.error = error
+            self._changed.notify_all()
+
+    def wait(self, seen=0, timeout=None):
+        """
+        Blocks until more than `seen` replications are done or the job has
+        finished (or timeout seconds pass); returns the completed count.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.completed > seen or self.finished, timeout)
+            return self.completed
+
+    def snapshot(self):
+        """
+        Returns {'status', 'completed', 'n', 'error', 'results'}, where
+        results is stack_results over the replications finished so far (in
+        replication order) plus 'seed' and 'config', or None if none are done.
+        """
+        with self._changed:
+            done = [r for r in self._results if r is not None]
+            snapshot = {'status': self.status, 'completed': self.completed, 'n': self.n, 'error': self.error}
+        if done:
+            stacked = stack_results(done)
+            stacked['seed'] = self.seed_seq.entropy
+            stacked['config'] = self.config
+            snapshot['results'] = stacked
+        else:
+            snapshot['results'] = None
+        return snapshot
+
+    def result(self, timeout=None):
+        """Waits for the job and returns its stacked results, as run_replications would."""
+        with self._changed:
+            if not self._changed.wait_for(lambda: self.finished, timeout):
+                raise TimeoutError(f"job did not finish within {timeout}s")
+        if self.status == FAILED:
+            raise self.error
+        if self.status == CANCELLED:
+            raise RuntimeError("job was cancelled")
+        return self.snapshot()['results']
+
+
+class JobService:
+    """
+    Runs replication jobs on a background asyncio loop backed by the shared
+    process pool. Safe to call from any thread (e.g. Streamlit script threads).
+    """
+
+    def __init__(self, workers=None, store=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.store = store
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="job-service", daemon=True)
+        self._thread.start()
+
+    def submit(self, config, n, seed=None):
+        """
+        Returns the Job running n replications of config, starting one unless
+        an identical request is already in flight. Every submit must be
+        matched by a release() once the caller no longer needs the job.
+        """
+        key = job_key(config, n, seed)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = Job(key, {**DEFAULT_CONFIG, **config}, n, seed)
+                self._jobs[key] = job
+                job._future = asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+            job.subscribers += 1
+        return job
+
+    def release(self, job):
+        """Drops one caller's interest in job, cancelling it if nobody else is waiting."""
+        with self._lock:
+            job.subscribers -= 1
+            if job.subscribers > 0 or job.finished:
+                return
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+        job._future.cancel()
+
+    def running_jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        workers = min(self.workers, job.n)
+        children = job.seed_seq.spawn(job.n)
+        # Small batches so partial results arrive often and cancellation is prompt
+        size = max(1, job.n // (workers * 4))
+        futures = {}
+        try:
+            if workers <= 1:
+                job._update(status=RUNNING)
+                for start in range(0, job.n, size):
+                    batch = await loop.run_in_executor(None, _run_batch, job.config,
+                                                       children[start:start + size], self.store)
+                    job._update(start, batch)
+            else:
+                pool = get_pool(workers)
+                for start in range(0, job.n, size):
+                    futures[loop.run_in_executor(pool, _run_batch, job.config, children[start:start + size],
+                                                 self.store)] = start
+                job._update(status=RUNNING)
+                pending = set(futures)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        job._update(futures[future], future.result())
+            job._update(status=DONE)
+        except asyncio.CancelledError:
+            # Batches that have not started yet are dropped from the pool queue
+            for future in futures:
+                future.cancel()
+            job._update(status=CANCELLED)
+            raise
+        except Exception as e:
+            job._update(status=FAILED, error=e)
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def shutdown(self):
+        for job in self.running_jobs():
+            job._future.cancel()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    service = JobService()
+    config = {'num_doctors': 3, 'num_nurses': 5, 'arrival_rate': 10, 'sim_time': 240, 'engine': 'numpy'}
+    job = service.submit(config, 40, seed=0)
+    assert service.submit(config, 40, seed=0) is job, "identical in-flight requests should share a job"
+    seen = 0
+    while not job.finished:
+        seen = job.wait(seen, timeout=1.0)
+        snapshot = job.snapshot()
+        if snapshot['results'] is not None:
+            print(f"{snapshot['completed']:>3}/{snapshot['n']} replications, "
+                  f"avg wait {snapshot['results']['means']['Average Wait Time (min)']:.2f} min")
+    print(f"status: {job.status}")
+    service.shutdown()
@@ -0,0 +1,462 @@
+import heapq
+import numpy as np
+
+from scripts.instrumentation import timer
+
+# -------------------------------
+# Vectorized queueing engine
+# -------------------------------
+# Same model as the SimPy backend: patients arrive as a Poisson stream, are
+# registered and then triaged by the shared nurse pool (one FIFO queue for both
+# stages) and are then seen by a doctor. Instead of one generator process per
+# patient, arrival times and service draws are generated in batch and start
+# times follow from a Kiefer-Wolfowitz recursion over the server free-times
+# (a Lindley recursion when there is a single server), which with a fixed
+# staff only steps through requests one at a time while the pool is congested
+# and settles the stretches where it keeps up in batch. With shift-based
+# staffing the pools instead track the patients in service and the number of
+# servers on duty (see _ShiftPool). Doctors serving by urgency run a small
+# event loop over a heap of waiting patients (see priority_service).
+
+def arrival_times(arrival_rate, sim_time, stream):
+    """Poisson arrival times in [0, sim_time), drawn in blocks from stream."""
+    mean_gap = 60 / arrival_rate
+    expected = sim_time / mean_gap
+    block = int(expected + 5 * np.sqrt(expected) + 10)
+    arrivals = np.cumsum(stream.exponentials(mean_gap, block))
+    while arrivals[-1] < sim_time:
+        more = arrivals[-1] + np.cumsum(stream.exponentials(mean_gap, block))
+        arrivals = np.concatenate([arrivals, more])
+    return arrivals[arrivals < sim_time]
+
+
+class _ShiftPool:
+    """
+    FIFO server pool whose size changes at the given times (capacities[j]
+    from change_times[j] on). A request starts once fewer patients are in
+    service than servers are on duty; staff going off duty finish their
+    patient first, as with MonitoredResource.set_capacity.
+    """
+
+    def __init__(self, change_times, capacities):
+        self.change_times = list(change_times) + [np.inf]
+        self.capacities = list(capacities)
+        self.segment = 0
+        self.in_service = []  # end times, as a heap
+        self.last_start = 0.0
+
+    def start(self, t, service):
+        """Start time of a request made at t (requests in chronological order)."""
+        if t < self.last_start:
+            t = self.last_start  # FIFO: queued behind the previous request
+        in_service, change_times = self.in_service, self.change_times
+        while True:
+            while change_times[self.segment + 1] <= t:
+                self.segment += 1
+            while in_service and in_service[0] <= t:
+                heapq.heappop(in_service)
+            if len(in_service) < self.capacities[self.segment]:
+                break
+            next_change = change_times[self.segment + 1]
+            t = in_service[0] if in_service[0] < next_change else next_change
+        heapq.heappush(in_service, t + service)
+        self.last_start = t
+        return t
+
+
+# Vectorized stretches of the fixed-size pools: while the servers keep up,
+# every request starts on request, which the recursions below would find one
+# request at a time. A stretch assumes that, counts the servers busy just
+# after each start, and commits everything before the first start that would
+# exceed the pool; the recursion then takes over from the exact state there.
+# Since every new end time is at least the earliest free time, the servers'
+# free times are always the `servers` largest end times so far.
+MIN_WINDOW, MAX_WINDOW = 64, 8192  # requests per vectorized stretch
+MIN_PATIENCE, MAX_PATIENCE = 16, 4096  # requests run one at a time before trying a stretch again
+WORTHWHILE_STRETCH = 128  # a stretch costs about as much as this many one-at-a-time requests
+
+
+class _Backoff:
+    """
+    When to try a vectorized stretch: again at once, with a doubled window,
+    while stretches get through; after a growing number of one-at-a-time
+    requests while the pool stays congested and stretches commit too little
+    to pay for themselves.
+    """
+
+    __slots__ = ('window', 'patience')
+
+    def __init__(self):
+        self.window = MIN_WINDOW
+        self.patience = MIN_PATIENCE
+
+    def record(self, committed, conflict):
+        """Records a stretch; returns the number of requests to run one at a time before the next."""
+        if not conflict:
+            self.window = min(2 * self.window, MAX_WINDOW)
+            self.patience = MIN_PATIENCE
+            return 0
+        self.window = MIN_WINDOW
+        wait = self.patience
+        self.patience = MIN_PATIENCE if committed >= WORTHWHILE_STRETCH else min(2 * self.patience, MAX_PATIENCE)
+        return wait
+
+
+def _busy_after(events, free, starts, ends):
+    """
+    Servers busy just after each event time if every request so far started
+    on request: services from before the stretch (free times after the event)
+    plus the stretch's services [starts, ends) covering the event.
+    """
+    before = len(free) - np.searchsorted(np.sort(free), events, side='right')
+    return (before + np.searchsorted(np.sort(starts), events, side='right')
+            - np.searchsorted(np.sort(ends), events, side='right'))
+
+
+def _top(free, ends, servers):
+    # New free-time heap: the largest end times (a sorted list is a valid heap)
+    if len(ends) == 0:
+        return free
+    return np.sort(np.concatenate([free, ends]))[-servers:].tolist()
+
+
+def _shared_pool_stretch(arrivals, registration, triage, servers, i, j, free, pending, reg_start, tri_start):
+    """
+    Vectorized stretch of shared_pool_start_times over arrivals i..j-1 and
+    the pending triage requests before arrival j. Returns the next arrival,
+    the free times and pending requests after the committed starts, the
+    number of starts committed and whether a request had to wait.
+    """
+    n = len(arrivals)
+    cutoff = arrivals[j] if j < n else np.inf
+    a = arrivals[i:j]
+    reg_end = a + registration[i:j]
+    tri_end = reg_end + triage[i:j]
+    p_time = np.array([t for t, _ in pending])
+    p_index = np.array([k for _, k in pending], dtype=np.int64)
+    p_end = p_time + triage[p_index]
+
+    # A patient registered and triaged on request holds one nurse from arrival to the end of triage
+    events = np.concatenate([a, reg_end[reg_end < cutoff], p_time[p_time < cutoff]])
+    busy = _busy_after(events, free, np.concatenate([a, p_time]), np.concatenate([tri_end, p_end]))
+    conflict = busy > servers
+    waited = bool(conflict.any())
+    until = events[conflict].min() if waited else cutoff
+
+    # Commit every start before the first request that would wait
+    m = int(np.searchsorted(a, until, side='left'))
+    reg_start[i:i + m] = a[:m]
+    triaged = reg_end[:m] < until
+    tri_start[np.arange(i, i + m)[triaged]] = reg_end[:m][triaged]
+    p_done = p_time < until
+    tri_start[p_index[p_done]] = p_time[p_done]
+    free = _top(free, np.concatenate([reg_end[:m], tri_end[:m][triaged], p_end[p_done]]), servers)
+
+    pending = (list(zip(reg_end[:m][~triaged].tolist(), np.arange(i, i + m)[~triaged].tolist()))
+               + list(zip(p_time[~p_done].tolist(), p_index[~p_done].tolist())))
+    heapq.heapify(pending)
+    committed = m + int(triaged.sum()) + int(p_done.sum())
+    return i + m, free, pending, committed, waited
+
+
+def fifo_start_times(request_times, service_times, servers):
+    """
+    Start times for a FIFO multi-server queue.
+    request_times must be sorted in ascending order. servers is a server
+    count or a (change times, capacities) pair from ShiftSchedule.changes.
+    """
+    n = len(request_times)
+    if n == 0:
+        return np.empty(0)
+    if isinstance(servers, tuple):
+        pool = _ShiftPool(*servers)
+        return np.array([pool.start(t, s) for t, s in zip(request_times.tolist(), service_times.tolist())])
+    if servers == 1:
+        # Lindley: end_k = S_k + max_{j<=k} (t_j - S_{j-1})
+        cum = np.cumsum(service_times)
+        prev = np.concatenate([[0.0], cum[:-1]])
+        ends = cum + np.maximum.accumulate(request_times - prev)
+        return ends - service_times
+
+    free = [0.0] * servers  # heap of the servers' free times (the largest end times so far)
+    starts = np.empty(n)
+    times, services = request_times.tolist(), service_times.tolist()
+    backoff = _Backoff()
+    wait = n if n < WORTHWHILE_STRETCH else 0  # a short queue is cheaper one request at a time
+    k = 0
+    while k < n:
+        if not wait:
+            # Vectorized stretch: requests that find a free server start on request
+            j = min(k + backoff.window, n)
+            t, ends = request_times[k:j], request_times[k:j] + service_times[k:j]
+            waits = _busy_after(t, free, t, ends) > servers
+            m = int(np.argmax(waits)) if waits.any() else j - k
+            starts[k:k + m] = t[:m]
+            free = _top(free, ends[:m], servers)
+            k += m
+            wait = backoff.record(m, k < j)
+        # Congested: one request at a time
+        end = min(k + wait, n)
+        for q in range(k, end):
+            t = times[q]
+            start = t if t > free[0] else free[0]
+            heapq.heapreplace(free, start + services[q])
+            starts[q] = start
+        k = end
+        wait = 0
+    return starts
+
+
+def shared_pool_start_times(arrivals, registration, triage, servers):
+    """
+    Start times for registration and triage, which queue FIFO for the same pool.
+    A triage request is issued when the patient's registration ends, so
+    requests are processed in chronological order from two merged streams.
+    servers is a server count or a (change times, capacities) pair.
+    """
+    n = len(arrivals)
+    reg_start = np.empty(n)
+    tri_start = np.empty(n)
+    arrivals_list = arrivals.tolist()
+    registration_list = registration.tolist()
+    triage_list = triage.tolist()
+
+    if isinstance(servers, tuple):
+        pool = _ShiftPool(*servers)
+        pending = []
+        i = 0
+        while i < n or pending:
+            if pending and (i == n or pending[0][0] < arrivals_list[i]):
+                t, k = heapq.heappop(pending)
+                tri_start[k] = pool.start(t, triage_list[k])
+            else:
+                start = reg_start[i] = pool.start(arrivals_list[i], registration_list[i])
+                heapq.heappush(pending, (start + registration_list[i], i))
+                i += 1
+        return reg_start, tri_start
+
+    free = [0.0] * servers
+    pending = []  # (triage request time, patient)
+    backoff = _Backoff()
+    wait = 2 * n if n < WORTHWHILE_STRETCH else 0  # two requests per patient
+    i = 0
+    while i < n or pending:
+        if not wait:
+            j = min(i + backoff.window, n)
+            i, free, pending, committed, waited = _shared_pool_stretch(arrivals, registration, triage, servers,
+                                                                       i, j, free, pending, reg_start, tri_start)
+            wait = backoff.record(committed, waited)
+        for _ in range(wait):
+            if pending and (i == n or pending[0][0] < arrivals_list[i]):
+                t, k = heapq.heappop(pending)
+                start = t if t > free[0] else free[0]
+                heapq.heapreplace(free, start + triage_list[k])
+                tri_start[k] = start
+            elif i < n:
+                t = arrivals_list[i]
+                start = t if t > free[0] else free[0]
+                end = start + registration_list[i]
+                heapq.heapreplace(free, end)
+                reg_start[i] = start
+                heapq.heappush(pending, (end, i))
+                i += 1
+            else:
+                break
+        wait = 0
+    return reg_start, tri_start
+
+
+def priority_service(request_times, priorities, service_times, servers, preemptive=False):
+    """
+    Multi-server queue served in priority order (lower first, FIFO within a
+    priority) from a heap. request_times must be sorted; servers is a count
+    or a (change times, capacities) pair. With preemptive=True a priority-0
+    request that finds every server busy takes over the one serving the
+    lowest-priority patient, who queues again and later resumes the rest of
+    its service (the same rule as simpy.PreemptiveResource).
+    Returns (ends, segment starts, segment ends, requeue times): each patient's
+    final end time, every uninterrupted stretch of service, and the times at
+    which preempted patients rejoined the queue.
+    """
+    n = len(request_times)
+    change_times, capacities = servers if isinstance(servers, tuple) else ([0.0], [servers])
+    change_times = list(change_times)[1:] + [np.inf]
+    capacities = list(capacities)
+    requests = request_times.tolist()
+    priority = priorities.tolist()
+    remaining = service_times.tolist()
+    ends = np.full(n, np.inf)
+    seg_starts, seg_ends, requeued = [], [], []
+
+    waiting = []     # heap of (priority, request time, not preempting, seq, patient)
+    in_service = []  # heap of (end, patient, segment); entries of preempted segments are stale
+    serving = {}     # patient -> (queue key, segment)
+    seq = 0
+    capacity = capacities[0]
+    c = i = 0
+
+    def dispatch(now):
+        nonlocal seq
+        while waiting:
+            key = waiting[0][:3]
+            # Over capacity (after a shift change) this can take several servers
+            while preemptive and len(serving) >= capacity and not key[2]:
+                victim = max(serving, key=lambda k: serving[k][0])
+                victim_key, segment = serving[victim]
+                if not victim_key > key:
+                    break
+                del serving[victim]
+                seg_ends[segment] = now
+                remaining[victim] -= now - seg_starts[segment]
+                requeued.append(now)
+                seq += 1
+                heapq.heappush(waiting, (victim_key[0], now, victim_key[2], seq, victim))
+            if len(serving) >= capacity:
+                return
+            k = heapq.heappop(waiting)[4]
+            serving[k] = (key, len(seg_starts))
+            heapq.heappush(in_service, (now + remaining[k], k, len(seg_starts)))
+            seg_starts.append(now)
+            seg_ends.append(np.inf)
+
+    while True:
+        while in_service and serving.get(in_service[0][1], (None, -1))[1] != in_service[0][2]:
+            heapq.heappop(in_service)
+        t_end = in_service[0][0] if in_service else np.inf
+        t_request = requests[i] if i < n else np.inf
+        t_change = change_times[c]
+        if t_end <= t_request and t_end <= t_change:
+            if t_end == np.inf:
+                break
+            _, k, segment = heapq.heappop(in_service)
+            del serving[k]
+            seg_ends[segment] = ends[k] = t_end
+            now = t_end
+        elif t_change <= t_request:
+            c += 1
+            capacity = capacities[c]
+            now = t_change
+        else:
+            seq += 1
+            p = priority[i]
+            heapq.heappush(waiting, (p, requests[i], not (preemptive and p == 0), seq, i))
+            now = requests[i]
+            i += 1
+        dispatch(now)
+    return ends, np.array(seg_starts), np.array(seg_ends), np.array(requeued)
+
+
+def level_series(times, deltas, sim_time):
+    """
+    Piecewise-constant levels from +/-1 events: returns the distinct event
+    times up to sim_time and the levels (cumulative deltas, one column per
+    level) just after each of them. Simultaneous events are collapsed so a
+    request that starts service immediately never shows up as queued.
+    """
+    keep = times <= sim_time
+    order = np.argsort(times[keep], kind='stable')
+    times = times[keep][order]
+    levels = np.cumsum(deltas[keep][order], axis=0)
+    last = np.ones(len(times), dtype=bool)
+    last[:-1] = times[1:] != times[:-1]
+    return times[last], levels[last]
+
+
+def resource_series(requests, starts, ends, sim_time):
+    """
+    (times, queue lengths, busy servers) of one resource from its request
+    times and the start/end times of its stretches of service.
+    """
+    r, s = len(requests), len(starts)
+    times = np.concatenate([requests, starts, ends])
+    deltas = np.column_stack([
+        np.concatenate([np.ones(r, dtype=np.int64), -np.ones(s, dtype=np.int64), np.zeros(s, dtype=np.int64)]),
+        np.concatenate([np.zeros(r, dtype=np.int64), np.ones(s, dtype=np.int64), -np.ones(s, dtype=np.int64)]),
+    ])
+    times, levels = level_series(times, deltas, sim_time)
+    return times, levels[:, 0], levels[:, 1]
+
+
+def run_numpy_simulation(num_doctors, num_nurses, arrival_rate, sim_time, means, streams, collector,
+                         arrival_profile=None, shifts=None, start_minute=0, classes=None, urgency=None):
+    """
+    Runs the ER model with the vectorized engine, recording wait times and
+    exact per-resource queue / busy-server series into collector, with the
+    same semantics as the SimPy backend.
+    """
+    with timer('numpy/draws'):
+        if arrival_profile is None:
+            arrivals = arrival_times(arrival_rate, sim_time, streams['arrivals'])
+        else:
+            arrivals = arrival_profile.arrival_times(arrival_rate, sim_time, streams['arrivals'], start_minute)
+        n = len(arrivals)
+        if classes is None:
+            registration = streams['registration'].exponentials(means['registration'], n)
+            triage = streams['triage'].exponentials(means['triage'], n)
+            consultation = streams['consultation'].exponentials(means['consultation'], n)
+        else:
+            # Urgency class first, then service requirements with that class's means
+            patient_class = streams['urgency'].categories(classes['edges'], n)
+            class_means = classes['means']
+            registration = streams['registration'].exponentials(1.0, n) * class_means['registration'][patient_class]
+            triage = streams['triage'].exponentials(1.0, n) * class_means['triage'][patient_class]
+            consultation = streams['consultation'].exponentials(1.0, n) * class_means['consultation'][patient_class]
+
+    if shifts is None:
+        nurse_servers, doctor_servers = num_nurses, num_doctors
+    else:
+        nurse_servers = shifts.changes('nurse', sim_time, start_minute)
+        doctor_servers = shifts.changes('doctor', sim_time, start_minute)
+
+    with timer('numpy/nurses'):
+        # Nurses: registration then triage, one shared FIFO queue
+        reg_start, tri_start = shared_pool_start_times(arrivals, registration, triage, nurse_servers)
+        reg_end = reg_start + registration
+        tri_end = tri_start + triage
+
+    with timer('numpy/doctors'):
+        # Doctors: requests arrive as patients leave triage
+        order = np.argsort(tri_end, kind='stable')
+        if urgency in ('priority', 'preemptive'):
+            con_end = np.empty(n)
+            con_end[order], service_start, service_end, requeued = priority_service(
+                tri_end[order], patient_class[order], consultation[order], doctor_servers, urgency == 'preemptive')
+            doctor_requests = np.concatenate([tri_end, requeued])
+        else:
+            con_start = np.empty(n)
+            con_start[order] = fifo_start_times(tri_end[order], consultation[order], doctor_servers)
+            con_end = service_end = con_start + consultation
+            service_start = con_start
+            doctor_requests = tri_end
+
+    with timer('numpy/statistics'):
+        # Only patients and services that complete within the horizon are counted
+        done = con_end <= sim_time
+        by_completion = np.argsort(con_end[done], kind='stable')
+        wait_times = (con_end - arrivals)[done][by_completion]
+
+        collector.record_waits(wait_times, None if classes is None else patient_class[done][by_completion])
+
+        # Queue and busy-server series per resource, truncated at the horizon
+        nurse_requests = np.concatenate([arrivals, reg_end])
+        nurse_starts = np.concatenate([reg_start, tri_start])
+        nurse_ends = np.concatenate([reg_end, tri_end])
+        for name, servers in (('nurse', nurse_servers), ('doctor', doctor_servers)):
+            if isinstance(servers, tuple):
+                times, capacities = servers
+                collector.add_resource(name, int(capacities[0]))
+                collector.record_capacity_series(name, times[1:], capacities[1:])
+            else:
+                collector.add_resource(name, servers)
+        collector.record_resource_series('nurse',
+                                         *resource_series(nurse_requests, nurse_starts, nurse_ends, sim_time))
+        collector.record_resource_series('doctor',
+                                         *resource_series(doctor_requests, service_start, service_end, sim_time))
+
+        # Combined queue over both resources
+        requests = np.concatenate([nurse_requests, doctor_requests])
+        starts = np.concatenate([nurse_starts, service_start])
+        times, levels = level_series(np.concatenate([requests, starts]),
+                                     np.concatenate([np.ones(len(requests), dtype=np.int64),
+                                                     -np.ones(len(starts), dtype=np.int64)])[:, None], sim_time)
+        collector.record_total_queue_series(times, levels[:, 0])
@@ -0,0 +1,185 @@
+import os
+import numpy as np
+
+from scripts.instrumentation import timer
+
+# -------------------------------
+# Empirical service-time parameters
+# -------------------------------
+# The simulation only needs a handful of means from cleaned_er_data.csv, so the
+# dataset is parsed once per process and the derived statistics are cached,
+# keyed on (absolute path, mtime). An optional .npz sidecar next to the CSV lets
+# cold starts (new worker processes, dashboard restarts) skip CSV parsing.
+# data_path may also be the partitioned Parquet dataset written by
+# data_preprocessing.py; its mtime is that of the dataset manifest.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_PATH = os.path.join(script_dir, "..", "data", "cleaned_er_data.csv")
+
+# Simulation stage -> dataset column
+SERVICE_COLUMNS = {
+    'registration': 'Time_to_Registration',
+    'triage': 'Time_to_Triage',
+    'consultation': 'Time_to_Medical_Professional',
+}
+
+# Parameter set name -> grouping column
+GROUP_COLUMNS = {
+    'hospital': 'Hospital ID',
+    'urgency': 'Urgency Level',
+    'time_of_day': 'Visit_Hour',
+}
+
+STAGES = list(SERVICE_COLUMNS)
+SIDECAR_SUFFIX = ".params.npz"
+MANIFEST_NAME = "_manifest.json"  # see data_preprocessing
+
+_cache = {}
+
+
+def dataset_key(data_path=DEFAULT_DATA_PATH):
+    """(absolute path, mtime) of the dataset: the key every per-dataset cache is held under."""
+    data_path = os.path.abspath(data_path)
+    if os.path.isdir(data_path):
+        return data_path, os.path.getmtime(os.path.join(data_path, MANIFEST_NAME))
+    return data_path, os.path.getmtime(data_path)
+
+
+def dataset_version(data_path=DEFAULT_DATA_PATH):
+    """The dataset's version (its mtime), for keys of results that were computed from it."""
+    return dataset_key(data_path)[1]
+
+
+def _sidecar_path(data_path):
+    return os.path.splitext(data_path)[0] + SIDECAR_SUFFIX
+
+
+def _summarize(values):
+    # values: (n, len(STAGES)) array -> per-stage mean/std plus row count
+    return {
+        'mean': values.mean(axis=0),
+        'std': values.std(axis=0, ddof=1) if len(values) > 1 else np.zeros(values.shape[1]),
+        'count': len(values),
+    }
+
+
+def _parse_dataset(data_path):
+    import pandas as pd
+
+    usecols = list(SERVICE_COLUMNS.values()) + list(GROUP_COLUMNS.values())
+    if os.path.isdir(data_path):
+        df = pd.read_parquet(data_path, columns=usecols)
+    else:
+        df = pd.read_csv(data_path, usecols=usecols)
+    values = df[list(SERVICE_COLUMNS.values())].to_numpy(dtype=np.float64)
+
+    tables = {'overall': {None: _summarize(values)}}
+    for group, column in GROUP_COLUMNS.items():
+        tables[group] = {}
+        for key, idx in df.groupby(column, sort=True, observed=True).indices.items():
+            tables[group][str(key)] = _summarize(values[idx])
+    return tables
+
+
+def _write_sidecar(tables, sidecar, source_mtime):
+    arrays = {'source_mtime': np.array(source_mtime)}
+    for group, table in tables.items():
+        keys = [k for k in table]
+        arrays[f'{group}__keys'] = np.array(['' if k is None else k for k in keys])
+        arrays[f'{group}__mean'] = np.array([table[k]['mean'] for k in keys])
+        arrays[f'{group}__std'] = np.array([table[k]['std'] for k in keys])
+        arrays[f'{group}__count'] = np.array([table[k]['count'] for k in keys])
+    # Per-process temporary name: several workers may build the sidecar at once
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, sidecar)
+
+
+def _read_sidecar(sidecar, source_mtime):
+    if not os.path.exists(sidecar):
+        return None
+    with np.load(sidecar, allow_pickle=False) as data:
+        if float(data['source_mtime']) != source_mtime:
+            return None
+        tables = {}
+        for group in ['overall'] + list(GROUP_COLUMNS):
+            keys = data[f'{group}__keys']
+            means, stds, counts = data[f'{group}__mean'], data[f'{group}__std'], data[f'{group}__count']
+            tables[group] = {
+                (None if group == 'overall' else str(k)): {'mean': m, 'std': s, 'count': int(c)}
+                for k, m, s, c in zip(keys, means, stds, counts)
+            }
+    return tables
+
+
+def load_parameter_tables(data_path=DEFAULT_DATA_PATH, use_sidecar=False):
+    """
+    Returns the per-group service-time statistics for the dataset, parsing it
+    at most once per (path, mtime). With use_sidecar=True a compact .npz copy
+    is read (or written) next to the CSV.
+    """
+    key = dataset_key(data_path)
+    tables = _cache.get(key)
+    if tables is not None:
+        return tables
+
+    path, mtime = key
+    sidecar = _sidecar_path(path)
+    if use_sidecar:
+        with timer('parameters/read_sidecar'):
+            tables = _read_sidecar(sidecar, mtime)
+    if tables is None:
+        with timer('parameters/parse_dataset'):
+            tables = _parse_dataset(path)
+        if use_sidecar:
+            _write_sidecar(tables, sidecar, mtime)
+
+    # Drop stale entries for the same file
+    for old_key in [k for k in _cache if k[0] == path]:
+        del _cache[old_key]
+    _cache[key] = tables
+    return tables
+
+
+def get_service_means(data_path=DEFAULT_DATA_PATH, group=None, key=None, use_sidecar=False):
+    """
+    Returns {'registration': ..., 'triage': ..., 'consultation': ...} mean service
+    times in minutes, either for the whole dataset or for one parameter set,
+    e.g. get_service_means(group='urgency', key='Critical').
+    """
+    tables = load_parameter_tables(data_path, use_sidecar=use_sidecar)
+    if group is None:
+        stats = tables['overall'][None]
+    else:
+        if group not in GROUP_COLUMNS:
+            raise ValueError(f"Unknown parameter set '{group}', expected one of {list(GROUP_COLUMNS)}")
+        if key not in tables[group]:
+            raise KeyError(f"No rows for {group}={key!r} in {data_path}")
+        stats = tables[group][key]
+    return {stage: float(stats['mean'][i]) for i, stage in enumerate(STAGES)}
+
+
+def get_class_parameters(group, keys, data_path=DEFAULT_DATA_PATH, use_sidecar=False):
+    """
+    Per-class inputs for a model with one patient class per key of a
+    parameter set: returns (shares, {stage: array of means}), both ordered
+    like keys; shares are the classes' fractions of the dataset rows.
+    """
+    tables = load_parameter_tables(data_path, use_sidecar=use_sidecar)
+    if group not in GROUP_COLUMNS:
+        raise ValueError(f"Unknown parameter set '{group}', expected one of {list(GROUP_COLUMNS)}")
+    missing = [k for k in keys if k not in tables[group]]
+    if missing:
+        raise KeyError(f"No rows for {group}={missing} in {data_path}")
+    counts = np.array([tables[group][k]['count'] for k in keys], dtype=float)
+    means = np.array([tables[group][k]['mean'] for k in keys])
+    return counts / counts.sum(), {stage: means[:, i] for i, stage in enumerate(STAGES)}
+
+
+def list_parameter_keys(group, data_path=DEFAULT_DATA_PATH):
+    """Returns the available keys for a parameter set (hospital IDs, urgency levels, ...)."""
+    return list(load_parameter_tables(data_path)[group])
+
+
+def clear_cache():
+    _cache.clear()
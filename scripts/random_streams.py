@@ -0,0 +1,110 @@
+import numpy as np
+
+# -------------------------------
+# Per-stream random number generation
+# -------------------------------
+# Every stochastic input of the model has its own numpy Generator, spawned from
+# one SeedSequence. Runs are reproducible for a given seed, and two scenarios
+# run with the same seed see the same arrivals and the same per-patient service
+# requirements (common random numbers), which makes paired comparisons much
+# tighter. Variates are drawn in blocks to avoid a Python->C call per draw.
+# Streams added later go at the end of STREAMS, so earlier streams keep their
+# numbers.
+
+STREAMS = ('arrivals', 'registration', 'triage', 'consultation', 'urgency')
+DEFAULT_BLOCK_SIZE = 1024
+
+
+class VariateStream:
+    """Exponential variates from one Generator, pre-drawn in blocks."""
+
+    def __init__(self, rng, block_size=DEFAULT_BLOCK_SIZE):
+        self.rng = rng
+        self.block_size = block_size
+        self._buffer = np.empty(0)
+        self._pos = 0
+        self._generated = 0
+
+    def _refill(self, needed):
+        remaining = self._buffer[self._pos:]
+        fresh = self.rng.standard_exponential(max(self.block_size, needed - len(remaining)))
+        self._generated += len(fresh)
+        self._buffer = np.concatenate([remaining, fresh]) if len(remaining) else fresh
+        self._pos = 0
+
+    def exponential(self, mean):
+        """Next exponential variate with the given mean."""
+        if self._pos >= len(self._buffer):
+            self._refill(1)
+        value = self._buffer[self._pos]
+        self._pos += 1
+        return mean * value
+
+    def exponentials(self, mean, n):
+        """Next n exponential variates with the given mean, as an array."""
+        if self._pos + n > len(self._buffer):
+            self._refill(n)
+        values = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+        return mean * values
+
+    @property
+    def draws(self):
+        """Variates handed out so far (block-drawn but unread ones are not counted)."""
+        return self._generated - (len(self._buffer) - self._pos)
+
+    def get_state(self):
+        """Generator state and unread buffer; the buffer is never written in place, so it is shared, not copied."""
+        return self.rng.bit_generator.state, self._buffer, self._pos, self._generated
+
+    def set_state(self, state):
+        self.rng.bit_generator.state, self._buffer, self._pos, self._generated = state
+
+    def category(self, edges):
+        """Next category index, with edges from category_edges()."""
+        return int(np.searchsorted(edges, self.exponential(1.0), side='right'))
+
+    def categories(self, edges, n):
+        """Next n category indices, as an array."""
+        return np.searchsorted(edges, self.exponentials(1.0, n), side='right')
+
+
+def category_edges(probabilities):
+    """
+    Thresholds on a unit exponential E for drawing categories by inversion:
+    category k is drawn when edges[k-1] <= E < edges[k], i.e. when
+    1 - exp(-E) falls in the k-th slice of the cumulative probabilities.
+    """
+    cdf = np.cumsum(probabilities, dtype=float)
+    return -np.log1p(-np.minimum(cdf[:-1] / cdf[-1], 1.0))
+
+
+class RandomStreams:
+    """One VariateStream per name in STREAMS, seeded from a single seed."""
+
+    def __init__(self, seed=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        # Same children as seed_seq.spawn(), but without mutating seed_seq, so
+        # reusing one SeedSequence across scenarios still gives common numbers
+        children = [
+            np.random.SeedSequence(self.seed_seq.entropy, spawn_key=self.seed_seq.spawn_key + (i,))
+            for i in range(len(STREAMS))
+        ]
+        self.streams = {
+            name: VariateStream(np.random.default_rng(child), block_size)
+            for name, child in zip(STREAMS, children)
+        }
+
+    def __getitem__(self, name):
+        return self.streams[name]
+
+    def draws(self):
+        """Variates handed out per stream."""
+        return {name: stream.draws for name, stream in self.streams.items()}
+
+    def get_state(self):
+        return {name: stream.get_state() for name, stream in self.streams.items()}
+
+    def set_state(self, state):
+        for name, stream_state in state.items():
+            self.streams[name].set_state(stream_state)
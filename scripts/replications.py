@@ -0,0 +1,137 @@
+import os
+import sys
+import atexit
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Add project root to sys.path so worker processes can import the backend
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from scripts.result_store import run_stored
+
+# -------------------------------
+# Batched replications
+# -------------------------------
+# run_replications(config, n) runs n independent replications of one
+# configuration, fanned out over a process pool. Each replication gets its own
+# child of a numpy SeedSequence, so results are reproducible for a given seed
+# regardless of the number of workers. Running two configurations with the same
+# seed gives common random numbers (see random_streams). With a ResultStore,
+# replications already stored for the same config and child seed are loaded
+# instead of simulated, and new ones are stored.
+
+SCALAR_METRICS = [
+    'Average Wait Time (min)',
+    'Total Patients Treated',
+    'Doctor Utilization (%)',
+    'Nurse Utilization (%)',
+]
+
+DEFAULT_CONFIG = {
+    'num_doctors': 3,
+    'num_nurses': 5,
+    'arrival_rate': 10,
+    'sim_time': 240,
+    'engine': 'simpy',
+    'traces': True,  # keep per-patient wait times and queue samples
+}
+
+# Two-sided 95% Student-t critical values by degrees of freedom
+_T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+         10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000,
+         120: 1.980}
+
+_pools = {}
+
+
+def t_critical_95(dof):
+    """Two-sided 95% t critical value (conservative between table entries)."""
+    if dof > max(_T_95):
+        return 1.960
+    return _T_95[max(k for k in _T_95 if k <= dof)]
+
+
+def confidence_interval(samples, axis=0):
+    """Returns (mean, 95% half-width) along axis."""
+    samples = np.asarray(samples, dtype=float)
+    n = samples.shape[axis]
+    mean = samples.mean(axis=axis)
+    if n < 2:
+        return mean, np.full_like(mean, np.nan)
+    half_width = t_critical_95(n - 1) * samples.std(axis=axis, ddof=1) / np.sqrt(n)
+    return mean, half_width
+
+
+def _run_replication(config, seed_seq, store=None):
+    return run_stored(store, config, seed_seq, traces=config['traces'])
+
+
+def get_pool(workers):
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        _pools[workers] = pool
+    return pool
+
+
+@atexit.register
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+def _pad(rows, fill=np.nan):
+    width = max((len(r) for r in rows), default=0)
+    out = np.full((len(rows), width), fill, dtype=float)
+    for i, r in enumerate(rows):
+        out[i, :len(r)] = r
+    return out
+
+
+def stack_results(results):
+    """
+    Stacks per-replication result dicts into arrays: per-metric arrays and
+    their means / 95% confidence half-widths and, for runs with traces,
+    wait_times (n, max_patients, NaN-padded) and queue_lengths (n, samples).
+    """
+    metrics = {m: np.array([r[m] for r in results], dtype=float) for m in SCALAR_METRICS}
+    stats = {m: confidence_interval(v) for m, v in metrics.items()}
+    stacked = {
+        'metrics': metrics,
+        'means': {m: float(s[0]) for m, s in stats.items()},
+        'ci95': {m: float(s[1]) for m, s in stats.items()},
+        'wait_counts': metrics['Total Patients Treated'].astype(int),
+    }
+    if results and 'All Wait Times' in results[0]:
+        stacked['wait_times'] = _pad([r['All Wait Times'] for r in results])
+        stacked['queue_lengths'] = _pad([r['Queue Lengths'] for r in results])
+        stacked['time_points'] = np.asarray(max((r['Time Points'] for r in results), key=len), dtype=float)
+    return stacked
+
+
+def run_replications(config, n, workers=None, seed=None, store=None):
+    """
+    Runs n independent replications of config (see DEFAULT_CONFIG for keys).
+    workers=None uses every core, workers=1 runs in-process. store (a
+    ResultStore) reuses and keeps the individual replications.
+    Returns the stack_results dict plus the seed entropy used.
+    """
+    config = {**DEFAULT_CONFIG, **config}
+    seed_seq = np.random.SeedSequence(seed)
+    children = seed_seq.spawn(n)
+
+    workers = min(workers or os.cpu_count() or 1, n)
+    if workers <= 1:
+        results = [_run_replication(config, child, store) for child in children]
+    else:
+        chunksize = max(1, n // (workers * 4))
+        results = list(get_pool(workers).map(_run_replication, [config] * n, children, [store] * n,
+                                             chunksize=chunksize))
+
+    stacked = stack_results(results)
+    stacked['seed'] = seed_seq.entropy
+    stacked['config'] = config
+    return stacked
@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.simulation_backend import MODEL_VERSION, run_er_simulation
+from scripts.parameter_store import DEFAULT_DATA_PATH, dataset_version
+
+# -------------------------------
+# Persistent result store
+# -------------------------------
+# Single simulation runs, kept across processes and sessions. A run is keyed
+# by the hash of its configuration (staffing, arrival rate, horizon, engine,
+# ... plus the version of the input data), its seed and MODEL_VERSION. The
+# metadata and scalar metrics live in SQLite, indexed on staffing, arrival
+# rate and horizon, so lookups and aggregate queries never touch the traces.
+# Arrays (wait-time histogram, and with traces=True the per-patient waits,
+# sampled queue lengths and resource series) are appended to one flat file
+# per dtype and read back as slices of a read-only memory map: loading a run
+# maps its traces instead of reading them. Appends and inserts happen inside
+# one SQLite write transaction, which also serializes writers across
+# processes. Only seeded runs are stored; with seed=None every call simulates.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULT_DIR = os.path.join(script_dir, "..", "data", "result_store")
+
+# Config keys kept as columns of runs, for filtering and grouping
+INDEXED = ('num_doctors', 'num_nurses', 'arrival_rate', 'sim_time', 'engine')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    config_hash TEXT NOT NULL,
+    seed TEXT NOT NULL,
+    code_version INTEGER NOT NULL,
+    num_doctors INTEGER,
+    num_nurses INTEGER,
+    arrival_rate REAL,
+    sim_time REAL,
+    engine TEXT,
+    config TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    has_traces INTEGER NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (config_hash, seed, code_version)
+);
+CREATE INDEX IF NOT EXISTS runs_staffing ON runs (num_doctors, num_nurses);
+CREATE INDEX IF NOT EXISTS runs_arrival_rate ON runs (arrival_rate);
+CREATE INDEX IF NOT EXISTS runs_sim_time ON runs (sim_time);
+CREATE TABLE IF NOT EXISTS arrays (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+"""
+
+
+def config_hash(config, data_path=DEFAULT_DATA_PATH):
+    """
+    Hash of a run configuration (without seed and traces; options set to
+    None count as left out) and of the input data's version.
+    """
+    config = {k: v for k, v in config.items() if k != 'traces' and v is not None}
+    key = json.dumps({'config': config, 'data_mtime': dataset_version(data_path)}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def seed_key(seed):
+    """Canonical text of a seed: an int and SeedSequence(int) are the same seed."""
+    if seed is None:
+        raise ValueError("Only seeded runs can be stored")
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return f"{seed.entropy}:{','.join(map(str, seed.spawn_key))}"
+
+
+def _flatten_arrays(result):
+    # Array-valued entries of a result dict -> {'Name' or 'Name/sub/...': array}
+    arrays = {}
+
+    def visit(prefix, value):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                visit(f"{prefix}/{k}", v)
+        elif isinstance(value, np.ndarray):
+            arrays[prefix] = value
+
+    for key, value in result.items():
+        visit(key, value)
+    return arrays
+
+
+def _json_scalar(value):
+    # Python int/float for JSON; NaN (e.g. a percentile of no patients) as null, which json_extract can read
+    value = value.item() if isinstance(value, np.generic) else value
+    return None if isinstance(value, float) and value != value else value
+
+
+def _metrics(row):
+    return {k: float('nan') if v is None else v for k, v in json.loads(row['metrics']).items()}
+
+
+def _nest(arrays):
+    nested = {}
+    for name, array in arrays.items():
+        *parents, leaf = name.split('/')
+        node = nested
+        for p in parents:
+            node = node.setdefault(p, {})
+        node[leaf] = array
+    return nested
+
+
+class ResultStore:
+    """
+    Simulation runs in a directory: runs.sqlite plus float64.bin / int64.bin.
+    Safe to share between threads and processes (each opens its own
+    connection; a store pickles as its path).
+    """
+
+    def __init__(self, path=DEFAULT_RESULT_DIR):
+        self.path = path
+        self._local = threading.local()
+        self._maps = {}
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.path, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.path, "runs.sqlite"), timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _file(self, dtype):
+        return os.path.join(self.path, f"{dtype}.bin")
+
+    def _array(self, dtype, offset, length):
+        # Slices of one read-only map per file, remapped once the file has grown
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        mapped = self._maps.get(dtype)
+        if mapped is None or len(mapped) < offset + length:
+            mapped = self._maps[dtype] = np.memmap(self._file(dtype), dtype=dtype, mode='r')
+        return mapped[offset:offset + length]
+
+    # --- writing ---
+
+    def put(self, config, seed, result, data_path=DEFAULT_DATA_PATH):
+        """Stores one run's result dict (replacing a stored run of the same key); returns its id."""
+        arrays = _flatten_arrays(result)
+        metrics = {k: v for k, v in result.items() if isinstance(v, (int, float, np.integer, np.floating))}
+        has_traces = 'All Wait Times' in result
+        key = (config_hash(config, data_path), seed_key(seed), MODEL_VERSION)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")  # one writer at a time, also for the array files
+        try:
+            # A replaced run's arrays stay in the .bin files, unreferenced
+            conn.execute("DELETE FROM runs WHERE config_hash = ? AND seed = ? AND code_version = ?", key)
+            row = conn.execute(
+                "INSERT INTO runs (config_hash, seed, code_version, num_doctors, num_nurses, arrival_rate, "
+                "sim_time, engine, config, metrics, has_traces, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, *[config.get(k) for k in INDEXED],
+                 json.dumps(config, sort_keys=True, default=str),
+                 json.dumps({k: _json_scalar(v) for k, v in metrics.items()}), int(has_traces), time.time()))
+            run_id = row.lastrowid
+            for name, array in arrays.items():
+                dtype = 'float64' if array.dtype.kind == 'f' else 'int64'
+                data = np.ascontiguousarray(array, dtype=dtype)
+                with open(self._file(dtype), 'ab') as f:
+                    offset = f.tell() // data.itemsize
+                    f.write(data.tobytes())
+                conn.execute("INSERT INTO arrays (run_id, name, dtype, offset, length) VALUES (?, ?, ?, ?, ?)",
+                             (run_id, name, dtype, offset, len(data)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return run_id
+
+    # --- reading ---
+
+    def _load(self, row, traces):
+        result = _metrics(row)
+        query = "SELECT name, dtype, offset, length FROM arrays WHERE run_id = ?"
+        if not traces:
+            query += " AND name LIKE 'Wait Time Histogram/%'"
+        arrays = {a['name']: self._array(a['dtype'], a['offset'], a['length'])
+                  for a in self._connection().execute(query, (row['id'],))}
+        result.update(_nest(arrays))
+        return result
+
+    def get(self, config, seed, traces=False, data_path=DEFAULT_DATA_PATH):
+        """
+        The stored result of config run with seed under the current
+        MODEL_VERSION, or None. traces=True also needs the run's traces
+        (memory-mapped); a run stored without them counts as missing.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM runs WHERE config_hash = ? AND seed = ? AND code_version = ?",
+            (config_hash(config, data_path), seed_key(seed), MODEL_VERSION)).fetchone()
+        if row is None or (traces and not row['has_traces']):
+            return None
+        return self._load(row, traces)
+
+    def find(self, config, n=None, traces=False, data_path=DEFAULT_DATA_PATH):
+        """Up to n stored results of config, with any seed, oldest first."""
+        query = "SELECT * FROM runs WHERE config_hash = ? AND code_version = ?"
+        if traces:
+            query += " AND has_traces = 1"
+        query += " ORDER BY id"
+        if n is not None:
+            query += f" LIMIT {int(n)}"
+        rows = self._connection().execute(query, (config_hash(config, data_path), MODEL_VERSION)).fetchall()
+        return [self._load(row, traces) for row in rows]
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    @staticmethod
+    def _where(filters, all_versions=False):
+        # Column filters: a value, or a (low, high) inclusive range
+        clauses, params = ([], []) if all_versions else (["code_version = ?"], [MODEL_VERSION])
+        for column, value in filters.items():
+            if column not in INDEXED:
+                raise ValueError(f"Cannot filter on '{column}', expected one of {INDEXED}")
+            if isinstance(value, tuple):
+                clauses.append(f"{column} BETWEEN ? AND ?")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, all_versions=False, **filters):
+        """
+        Metadata and scalar metrics of the stored runs matching filters
+        (e.g. num_doctors=3, arrival_rate=(5, 15)); traces are not loaded.
+        """
+        where, params = self._where(filters, all_versions)
+        rows = self._connection().execute(
+            f"SELECT id, seed, code_version, config, metrics, has_traces FROM runs{where} ORDER BY id", params)
+        return [{'id': r['id'], 'seed': r['seed'], 'code_version': r['code_version'], 'config': json.loads(r['config']),
+                 'metrics': _metrics(r), 'has_traces': bool(r['has_traces'])} for r in rows]
+
+    def aggregate(self, metric='Average Wait Time (min)', by=('num_doctors', 'num_nurses'), **filters):
+        """
+        Per group of the by columns: number of runs, mean, standard deviation,
+        min and max of metric over the matching runs, computed in SQLite.
+        """
+        for column in by:
+            if column not in INDEXED:
+                raise ValueError(f"Cannot group by '{column}', expected one of {INDEXED}")
+        where, params = self._where(filters)
+        group = ", ".join(by)
+        # Runs where metric is undefined (stored as null) are not counted
+        rows = self._connection().execute(
+            f"SELECT {group + ', ' if by else ''}COUNT(value) AS n, AVG(value) AS mean, "
+            f"AVG(value * value) AS mean_sq, MIN(value) AS min, MAX(value) AS max "
+            f"FROM (SELECT {group + ', ' if by else ''}json_extract(metrics, ?) AS value FROM runs{where})"
+            f"{' GROUP BY ' + group + ' ORDER BY ' + group if by else ''}",
+            [f'$."{metric}"'] + params)
+        out = []
+        for r in rows:
+            n = r['n']
+            variance = (r['mean_sq'] - r['mean'] ** 2) * n / (n - 1) if n > 1 and r['mean'] is not None else 0.0
+            out.append({**{c: r[c] for c in by}, 'n': n, 'mean': r['mean'], 'std': max(variance, 0.0) ** 0.5,
+                        'min': r['min'], 'max': r['max']})
+        return out
+
+
+def run_stored(store, config, seed, traces=False):
+    """
+    run_er_simulation for a config dict (num_doctors, num_nurses,
+    arrival_rate, sim_time, engine and optionally urgency) through store:
+    a stored run is returned as is, otherwise the run is simulated and
+    stored. With store=None or seed=None it only simulates.
+    """
+    config = {k: v for k, v in config.items() if k != 'traces'}
+    if store is not None and seed is not None:
+        result = store.get(config, seed, traces)
+        if result is not None:
+            return result
+    result = run_er_simulation(config['num_doctors'], config['num_nurses'], config['arrival_rate'],
+                               sim_time=config['sim_time'], engine=config['engine'], seed=seed, traces=traces,
+                               urgency=config.get('urgency'))
+    if store is not None and seed is not None:
+        store.put(config, seed, result)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the stored simulation runs.")
+    parser.add_argument("--store", default=DEFAULT_RESULT_DIR)
+    parser.add_argument("--metric", default='Average Wait Time (min)')
+    parser.add_argument("--by", default="num_doctors,num_nurses,arrival_rate,sim_time")
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+    print(f"{len(store)} runs in {args.store}")
+    for row in store.aggregate(args.metric, tuple(args.by.split(','))):
+        print(row)
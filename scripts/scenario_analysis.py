@@ -1,12 +1,55 @@
+import os
+import sys
+import numpy as np
 import matplotlib.pyplot as plt
 
-scenarios = ['Baseline (5 Nurses, 3 Doctors)', 'Improved (7 Nurses, 5 Doctors)']
-avg_wait_times = [359.93, 171.48]  # replace these with your actual simulated averages clearly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.scenario_sweep import DEFAULT_SCENARIO_FILE, paired_difference, sweep
 
+# Scenarios are declared in scenarios.json and run with common random numbers
+# (see scenario_sweep); only scenarios whose config changed are simulated
+# again. Every chart below is drawn from the stored results.
+METRIC = 'Average Wait Time (min)'
+plots_dir = os.path.join(os.path.dirname(__file__), "..", "plots")
+
+results, baseline = sweep(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SCENARIO_FILE)
+scenarios = list(results)
+avg_wait_times = [results[s]['means'][METRIC] for s in scenarios]
+half_widths = [results[s]['ci95'][METRIC] for s in scenarios]
+
+for name, mean, hw in zip(scenarios, avg_wait_times, half_widths):
+    line = f"{name}: {mean:.2f} ± {hw:.2f} min"
+    if name != baseline:
+        # Paired comparison under common random numbers
+        waits, base = results[name]['metrics'][METRIC], results[baseline]['metrics'][METRIC]
+        n = min(len(waits), len(base))
+        diff_mean, diff_hw = paired_difference(results, name, baseline, METRIC)
+        independent_var = waits[:n].var(ddof=1) + base[:n].var(ddof=1)
+        paired_var = (waits[:n] - base[:n]).var(ddof=1)
+        line += (f"\n  vs {baseline}: {diff_mean:+.2f} ± {diff_hw:.2f} min "
+                 f"(variance reduction from common random numbers: {independent_var / paired_var:.1f}x)")
+    print(line)
+
+colors = plt.cm.RdYlGn(np.linspace(0.1, 0.9, len(scenarios)))
 plt.figure(figsize=(12,6))
-plt.bar(scenarios, avg_wait_times, color=['crimson', 'mediumseagreen'])
-plt.title('Average Patient Wait Times: Baseline vs Improved Resources')
+plt.bar(scenarios, avg_wait_times, yerr=half_widths, capsize=8, color=colors)
+plt.title('Average Patient Wait Times by Scenario (95% CI)')
 plt.ylabel('Average Wait Time (minutes)')
 plt.grid(axis='y')
-plt.savefig('C:/Users/shiva/Desktop/ER-Simulation-Analysis/plots/scenario_comparison.png')
+plt.savefig(os.path.join(plots_dir, "scenario_comparison.png"))
+plt.close()
+
+# Wait time distribution of each scenario, pooled over its replications
+plt.figure(figsize=(12,6))
+for name, color in zip(scenarios, colors):
+    histogram = results[name]['wait_histogram']
+    edges, counts = histogram['edges'], histogram['counts']
+    # The last bin counts waits beyond the last edge; it is left out of the plot
+    plt.stairs(counts[:-1] / counts.sum(), edges, color=color, label=name, linewidth=2)
+plt.title('Simulated Patient Wait Times by Scenario')
+plt.xlabel('Wait time (minutes)')
+plt.ylabel('Share of patients')
+plt.legend()
+plt.grid(True)
+plt.savefig(os.path.join(plots_dir, "simulated_wait_times.png"))
 plt.close()
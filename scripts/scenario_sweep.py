@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.simulation_backend import MODEL_VERSION
+from scripts.parameter_store import DEFAULT_DATA_PATH, dataset_version
+from scripts.replications import DEFAULT_CONFIG, _run_replication, confidence_interval, get_pool
+from scripts.result_store import ResultStore
+
+# -------------------------------
+# Config-driven scenario sweeps
+# -------------------------------
+# Scenarios are declared in a JSON file (see scenarios.json): a seed, defaults
+# and one entry per scenario overriding them (staffing, arrival rate, horizon,
+# replications, engine). Every replication of every scenario is one task on the
+# shared process pool, and replication i of each scenario uses the same seed
+# (common random numbers), so paired differences between scenarios are tight.
+# Each scenario's per-replication metrics are stored under a hash of its
+# resolved config, seed, MODEL_VERSION and the input data's modification time
+# (as in result_store); a re-run only simulates scenarios whose hash is not in
+# the store yet. With a ResultStore the replications
+# themselves are also reused: a new or changed scenario only simulates the
+# (config, seed) runs that no earlier sweep, dashboard job or batch has stored.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCENARIO_FILE = os.path.join(script_dir, "scenarios.json")
+DEFAULT_STORE_DIR = os.path.join(script_dir, "..", "data", "scenario_results")
+
+SCENARIO_KEYS = ('num_doctors', 'num_nurses', 'arrival_rate', 'sim_time', 'engine', 'replications')
+
+
+def load_scenarios(path=DEFAULT_SCENARIO_FILE):
+    """
+    Reads a scenario file. Returns (scenarios, seed, baseline), where
+    scenarios maps each name to its resolved config (defaults applied).
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    defaults = spec.get('defaults', {})
+    scenarios = {}
+    for name, overrides in spec['scenarios'].items():
+        config = {**defaults, **overrides}
+        unknown = set(config) - set(SCENARIO_KEYS)
+        if unknown:
+            raise ValueError(f"Scenario '{name}' has unknown keys {sorted(unknown)}, expected {SCENARIO_KEYS}")
+        missing = {'num_doctors', 'num_nurses', 'replications'} - set(config)
+        if missing:
+            raise ValueError(f"Scenario '{name}' is missing {sorted(missing)}")
+        scenarios[name] = {**{k: DEFAULT_CONFIG[k] for k in ('arrival_rate', 'sim_time', 'engine')}, **config}
+    baseline = spec.get('baseline', next(iter(scenarios)))
+    if baseline not in scenarios:
+        raise ValueError(f"Baseline '{baseline}' is not one of the scenarios")
+    return scenarios, spec.get('seed', 0), baseline
+
+
+def config_hash(config, seed, data_path=DEFAULT_DATA_PATH):
+    """Identifies a scenario's results: resolved config, seed, model version and the input data's version."""
+    key = json.dumps({'config': config, 'seed': seed, 'model_version': MODEL_VERSION,
+                      'data_mtime': dataset_version(data_path)}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+class ScenarioStore:
+    """Per-scenario result files (<config hash>.npz) in one directory."""
+
+    def __init__(self, path=DEFAULT_STORE_DIR):
+        self.path = path
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.npz")
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def save(self, key, config, seed, metrics, histogram):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._file(key) + ".tmp.npz"
+        np.savez(tmp_path,
+                 meta=json.dumps({'config': config, 'seed': seed, 'model_version': MODEL_VERSION,
+                                  'metrics': list(metrics)}),
+                 values=np.array([metrics[m] for m in metrics], dtype=float),
+                 histogram_edges=histogram['edges'],
+                 histogram_counts=histogram['counts'])
+        os.replace(tmp_path, self._file(key))
+
+    def load(self, key):
+        """
+        Returns {'config', 'seed', 'metrics', 'means', 'ci95',
+        'wait_histogram'}; metrics holds one array per metric (one value per
+        replication).
+        """
+        with np.load(self._file(key), allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            metrics = dict(zip(meta['metrics'], data['values']))
+            histogram = {'edges': data['histogram_edges'], 'counts': data['histogram_counts']}
+        stats = {m: confidence_interval(v) for m, v in metrics.items()}
+        return {
+            'config': meta['config'],
+            'seed': meta['seed'],
+            'metrics': metrics,
+            'means': {m: float(s[0]) for m, s in stats.items()},
+            'ci95': {m: float(s[1]) for m, s in stats.items()},
+            'wait_histogram': histogram,
+        }
+
+
+def _scalar_metrics(result):
+    return [k for k, v in result.items() if isinstance(v, (int, float, np.integer, np.floating))]
+
+
+def _collect(results):
+    # Per-replication results of one scenario -> metric arrays + pooled wait histogram
+    names = _scalar_metrics(results[0])
+    metrics = {m: np.array([r[m] for r in results], dtype=float) for m in names}
+    histogram = {
+        'edges': results[0]['Wait Time Histogram']['edges'],
+        'counts': np.sum([r['Wait Time Histogram']['counts'] for r in results], axis=0),
+    }
+    return metrics, histogram
+
+
+def sweep(path=DEFAULT_SCENARIO_FILE, store=None, workers=None, force=False, verbose=True, result_store=None):
+    """
+    Runs every scenario of the file whose results are not stored yet, loading
+    replications kept in result_store (a ResultStore) instead of simulating
+    them. Returns {name: stored results} for all scenarios, plus the baseline
+    name.
+    """
+    store = store or ScenarioStore()
+    scenarios, seed, baseline = load_scenarios(path)
+    keys = {name: config_hash(config, seed) for name, config in scenarios.items()}
+    pending = [name for name in scenarios if force or keys[name] not in store]
+
+    tasks = []
+    for name in pending:
+        config = scenarios[name]
+        run_config = {**DEFAULT_CONFIG, **{k: v for k, v in config.items() if k != 'replications'}, 'traces': False}
+        for r in range(config['replications']):
+            # Same child seed for replication r of every scenario: common random numbers
+            tasks.append((name, run_config, np.random.SeedSequence(seed, spawn_key=(r,))))
+    if verbose:
+        print(f"{len(scenarios) - len(pending)} scenarios up to date, running {len(pending)} "
+              f"({len(tasks)} replications)")
+
+    if tasks:
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        configs, seeds = [t[1] for t in tasks], [t[2] for t in tasks]
+        if workers <= 1:
+            results = [_run_replication(c, s, result_store) for c, s in zip(configs, seeds)]
+        else:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = list(get_pool(workers).map(_run_replication, configs, seeds, [result_store] * len(tasks),
+                                                 chunksize=chunksize))
+        for name in pending:
+            metrics, histogram = _collect([res for t, res in zip(tasks, results) if t[0] == name])
+            store.save(keys[name], scenarios[name], seed, metrics, histogram)
+
+    return {name: store.load(keys[name]) for name in scenarios}, baseline
+
+
+def paired_difference(results, name, baseline, metric='Average Wait Time (min)'):
+    """
+    Mean and 95% half-width of (scenario - baseline) over paired
+    replications, using the replications both scenarios have.
+    """
+    a, b = results[name]['metrics'][metric], results[baseline]['metrics'][metric]
+    n = min(len(a), len(b))
+    mean, half_width = confidence_interval(a[:n] - b[:n])
+    return float(mean), float(half_width)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scenarios declared in a scenario file.")
+    parser.add_argument("scenarios", nargs="?", default=DEFAULT_SCENARIO_FILE)
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-run scenarios even if stored")
+    parser.add_argument("--no-result-store", action="store_true", help="simulate every replication, ignoring stored runs")
+    args = parser.parse_args()
+
+    result_store = None if args.no_result_store else ResultStore()
+    results, baseline = sweep(args.scenarios, ScenarioStore(args.store), args.workers, args.force,
+                              result_store=result_store)
+    metric = 'Average Wait Time (min)'
+    for name, res in results.items():
+        line = f"{name}: {res['means'][metric]:.2f} ± {res['ci95'][metric]:.2f} min"
+        if name != baseline:
+            diff, hw = paired_difference(results, name, baseline, metric)
+            line += f"  (vs baseline: {diff:+.2f} ± {hw:.2f})"
+        print(line)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from scripts.arrival_profile import DAY_MINUTES
+
+# -------------------------------
+# Shift-based staffing
+# -------------------------------
+# A ShiftSchedule gives the number of doctors and nurses on duty by clock time,
+# repeating every period (a day by default). Both engines change resource
+# capacity at the shift boundaries inside one run: staff going off duty finish
+# the patient they are seeing, and no new patient is started while more
+# servers are busy than are on duty. Week-long runs therefore need neither a
+# restart per shift nor a resource per shift.
+
+RESOURCES = ('doctor', 'nurse')
+
+
+class ShiftSchedule:
+    """
+    Staffing by time of day. shifts is a list of (start minute, doctors,
+    nurses), e.g. [(7 * 60, 4, 6), (19 * 60, 2, 3)]; each shift lasts until
+    the next one starts, and the last one wraps around to the first.
+    """
+
+    def __init__(self, shifts, period=DAY_MINUTES):
+        shifts = sorted((float(start), int(doctors), int(nurses)) for start, doctors, nurses in shifts)
+        if not shifts:
+            raise ValueError("A shift schedule needs at least one shift")
+        for start, doctors, nurses in shifts:
+            if not 0 <= start < period:
+                raise ValueError(f"Shift start {start} is outside [0, {period})")
+            if doctors < 1 or nurses < 1:
+                raise ValueError(f"Every shift needs at least one doctor and one nurse, got {doctors} and {nurses}")
+        self.shifts = shifts
+        self.period = period
+        self.starts = np.array([s[0] for s in shifts])
+        self.staff = {
+            'doctor': np.array([s[1] for s in shifts]),
+            'nurse': np.array([s[2] for s in shifts]),
+        }
+
+    def capacity(self, resource, t):
+        """Servers of resource on duty at clock minute t."""
+        # Before the first shift start of the period the previous day's last shift is on
+        idx = np.searchsorted(self.starts, np.mod(t, self.period), side='right') - 1
+        return self.staff[resource][idx]
+
+    def changes(self, resource, sim_time, start_minute=0):
+        """
+        (times, capacities) for a run of sim_time minutes starting at clock
+        minute start_minute: the capacity from time 0 on, then every change
+        before sim_time.
+        """
+        first = np.floor(start_minute / self.period) * self.period
+        periods = np.arange(int(np.ceil(sim_time / self.period)) + 1)
+        boundaries = (first + self.period * periods[:, None] + self.starts[None, :] - start_minute).ravel()
+        shift = np.tile(np.arange(len(self.starts)), len(periods))
+        inside = (boundaries > 0) & (boundaries < sim_time)
+        times = np.concatenate([[0.0], boundaries[inside]])
+        capacities = np.concatenate([[self.capacity(resource, start_minute)], self.staff[resource][shift[inside]]])
+        keep = np.concatenate([[True], capacities[1:] != capacities[:-1]])
+        return times[keep], capacities[keep]
@@ -1,84 +1,272 @@
 import os
+import sys
+import heapq
+import itertools
 import simpy
 import numpy as np
-import pandas as pd
 
-def run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time=240):
+# Add project root to sys.path so this module also works when run from scripts/
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from scripts.parameter_store import DEFAULT_DATA_PATH, get_class_parameters, get_service_means
+from scripts.event_kernel import run_kernel_simulation
+from scripts.instrumentation import count, instrumentation, timer
+from scripts.numpy_engine import run_numpy_simulation
+from scripts.random_streams import RandomStreams, category_edges
+from scripts.stats_collector import StatsCollector
+
+# 'simpy': one generator process per patient; 'numpy': batched queue recursion;
+# 'kernel': the SimPy model on a minimal event kernel (see event_kernel)
+ENGINES = ('simpy', 'numpy', 'kernel')
+
+# Bump when a change to the model alters simulated results, so caches of
+# earlier results (e.g. EREnv's RewardCache) are not reused
+MODEL_VERSION = 4
+
+# Urgency classes, highest priority first. urgency=None keeps one patient class;
+# 'fifo' draws a class per patient (with per-class service times) but doctors
+# still see patients in arrival order; 'priority' serves the doctor queue by
+# urgency; 'preemptive' also lets critical patients take over a doctor from a
+# less urgent one, who resumes later.
+URGENCY_LEVELS = ('Critical', 'High', 'Medium', 'Low')
+URGENCY_MODES = ('fifo', 'priority', 'preemptive')
+
+
+class MonitoredResource(simpy.Resource):
+    """
+    simpy.Resource that reports its queue length and busy servers to a
+    StatsCollector whenever a request is granted or a server is released.
+    """
+
+    def __init__(self, env, capacity, collector, name):
+        super().__init__(env, capacity=capacity)
+        self.collector = collector
+        self.name = name
+        collector.add_resource(name, capacity)
+
+    def _trigger_put(self, get_event):
+        super()._trigger_put(get_event)
+        self.collector.record_resource(self.name, self._env.now, len(self.put_queue), len(self.users))
+
+    def _trigger_get(self, put_event):
+        super()._trigger_get(put_event)
+        self.collector.record_resource(self.name, self._env.now, len(self.put_queue), len(self.users))
+
+    def set_capacity(self, capacity):
+        """
+        Changes the number of servers mid-run. When it shrinks, busy servers
+        over the new capacity finish their current patient first.
+        """
+        added = capacity - self._capacity
+        self._capacity = capacity
+        self.collector.record_capacity(self.name, self._env.now, capacity)
+        # Each _trigger_put grants at most one waiting request
+        for _ in range(added):
+            self._trigger_put(None)
+
+
+class HeapQueue:
+    """
+    Put queue for simpy's PriorityResource ordered by request key on a heap:
+    O(log n) per request instead of SortedQueue's full re-sort on every
+    append. Ties keep arrival order, as with the stable sort. Resources only
+    ever read and pop the head; remove() (a cancelled request) is O(n).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __getitem__(self, idx):
+        if idx != 0:
+            raise IndexError("HeapQueue only exposes its head")
+        return self._heap[0][2]
+
+    def append(self, event):
+        heapq.heappush(self._heap, (event.key, next(self._seq), event))
+
+    def pop(self, idx=0):
+        if idx != 0:
+            raise IndexError("HeapQueue only pops its head")
+        return heapq.heappop(self._heap)[2]
+
+    def remove(self, event):
+        self._heap = [entry for entry in self._heap if entry[2] is not event]
+        heapq.heapify(self._heap)
+
+
+class MonitoredPriorityResource(MonitoredResource, simpy.PreemptiveResource):
+    """
+    MonitoredResource serving requests by priority from a HeapQueue; requests
+    made with preempt=True may preempt a less urgent user.
+    """
+
+    PutQueue = HeapQueue
+
+
+def run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time=240, data_path=DEFAULT_DATA_PATH,
+                      engine='simpy', seed=None, traces=False, collector=None, arrival_profile=None, shifts=None,
+                      start_minute=0, urgency=None):
     """
     Runs a discrete-event simulation of an emergency room.
-    Returns key metrics and lists of wait times and queue lengths.
+    Returns key metrics and streaming wait/queue statistics; with traces=True
+    also the raw wait times and queue lengths as NumPy arrays.
+    seed (int or numpy SeedSequence) makes the run reproducible; scenarios run
+    with the same seed share common random numbers.
+    collector replaces the default StatsCollector (e.g. with other quantiles).
+    arrival_profile (an ArrivalProfile, see fit_arrival_profile) makes the
+    arrival rate vary over the week around the mean arrival_rate; shifts (a
+    ShiftSchedule) replaces num_doctors / num_nurses with staffing by time of
+    day. start_minute is the run's start in minutes since Monday 00:00.
+    urgency (one of URGENCY_MODES) gives every patient an urgency level with
+    that level's service times, and adds per-level wait statistics.
     """
-    # Set up paths
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_folder = os.path.join(script_dir, "..", "data")
-    data_path = os.path.join(data_folder, "cleaned_er_data.csv")
-
-    # Load data
-    df = pd.read_csv(data_path)
-    REGISTRATION_MEAN = df['Time_to_Registration'].mean()
-    TRIAGE_MEAN = df['Time_to_Triage'].mean()
-    MEDICAL_PRO_MEAN = df['Time_to_Medical_Professional'].mean()
-
-    # Storage for results
-    wait_times = []
-    queue_lengths = []
-    time_points = []
-    resource_usage = {'doctor': 0, 'nurse': 0}
-
-    # Define processes
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if urgency is not None and urgency not in URGENCY_MODES:
+        raise ValueError(f"Unknown urgency mode '{urgency}', expected None or one of {URGENCY_MODES}")
+
+    # Service-time parameters (parsed once per process, see parameter_store);
+    # the sidecar spares new worker processes the CSV parse and pandas import
+    with timer('parameters'):
+        means = get_service_means(data_path, use_sidecar=True)
+        classes = None
+        if urgency is not None:
+            shares, class_means = get_class_parameters('urgency', URGENCY_LEVELS, data_path, use_sidecar=True)
+            classes = {'edges': category_edges(shares), 'means': class_means}
+    streams = RandomStreams(seed)
+    if collector is None:
+        expected_patients = int(arrival_rate * sim_time / 60 * 1.2) + 16
+        collector = StatsCollector(keep_traces=traces, expected_patients=expected_patients)
+    if urgency is not None:
+        collector.add_classes(URGENCY_LEVELS)
+
+    with timer(f'simulate/{engine}'):
+        if engine == 'numpy':
+            run_numpy_simulation(num_doctors, num_nurses, arrival_rate, sim_time, means, streams, collector,
+                                 arrival_profile, shifts, start_minute, classes, urgency)
+        elif engine == 'kernel':
+            run_kernel_simulation(num_doctors, num_nurses, arrival_rate, sim_time, means, streams, collector,
+                                  arrival_profile, shifts, start_minute, classes, urgency)
+        else:
+            _run_simpy_simulation(num_doctors, num_nurses, arrival_rate, sim_time, means, streams, collector,
+                                  arrival_profile, shifts, start_minute, classes, urgency)
+
+    with timer('summarize'):
+        results = summarize_results(collector, sim_time)
+    if instrumentation.enabled:
+        count('runs')
+        count('sim_minutes', sim_time)
+        count('patients_treated', results['Total Patients Treated'])
+        for name, draws in streams.draws().items():
+            count(f'draws/{name}', draws)
+    return results
+
+
+def _run_simpy_simulation(num_doctors, num_nurses, arrival_rate, sim_time, means, streams, collector,
+                          arrival_profile=None, shifts=None, start_minute=0, classes=None, urgency=None):
+    REGISTRATION_MEAN = means['registration']
+    TRIAGE_MEAN = means['triage']
+    MEDICAL_PRO_MEAN = means['consultation']
+
+    # Define processes (wait times, queues and busy servers go to the collector)
     def patient(env, nurses, doctors):
         arrival = env.now
+        # Service requirements are drawn on arrival so that patient k gets the
+        # same durations in every scenario run with the same seed
+        if classes is None:
+            level = None
+            registration = streams['registration'].exponential(REGISTRATION_MEAN)
+            triage = streams['triage'].exponential(TRIAGE_MEAN)
+            consultation = streams['consultation'].exponential(MEDICAL_PRO_MEAN)
+        else:
+            level = streams['urgency'].category(classes['edges'])
+            registration = streams['registration'].exponential(classes['means']['registration'][level])
+            triage = streams['triage'].exponential(classes['means']['triage'][level])
+            consultation = streams['consultation'].exponential(classes['means']['consultation'][level])
         with nurses.request() as req:
             yield req
-            duration = np.random.exponential(REGISTRATION_MEAN)
-            yield env.timeout(duration)
-            resource_usage['nurse'] += duration
+            yield env.timeout(registration)
         with nurses.request() as req:
             yield req
-            duration = np.random.exponential(TRIAGE_MEAN)
-            yield env.timeout(duration)
-            resource_usage['nurse'] += duration
-        with doctors.request() as req:
-            yield req
-            duration = np.random.exponential(MEDICAL_PRO_MEAN)
-            yield env.timeout(duration)
-            resource_usage['doctor'] += duration
-        wait_times.append(env.now - arrival)
+            yield env.timeout(triage)
+        if urgency in ('priority', 'preemptive'):
+            yield from consult_by_urgency(env, doctors, level, consultation)
+        else:
+            with doctors.request() as req:
+                yield req
+                yield env.timeout(consultation)
+        collector.record_wait(env.now - arrival, None if level is None else URGENCY_LEVELS[level])
+
+    def consult_by_urgency(env, doctors, level, consultation):
+        # The level index is the priority; only critical patients preempt
+        preempt = urgency == 'preemptive' and level == 0
+        remaining = consultation
+        while True:
+            with doctors.request(priority=level, preempt=preempt) as req:
+                yield req
+                started = env.now
+                try:
+                    yield env.timeout(remaining)
+                    return
+                except simpy.Interrupt:
+                    # Preempted: queue again for the rest of the consultation
+                    remaining -= env.now - started
 
     def generate_patients(env, nurses, doctors):
+        if arrival_profile is not None:
+            # Time-varying rate: the arrival times are sampled up front in blocks
+            for arrival in arrival_profile.arrival_times(arrival_rate, sim_time, streams['arrivals'], start_minute):
+                yield env.timeout(arrival - env.now)
+                env.process(patient(env, nurses, doctors))
+            return
         while True:
-            inter_arrival = np.random.exponential(60 / arrival_rate)
+            inter_arrival = streams['arrivals'].exponential(60 / arrival_rate)
             yield env.timeout(inter_arrival)
             env.process(patient(env, nurses, doctors))
 
-    def monitor(env, nurses, doctors):
-        while True:
-            total_queue = len(nurses.queue) + len(doctors.queue)
-            time_points.append(env.now)
-            queue_lengths.append(total_queue)
-            yield env.timeout(5)
+    def change_shifts(env, resource, times, capacities):
+        for t, capacity in zip(times[1:].tolist(), capacities[1:].tolist()):
+            yield env.timeout(t - env.now)
+            resource.set_capacity(capacity)
 
     # Set up environment
     env = simpy.Environment()
-    nurses = simpy.Resource(env, capacity=num_nurses)
-    doctors = simpy.Resource(env, capacity=num_doctors)
+    doctor_resource = MonitoredPriorityResource if urgency in ('priority', 'preemptive') else MonitoredResource
+    if shifts is None:
+        nurses = MonitoredResource(env, num_nurses, collector, 'nurse')
+        doctors = doctor_resource(env, num_doctors, collector, 'doctor')
+    else:
+        nurse_shifts = shifts.changes('nurse', sim_time, start_minute)
+        doctor_shifts = shifts.changes('doctor', sim_time, start_minute)
+        nurses = MonitoredResource(env, int(nurse_shifts[1][0]), collector, 'nurse')
+        doctors = doctor_resource(env, int(doctor_shifts[1][0]), collector, 'doctor')
+        env.process(change_shifts(env, nurses, *nurse_shifts))
+        env.process(change_shifts(env, doctors, *doctor_shifts))
     env.process(generate_patients(env, nurses, doctors))
-    env.process(monitor(env, nurses, doctors))
 
     env.run(until=sim_time)
+    # Events scheduled (simpy numbers them) minus those still pending
+    count('simpy/events', next(env._eid) - len(env._queue))
+
 
-    # Metrics
-    avg_wait = np.mean(wait_times) if wait_times else 0
-    throughput = len(wait_times)
-    doctor_util = resource_usage['doctor'] / (sim_time * num_doctors) if sim_time and num_doctors else 0
-    nurse_util = resource_usage['nurse'] / (sim_time * num_nurses) if sim_time and num_nurses else 0
+def summarize_results(collector, sim_time):
+    """Builds the result dict shared by all engines."""
+    # Metrics (utilization is time-weighted busy servers, truncated at sim_time)
+    avg_wait = collector.waits.mean if collector.waits.count else 0
+    throughput = collector.waits.count
+    doctor_util = collector.utilization('doctor', sim_time) if sim_time else 0
+    nurse_util = collector.utilization('nurse', sim_time) if sim_time else 0
 
     return {
         'Average Wait Time (min)': round(avg_wait, 2),
         'Total Patients Treated': throughput,
         'Doctor Utilization (%)': round(doctor_util * 100, 2),
         'Nurse Utilization (%)': round(nurse_util * 100, 2),
-        'All Wait Times': wait_times,
-        'Time Points': time_points,
-        'Queue Lengths': queue_lengths
+        **collector.summary(sim_time),
     }
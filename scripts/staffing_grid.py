@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from concurrent.futures import as_completed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.simulation_backend import MODEL_VERSION, run_er_simulation
+from scripts.replications import SCALAR_METRICS, confidence_interval, get_pool
+from scripts.parameter_store import dataset_version
+
+# -------------------------------
+# Precomputed staffing-response grid
+# -------------------------------
+# An offline sweep over (doctors, nurses, arrival rate, sim time) stores the
+# per-replication scalar metrics of every cell in one memory-mapped float32
+# array of shape (doctors, nurses, arrival rates, sim times, replications,
+# metrics); NaN marks replications not simulated yet. The sweep is resumable:
+# re-running it only simulates missing replications, and widening an axis or
+# asking for more replications copies finished cells into the new layout.
+# Replication r of every cell uses the same seed (common random numbers), which
+# keeps the surface smooth for interpolation. The grid records the engine,
+# model version and dataset version it was simulated with; a grid from an
+# older model or dataset is stale and is neither extended nor served.
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+DEFAULT_GRID_PATH = os.path.join(data_dir, "staffing_grid.npy")
+
+# Dashboard sidebar ranges, on a coarse lattice for the continuous axes
+DOCTORS = list(range(1, 11))
+NURSES = list(range(1, 11))
+ARRIVAL_RATES = [1, 2, 4, 6, 8, 10, 15, 20, 25, 30, 40, 50, 60]
+SIM_TIMES = [60, 120, 180, 240, 300, 360, 420, 480]
+AXES = ('doctors', 'nurses', 'arrival_rates', 'sim_times')
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _read_meta(path):
+    meta_path = _meta_path(path)
+    if not (os.path.exists(path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def _open_grid(path, axes, replications, engine, seed):
+    """
+    Opens the grid for writing with at least the given axes and replication
+    count, migrating finished cells from an existing file if its layout differs.
+    """
+    meta = _read_meta(path)
+    data_version = dataset_version()
+    compatible = meta is not None and (meta['engine'], meta['seed'], meta['model_version'], meta.get('data_version')) \
+        == (engine, seed, MODEL_VERSION, data_version)
+
+    if compatible:
+        axes = {a: sorted(set(meta['axes'][a]) | set(axes[a])) for a in AXES}
+        replications = max(replications, meta['replications'])
+        if axes == meta['axes'] and replications == meta['replications']:
+            return np.load(path, mmap_mode='r+'), meta
+
+    new_meta = {
+        'axes': axes,
+        'replications': replications,
+        'metrics': SCALAR_METRICS,
+        'engine': engine,
+        'seed': seed,
+        'model_version': MODEL_VERSION,
+        'data_version': data_version,
+    }
+    shape = tuple(len(axes[a]) for a in AXES) + (replications, len(SCALAR_METRICS))
+    tmp_path = path + ".tmp"
+    values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+    values[:] = np.nan
+
+    if compatible:
+        old = np.load(path, mmap_mode='r')
+        index = [[axes[a].index(v) for v in meta['axes'][a]] for a in AXES]
+        block = np.full(old.shape[:4] + shape[4:], np.nan, dtype=np.float32)
+        block[..., :old.shape[4], :] = old
+        values[np.ix_(*index)] = block
+        del old
+    values.flush()
+    del values
+
+    os.replace(tmp_path, path)
+    with open(_meta_path(path), 'w') as f:
+        json.dump(new_meta, f, indent=2)
+    return np.load(path, mmap_mode='r+'), new_meta
+
+
+def _simulate_cells(cells, seed, engine):
+    out = []
+    for index, (num_doctors, num_nurses, arrival_rate, sim_time), reps in cells:
+        rows = np.empty((len(reps), len(SCALAR_METRICS)), dtype=np.float32)
+        for j, r in enumerate(reps):
+            result = run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time, engine=engine,
+                                       seed=np.random.SeedSequence(seed, spawn_key=(r,)))
+            rows[j] = [result[m] for m in SCALAR_METRICS]
+        out.append((index, reps, rows))
+    return out
+
+
+def sweep(doctors=DOCTORS, nurses=NURSES, arrival_rates=ARRIVAL_RATES, sim_times=SIM_TIMES,
+          replications=20, engine='numpy', seed=0, workers=None, path=DEFAULT_GRID_PATH, verbose=True):
+    """
+    Fills every requested cell of the grid up to the given number of
+    replications. Already simulated replications are never redone.
+    Returns the number of simulations run.
+    """
+    requested = dict(zip(AXES, (list(doctors), list(nurses), list(arrival_rates), list(sim_times))))
+    values, meta = _open_grid(path, requested, replications, engine, seed)
+    axes = meta['axes']
+
+    # One job per (doctors, nurses) pair, covering its missing replications
+    jobs = []
+    for di, d in enumerate(axes['doctors']):
+        for ni, n in enumerate(axes['nurses']):
+            if d not in requested['doctors'] or n not in requested['nurses']:
+                continue
+            cells = []
+            for ai, a in enumerate(axes['arrival_rates']):
+                for ti, t in enumerate(axes['sim_times']):
+                    if a not in requested['arrival_rates'] or t not in requested['sim_times']:
+                        continue
+                    missing = np.flatnonzero(np.isnan(values[di, ni, ai, ti, :replications, 0]))
+                    if len(missing):
+                        cells.append(((di, ni, ai, ti), (d, n, a, t), missing.tolist()))
+            if cells:
+                jobs.append(cells)
+
+    total = sum(len(reps) for cells in jobs for _, _, reps in cells)
+    if verbose:
+        print(f"Grid {values.shape[:4]} x {values.shape[4]} replications: {total} simulations to run")
+
+    done = 0
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers <= 1:
+        results = (_simulate_cells(cells, seed, engine) for cells in jobs)
+    else:
+        pool = get_pool(workers)
+        results = (f.result() for f in as_completed([pool.submit(_simulate_cells, cells, seed, engine)
+                                                     for cells in jobs]))
+    for finished in results:
+        for index, reps, rows in finished:
+            values[index + (reps,)] = rows
+            done += len(reps)
+        # Flush per job so an interrupted sweep keeps its finished work
+        values.flush()
+        if verbose:
+            print(f"  {done}/{total} simulations")
+    return done
+
+
+class StaffingGrid:
+    """Read-only view of a precomputed grid with lookups and interpolation."""
+
+    def __init__(self, path=DEFAULT_GRID_PATH):
+        self.meta = _read_meta(path)
+        if self.meta is None:
+            raise FileNotFoundError(f"No staffing grid at {path}, run scripts/staffing_grid.py first")
+        self.values = np.load(path, mmap_mode='r')
+        self.axes = self.meta['axes']
+
+    @property
+    def stale(self):
+        """True if the model or the dataset changed since the sweep, so its results no longer apply."""
+        return (self.meta['model_version'], self.meta.get('data_version')) != (MODEL_VERSION, dataset_version())
+
+    def _samples(self, di, ni, ai, ti):
+        rows = np.asarray(self.values[di, ni, ai, ti])
+        return rows[~np.isnan(rows[:, 0])]
+
+    @staticmethod
+    def _bracket(axis, value):
+        # [(index, weight), ...] for linear interpolation, or None if out of range
+        if value < axis[0] or value > axis[-1]:
+            return None
+        hi = int(np.searchsorted(axis, value))
+        if axis[hi] == value:
+            return [(hi, 1.0)]
+        lo = hi - 1
+        w = (value - axis[lo]) / (axis[hi] - axis[lo])
+        return [(lo, 1.0 - w), (hi, w)]
+
+    def lookup(self, num_doctors, num_nurses, arrival_rate, sim_time, min_replications=10, engine=None):
+        """
+        Returns {'means', 'ci95', 'samples', 'interpolated', 'engine'} for the
+        configuration, interpolating linearly in arrival rate and sim time
+        between lattice points, or None if the grid is stale, was simulated
+        with another engine than the one asked for, or any needed cell is
+        missing or has fewer than min_replications results.
+        """
+        if self.stale or (engine is not None and engine != self.meta['engine']):
+            return None
+        if num_doctors not in self.axes['doctors'] or num_nurses not in self.axes['nurses']:
+            return None
+        di = self.axes['doctors'].index(num_doctors)
+        ni = self.axes['nurses'].index(num_nurses)
+        rate_bracket = self._bracket(self.axes['arrival_rates'], arrival_rate)
+        time_bracket = self._bracket(self.axes['sim_times'], sim_time)
+        if rate_bracket is None or time_bracket is None:
+            return None
+
+        means = np.zeros(len(SCALAR_METRICS))
+        ci95 = np.zeros(len(SCALAR_METRICS))
+        nearest = (0.0, None)
+        for ai, wa in rate_bracket:
+            for ti, wt in time_bracket:
+                samples = self._samples(di, ni, ai, ti)
+                if len(samples) < min_replications:
+                    return None
+                mean, half_width = confidence_interval(samples)
+                means += wa * wt * mean
+                ci95 += wa * wt * half_width
+                if wa * wt > nearest[0]:
+                    nearest = (wa * wt, samples)
+
+        return {
+            'means': dict(zip(SCALAR_METRICS, means.tolist())),
+            'ci95': dict(zip(SCALAR_METRICS, ci95.tolist())),
+            'samples': {m: nearest[1][:, i] for i, m in enumerate(SCALAR_METRICS)},
+            'interpolated': len(rate_bracket) * len(time_bracket) > 1,
+            'engine': self.meta['engine'],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the dashboard's staffing-response grid.")
+    parser.add_argument("--replications", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", default='numpy')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sweep(replications=args.replications, workers=args.workers, engine=args.engine, seed=args.seed)
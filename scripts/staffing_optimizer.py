@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.simulation_backend import run_er_simulation
+from scripts.replications import confidence_interval, get_pool
+
+# -------------------------------
+# Staffing selection by sequential ranking-and-selection
+# -------------------------------
+# Picking a (doctors, nurses) pair is a one-shot choice among at most 100
+# alternatives, so instead of training a policy we simulate the alternatives
+# directly with the fully sequential KN procedure (Kim & Nelson, 2001):
+# every surviving configuration gets n0 replications, then batches of more,
+# and a configuration is dropped as soon as its mean is worse than another
+# survivor's by more than a shrinking tolerance. With indifference zone delta
+# the returned configuration is within delta of the true best with probability
+# at least 1 - alpha. Replication r of every configuration uses the same seed
+# (common random numbers), which makes the pairwise differences KN screens on
+# much less noisy. Configurations over the optional staffing budget are never
+# simulated.
+
+DOCTORS = list(range(1, 11))
+NURSES = list(range(1, 11))
+DEFAULT_METRIC = 'Average Wait Time (min)'
+
+
+def _simulate(num_doctors, num_nurses, arrival_rate, sim_time, engine, seed, replications, metric):
+    # One configuration, a range of replications -> metric values
+    return np.array([
+        run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time, engine=engine,
+                          seed=np.random.SeedSequence(seed, spawn_key=(r,)))[metric]
+        for r in replications
+    ])
+
+
+def kn_parameters(k, n0, alpha):
+    """KN constant h^2 for k alternatives, first-stage size n0 and error rate alpha."""
+    if k < 2:
+        return 0.0
+    eta = 0.5 * ((2 * alpha / (k - 1)) ** (-2 / (n0 - 1)) - 1)
+    return 2 * eta * (n0 - 1)
+
+
+def select_staffing(arrival_rate=10, sim_time=240, doctors=DOCTORS, nurses=NURSES, budget=None,
+                    doctor_cost=1.0, nurse_cost=1.0, metric=DEFAULT_METRIC, delta=5.0, alpha=0.05, n0=20,
+                    batch=5, max_replications=500, engine='numpy', seed=0, workers=None, verbose=False):
+    """
+    Finds the staffing with the lowest expected metric (lower is better).
+    budget limits doctors * doctor_cost + nurses * nurse_cost; delta is the
+    indifference zone in metric units. Returns a dict with the best
+    configuration, its mean and 95% half-width, the survivors, replications
+    per configuration, and the simulation budget used.
+    """
+    start = time.perf_counter()
+    systems = [(d, n) for d in doctors for n in nurses
+               if budget is None or d * doctor_cost + n * nurse_cost <= budget]
+    if not systems:
+        raise ValueError(f"No staffing configuration fits the budget {budget}")
+    k = len(systems)
+    h2 = kn_parameters(k, n0, alpha)
+    samples = np.full((k, max(n0, max_replications)), np.nan)  # eliminated rows stop filling up
+    alive = np.ones(k, dtype=bool)
+    eliminated = []
+
+    workers = min(workers or os.cpu_count() or 1, k)
+    pool = get_pool(workers) if workers > 1 else None
+
+    def replicate(indices, first, last):
+        args = [(*systems[i], arrival_rate, sim_time, engine, seed, range(first, last), metric) for i in indices]
+        values = pool.map(_simulate, *zip(*args)) if pool else (_simulate(*a) for a in args)
+        for i, v in zip(indices, values):
+            samples[i, first:last] = v
+
+    # Stage 0: n0 replications each, and the variances of pairwise differences
+    replicate(range(k), 0, n0)
+    r = n0
+    first_stage = samples[:, :n0]
+    diff_var = np.var(first_stage[:, None, :] - first_stage[None, :, :], axis=2, ddof=1)
+
+    while True:
+        # Screening: drop i if some survivor l beats it by more than W_il(r);
+        # only survivors have r replications, so only their means are taken
+        means = np.full(k, np.nan)
+        means[alive] = samples[alive, :r].mean(axis=1)
+        tolerance = np.maximum(0.0, delta / (2 * r) * (h2 * diff_var / delta ** 2 - r))
+        beaten = (means[:, None] - means[None, :] > tolerance) & alive[None, :]
+        dropped = np.flatnonzero(alive & beaten.any(axis=1))
+        alive[dropped] = False
+        eliminated.extend((systems[i], r) for i in dropped)
+        if verbose:
+            print(f"  {r:>4} replications: {alive.sum():>3} of {k} configurations left")
+        if alive.sum() == 1 or r >= max_replications:
+            break
+        step = min(batch, max_replications - r)
+        replicate(np.flatnonzero(alive), r, r + step)
+        r += step
+
+    survivors = np.flatnonzero(alive)
+    best = survivors[np.argmin(means[survivors])]
+    mean, half_width = confidence_interval(samples[best, :r])
+    replications = {systems[i]: r for i in survivors}
+    replications.update(dict(eliminated))
+    total = sum(replications.values())
+    return {
+        'best': systems[best],
+        'mean': float(mean),
+        'ci95': float(half_width),
+        'cost': systems[best][0] * doctor_cost + systems[best][1] * nurse_cost,
+        'survivors': [systems[i] for i in survivors],
+        'converged': len(survivors) == 1,
+        'replications': replications,
+        'total_replications': total,
+        'simulated_minutes': total * sim_time,
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select the best staffing by sequential ranking-and-selection.")
+    parser.add_argument("--arrival-rate", type=float, default=10)
+    parser.add_argument("--sim-time", type=float, default=240)
+    parser.add_argument("--budget", type=float, default=None, help="max doctors*doctor_cost + nurses*nurse_cost")
+    parser.add_argument("--doctor-cost", type=float, default=1.0)
+    parser.add_argument("--nurse-cost", type=float, default=1.0)
+    parser.add_argument("--delta", type=float, default=5.0, help="indifference zone (minutes of wait)")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--max-replications", type=int, default=500)
+    parser.add_argument("--engine", default='numpy')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--ppo-steps", type=int, default=10000, help="PPO training steps to compare against")
+    args = parser.parse_args()
+
+    result = select_staffing(args.arrival_rate, args.sim_time, budget=args.budget, doctor_cost=args.doctor_cost,
+                             nurse_cost=args.nurse_cost, delta=args.delta, alpha=args.alpha,
+                             max_replications=args.max_replications, engine=args.engine, seed=args.seed,
+                             workers=args.workers, verbose=True)
+    doctors, nurses = result['best']
+    print(f"Best staffing: {doctors} doctors, {nurses} nurses (cost {result['cost']:.1f}), "
+          f"{DEFAULT_METRIC} {result['mean']:.2f} ± {result['ci95']:.2f}")
+    if not result['converged']:
+        print(f"Replication limit reached; statistically tied: {result['survivors']}")
+    ppo_minutes = args.ppo_steps * args.sim_time
+    print(f"Simulation budget: {result['total_replications']} replications, "
+          f"{result['simulated_minutes']:.0f} simulated minutes in {result['wall_time']:.1f}s "
+          f"({result['simulated_minutes'] / ppo_minutes:.1%} of {args.ppo_steps} PPO steps)")
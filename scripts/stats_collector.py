@@ -0,0 +1,465 @@
+import bisect
+import numpy as np
+
+# -------------------------------
+# Streaming statistics collection
+# -------------------------------
+# run_er_simulation feeds every completed wait time and queue-length
+# observation into a StatsCollector instead of appending to Python lists.
+# The collector keeps O(1)-memory summaries (Welford mean/variance, P^2
+# quantiles, a fixed-bin histogram, exact time-weighted queue length and busy
+# servers per resource); full traces are only kept when asked for, in
+# preallocated NumPy buffers. Quantiles are exact while few waits have been
+# seen (P^2 needs many observations to converge); a larger batch of waits
+# starts P^2 with its markers on the batch's exact order statistics.
+
+WAIT_QUANTILES = (0.5, 0.9, 0.95)
+CLASS_QUANTILE = 0.9  # per patient class (urgency level), next to the mean
+WAIT_HISTOGRAM_EDGES = np.arange(0, 730, 10)  # 10-minute bins up to 12 h; last bin is overflow
+TRACE_SAMPLE_INTERVAL = 5  # minutes between 'Queue Lengths' samples read off the event series
+EXACT_QUANTILE_SAMPLE = 100  # values kept for exact quantiles before P^2 takes over
+
+
+class RunningStats:
+    """Online count/mean/variance/min/max (Welford)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def push(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def push_many(self, values):
+        # Chan et al. merge of a batch summary into the running one
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with the P^2 algorithm (Jain & Chlamtac,
+    1985). The first EXACT_QUANTILE_SAMPLE values are kept sorted and give the
+    exact quantile; the next push() starts P^2 with its five markers placed on
+    that sample. A push_many() batch is merged into the exact sample; if that
+    takes it past EXACT_QUANTILE_SAMPLE values, P^2 starts with its markers on
+    the merged sample's exact order statistics. Memory stays constant either
+    way.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self._sample = []  # sorted values while exact, None once P^2 has taken over
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def _start_markers(self):
+        # Markers at the ranks P^2 would have moved them to after n values
+        sample = np.asarray(self._sample, dtype=float)
+        n = len(sample)
+        desired = [1 + (n - 1) * f for f in self._increments]
+        positions = [int(round(d)) for d in desired]
+        for i in range(1, 5):
+            positions[i] = min(max(positions[i], positions[i - 1] + 1), n - 4 + i)
+        self._heights = sample[np.array(positions) - 1].tolist()
+        self._positions = positions
+        self._desired = desired
+        self._sample = None
+
+    def push(self, x):
+        self.count += 1
+        if self._sample is not None:
+            if self.count <= max(EXACT_QUANTILE_SAMPLE, 5):
+                if not isinstance(self._sample, list):
+                    self._sample = self._sample.tolist()
+                bisect.insort(self._sample, x)
+                return
+            self._start_markers()
+
+        q, n, desired, increments = self._heights, self._positions, self._desired, self._increments
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        elif x < q[1]:
+            k = 0
+        elif x < q[2]:
+            k = 1
+        elif x < q[3]:
+            k = 2
+        else:
+            k = 3
+        for i in range(k + 1, 5):
+            n[i] += 1
+
+        # Adjust the three middle markers (the end markers' desired positions are never read)
+        for i in (1, 2, 3):
+            desired[i] += increments[i]
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def push_many(self, values, is_sorted=False):
+        values = np.asarray(values, dtype=float)
+        if self._sample is None:
+            # Already streaming: P^2 over the batch
+            for x in values.tolist():
+                self.push(x)
+            return
+        if not is_sorted:
+            values = np.sort(values)
+        if len(self._sample):
+            values = np.sort(np.concatenate([np.asarray(self._sample, dtype=float), values]))
+        self._sample = values
+        self.count = len(values)
+        if self.count > max(EXACT_QUANTILE_SAMPLE, 5):
+            # Too many to keep: P^2 starts with its markers on the exact order statistics
+            self._start_markers()
+
+    @property
+    def value(self):
+        if self.count == 0:
+            return 0.0
+        if self._sample is not None:
+            # np.quantile's default (linear) rule on the already sorted sample
+            sample = self._sample
+            h = (len(sample) - 1) * self.p
+            lo = int(h)
+            if lo + 1 == len(sample):
+                return float(sample[lo])
+            return float(sample[lo] + (h - lo) * (sample[lo + 1] - sample[lo]))
+        return self._heights[2]
+
+
+class Histogram:
+    """Fixed-bin counts; values beyond the last edge land in the overflow bin."""
+
+    def __init__(self, edges=WAIT_HISTOGRAM_EDGES):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges), dtype=np.int64)
+
+    def push(self, x):
+        self.counts[max(int(np.searchsorted(self.edges, x, side='right')) - 1, 0)] += 1
+
+    def push_many(self, values):
+        idx = np.searchsorted(self.edges, np.asarray(values, dtype=float), side='right') - 1
+        self.counts += np.bincount(np.maximum(idx, 0), minlength=len(self.edges))
+
+
+class TimeWeightedStat:
+    """
+    Time-weighted average and peak of a piecewise-constant level (e.g. queue
+    length). Levels held for zero time (several updates at one instant) do
+    not count towards the peak.
+    """
+
+    def __init__(self, start=0.0, level=0):
+        self.start = start
+        self.last_time = start
+        self.level = level
+        self.area = 0.0
+        self._peak = level
+
+    def update(self, time, level):
+        if time > self.last_time:
+            self.area += self.level * (time - self.last_time)
+            if self.level > self._peak:
+                self._peak = self.level
+            self.last_time = time
+        self.level = level
+
+    def update_many(self, times, levels):
+        times = np.asarray(times, dtype=float)
+        levels = np.asarray(levels)
+        if len(times) == 0:
+            return
+        durations = times - np.concatenate(([self.last_time], times[:-1]))
+        held = np.concatenate([[self.level], levels[:-1]])
+        self.area += float(np.dot(held.astype(float), durations))
+        if (durations > 0).any():
+            self._peak = max(self._peak, held[durations > 0].max().item())
+        self.last_time = float(times[-1])
+        self.level = levels[-1].item()
+
+    def mean(self, until):
+        area = self.area + self.level * (until - self.last_time)
+        return area / (until - self.start) if until > self.start else float(self.level)
+
+    def peak(self, until):
+        return max(self._peak, self.level) if until > self.last_time else self._peak
+
+
+class TraceBuffer:
+    """Append-only NumPy buffer, preallocated and grown by doubling."""
+
+    def __init__(self, capacity=1024, dtype=float):
+        self.data = np.empty(max(int(capacity), 16), dtype=dtype)
+        self.size = 0
+
+    def _reserve(self, size):
+        if size > len(self.data):
+            grown = np.empty(max(size, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def append(self, x):
+        if self.size == len(self.data):
+            self._reserve(self.size + 1)
+        self.data[self.size] = x
+        self.size += 1
+
+    def extend(self, values):
+        values = np.asarray(values)
+        self._reserve(self.size + len(values))
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def replace_last(self, x):
+        self.data[self.size - 1] = x
+
+    def array(self):
+        return self.data[:self.size]
+
+
+class ResourceTracker:
+    """
+    Exact queue length and busy-server count of one resource, updated at the
+    request/release events that change them (no polling). Capacity changes
+    (shifts) are tracked too, so utilization is busy time over staffed time.
+    """
+
+    def __init__(self, capacity, keep_traces=False, expected_events=1024):
+        self.capacity = capacity
+        self.keep_traces = keep_traces
+        self.queue = TimeWeightedStat()
+        self.busy = TimeWeightedStat()
+        self.on_duty = None  # time-weighted capacity, once it has changed
+        if keep_traces:
+            self.time_trace = TraceBuffer(expected_events)
+            self.queue_trace = TraceBuffer(expected_events, dtype=np.int64)
+            self.busy_trace = TraceBuffer(expected_events, dtype=np.int64)
+
+    def update(self, time, queue_length, busy):
+        if queue_length == self.queue.level and busy == self.busy.level:
+            return
+        self.queue.update(time, queue_length)
+        self.busy.update(time, busy)
+        if self.keep_traces:
+            if self.time_trace.size and self.time_trace.data[self.time_trace.size - 1] == time:
+                # Several changes at one instant: keep only the final state
+                self.queue_trace.replace_last(queue_length)
+                self.busy_trace.replace_last(busy)
+            else:
+                self.time_trace.append(time)
+                self.queue_trace.append(queue_length)
+                self.busy_trace.append(busy)
+
+    def update_many(self, times, queue_lengths, busy):
+        self.queue.update_many(times, queue_lengths)
+        self.busy.update_many(times, busy)
+        if self.keep_traces:
+            self.time_trace.extend(times)
+            self.queue_trace.extend(queue_lengths)
+            self.busy_trace.extend(busy)
+
+    def set_capacity(self, time, capacity):
+        if self.on_duty is None:
+            self.on_duty = TimeWeightedStat(level=self.capacity)
+        self.on_duty.update(time, capacity)
+        self.capacity = capacity
+
+    def set_capacity_many(self, times, capacities):
+        if len(times) == 0:
+            return
+        if self.on_duty is None:
+            self.on_duty = TimeWeightedStat(level=self.capacity)
+        self.on_duty.update_many(times, capacities)
+        self.capacity = self.on_duty.level
+
+    def utilization(self, until):
+        if self.on_duty is not None:
+            on_duty = self.on_duty.mean(until)
+            return self.busy.mean(until) / on_duty if on_duty else 0.0
+        return self.busy.mean(until) / self.capacity if self.capacity else 0.0
+
+
+class StatsCollector:
+    """
+    Collects wait-time, queue-length and utilization statistics for one
+    simulation run. Engines register each resource with add_resource() and
+    report its queue length / busy servers whenever they change; engines with
+    patient classes (urgency levels) register them with add_classes().
+    With keep_traces=True the raw wait times and per-resource event series are
+    also kept; expected_patients sizes the trace buffers up front.
+    """
+
+    def __init__(self, keep_traces=False, quantiles=WAIT_QUANTILES, histogram_edges=WAIT_HISTOGRAM_EDGES,
+                 expected_patients=1024):
+        self.keep_traces = keep_traces
+        self.expected_patients = expected_patients
+        self.waits = RunningStats()
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.histogram = Histogram(histogram_edges)
+        self.resources = {}
+        self.classes = {}  # class name -> (RunningStats, P2Quantile)
+        self.queue = TimeWeightedStat()  # all resources' queues combined
+        if keep_traces:
+            self.wait_trace = TraceBuffer(expected_patients)
+            self.queue_time_trace = TraceBuffer(4 * expected_patients)
+            self.queue_trace = TraceBuffer(4 * expected_patients, dtype=np.int64)
+
+    def add_resource(self, name, capacity):
+        tracker = ResourceTracker(capacity, self.keep_traces, expected_events=4 * self.expected_patients)
+        self.resources[name] = tracker
+        return tracker
+
+    def add_classes(self, names):
+        """Registers patient classes; record_wait(s) then also keep per-class statistics."""
+        for name in names:
+            self.classes[name] = (RunningStats(), P2Quantile(CLASS_QUANTILE))
+
+    def record_wait(self, wait, patient_class=None):
+        self.waits.push(wait)
+        for estimator in self.quantiles.values():
+            estimator.push(wait)
+        self.histogram.push(wait)
+        if patient_class is not None:
+            for stat in self.classes[patient_class]:
+                stat.push(wait)
+        if self.keep_traces:
+            self.wait_trace.append(wait)
+
+    def record_waits(self, waits, classes=None):
+        """Batch form of record_wait; classes holds each wait's class index (order of add_classes)."""
+        if classes is not None:
+            for code, stats in enumerate(self.classes.values()):
+                for stat in stats:
+                    stat.push_many(waits[classes == code])
+        self.waits.push_many(waits)
+        ordered = np.sort(waits)
+        for estimator in self.quantiles.values():
+            estimator.push_many(ordered, is_sorted=True)
+        self.histogram.push_many(waits)
+        if self.keep_traces:
+            self.wait_trace.extend(waits)
+
+    def record_resource(self, name, time, queue_length, busy):
+        """Event-driven update from an instrumented resource."""
+        self.resources[name].update(time, queue_length, busy)
+        total = sum(t.queue.level for t in self.resources.values())
+        if total != self.queue.level:
+            self.queue.update(time, total)
+            if self.keep_traces:
+                if self.queue_time_trace.size and self.queue_time_trace.data[self.queue_time_trace.size - 1] == time:
+                    self.queue_trace.replace_last(total)
+                else:
+                    self.queue_time_trace.append(time)
+                    self.queue_trace.append(total)
+
+    def record_capacity(self, name, time, capacity):
+        """A resource's number of servers changed (e.g. at a shift boundary)."""
+        self.resources[name].set_capacity(time, capacity)
+
+    def record_capacity_series(self, name, times, capacities):
+        """Batch form of record_capacity for all of a run's (sorted) capacity changes."""
+        self.resources[name].set_capacity_many(times, capacities)
+
+    def record_resource_series(self, name, times, queue_lengths, busy):
+        """Batch form of record_resource for one resource's whole (sorted) event series."""
+        self.resources[name].update_many(times, queue_lengths, busy)
+
+    def record_total_queue_series(self, times, queue_lengths):
+        """Combined queue length series, for engines that use record_resource_series."""
+        self.queue.update_many(times, queue_lengths)
+        if self.keep_traces:
+            self.queue_time_trace.extend(times)
+            self.queue_trace.extend(queue_lengths)
+
+    def utilization(self, name, until):
+        tracker = self.resources.get(name)
+        return tracker.utilization(until) if tracker else 0.0
+
+    def sampled_queue(self, sample_times):
+        """Combined queue length at each sample time, read off the event series."""
+        times = self.queue_time_trace.array()
+        levels = self.queue_trace.array()
+        if len(times) == 0:
+            return np.zeros(len(sample_times), dtype=np.int64)
+        idx = np.searchsorted(times, sample_times, side='right') - 1
+        return np.where(idx >= 0, levels[np.maximum(idx, 0)], 0)
+
+    def summary(self, sim_time):
+        """Result-dict entries for this run (see simulation_backend.summarize_results)."""
+        results = {
+            'Wait Time Std (min)': round(self.waits.std, 2),
+            'Max Wait Time (min)': round(self.waits.max, 2) if self.waits.count else 0,
+        }
+        for p, estimator in self.quantiles.items():
+            results[f'Wait Time P{round(p * 100)} (min)'] = round(estimator.value, 2)
+        for name, (stats, estimator) in self.classes.items():
+            results[f'{name} Average Wait Time (min)'] = round(stats.mean, 2) if stats.count else 0
+            results[f'{name} Wait Time P{round(estimator.p * 100)} (min)'] = round(estimator.value, 2)
+            results[f'{name} Patients Treated'] = stats.count
+        results['Avg Queue Length'] = round(self.queue.mean(sim_time), 2)
+        results['Peak Queue Length'] = self.queue.peak(sim_time)
+        for name, tracker in self.resources.items():
+            results[f'Avg {name.title()} Queue'] = round(tracker.queue.mean(sim_time), 2)
+            results[f'Peak {name.title()} Queue'] = tracker.queue.peak(sim_time)
+        results['Wait Time Histogram'] = {'edges': self.histogram.edges, 'counts': self.histogram.counts}
+        if self.keep_traces:
+            time_points = np.arange(0, sim_time, TRACE_SAMPLE_INTERVAL)
+            results['All Wait Times'] = self.wait_trace.array()
+            results['Time Points'] = time_points
+            results['Queue Lengths'] = self.sampled_queue(time_points)
+            results['Resource Series'] = {
+                name: {
+                    'times': tracker.time_trace.array(),
+                    'queue': tracker.queue_trace.array(),
+                    'busy': tracker.busy_trace.array(),
+                }
+                for name, tracker in self.resources.items()
+            }
+        return results
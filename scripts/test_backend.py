@@ -1,4 +1,331 @@
-from simulation_backend import run_er_simulation
+import os
+import sys
+import time
+import tempfile
+import traceback
+import numpy as np
 
-results = run_er_simulation(num_doctors=3, num_nurses=5, arrival_rate=10)
-print(results)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.simulation_backend import URGENCY_LEVELS, URGENCY_MODES, run_er_simulation
+from scripts.random_streams import RandomStreams
+from scripts.stats_collector import EXACT_QUANTILE_SAMPLE, P2Quantile, StatsCollector
+from scripts.arrival_profile import fit_arrival_profile
+from scripts.shift_schedule import ShiftSchedule
+from scripts.incremental_engine import IncrementalSimulation
+from scripts.hospital_network import run_network_simulation
+from scripts.instrumentation import instrumented
+from scripts.replications import run_replications
+from scripts.result_store import ResultStore
+from scripts.benchmark import MIN_SPEEDUPS, SPEEDUP_MIN_PATIENTS
+from rl_agent.er_env import EREnv
+
+# -------------------------------
+# Backend checks
+# -------------------------------
+# Every test_* function is one named check. Run this file directly (checks
+# run in definition order and failures are reported by name) or collect it
+# with pytest.
+
+WEEK = 7 * 24 * 60
+SHIFTS = ShiftSchedule([(7 * 60, 5, 7), (19 * 60, 3, 4)])
+
+
+def _assert_same_series(a, b, message, names=('nurse', 'doctor')):
+    for name in names:
+        for field in ('times', 'queue', 'busy'):
+            assert np.allclose(a['Resource Series'][name][field], b['Resource Series'][name][field]), \
+                f"{message} on the {name} {field} series"
+
+
+# -------------------------------
+# Reproducibility and engine sample paths
+# -------------------------------
+def test_same_seed_same_run():
+    for engine in ('simpy', 'numpy'):
+        a = run_er_simulation(3, 5, 10, engine=engine, seed=123, traces=True)
+        b = run_er_simulation(3, 5, 10, engine=engine, seed=123, traces=True)
+        assert np.array_equal(a['All Wait Times'], b['All Wait Times']), f"{engine} run is not reproducible"
+
+
+def test_engines_share_sample_path():
+    # With the same seed all engines see the same arrivals and service draws,
+    # so they should produce the same sample path
+    a = run_er_simulation(3, 5, 10, engine='simpy', seed=7, traces=True)
+    for engine in ('numpy', 'kernel'):
+        b = run_er_simulation(3, 5, 10, engine=engine, seed=7, traces=True)
+        assert np.allclose(a['All Wait Times'], b['All Wait Times']), f"{engine} diverges on the same random numbers"
+        assert np.array_equal(a['Queue Lengths'], b['Queue Lengths']), f"{engine} diverges on the same random numbers"
+        _assert_same_series(a, b, f"{engine} diverges")
+        for name in ('nurse', 'doctor'):
+            assert a[f'{name.title()} Utilization (%)'] <= 100
+
+
+# -------------------------------
+# Weekly arrival profile and shift staffing
+# -------------------------------
+def test_arrivals_follow_profile():
+    profile = fit_arrival_profile()
+    assert abs(profile.multipliers.mean() - 1) < 1e-9
+    counts = np.zeros(len(profile.multipliers))
+    for seed in range(20):
+        arrivals = profile.arrival_times(60, WEEK, RandomStreams(seed)['arrivals'])
+        counts += np.bincount((arrivals // 60).astype(int), minlength=len(counts))
+    expected = 20 * profile.hourly_rates(60)
+    assert np.abs(counts - expected).max() < 5 * np.sqrt(expected.max()), "arrivals do not follow the profile"
+
+
+def test_engines_agree_under_shifts():
+    profile = fit_arrival_profile()
+    kwargs = dict(sim_time=WEEK, seed=3, traces=True, arrival_profile=profile, shifts=SHIFTS, start_minute=6 * 60)
+    a = run_er_simulation(3, 5, 7, engine='simpy', **kwargs)
+    for engine in ('numpy', 'kernel'):
+        b = run_er_simulation(3, 5, 7, engine=engine, **kwargs)
+        assert np.allclose(a['All Wait Times'], b['All Wait Times']), f"{engine} diverges under shifts"
+        _assert_same_series(a, b, f"{engine} diverges under shifts")
+        for name in ('nurse', 'doctor'):
+            assert a[f'{name.title()} Utilization (%)'] == b[f'{name.title()} Utilization (%)']
+
+
+# -------------------------------
+# Urgency classes: priority and preemptive doctor queues
+# -------------------------------
+def test_engines_agree_with_urgency():
+    for urgency in URGENCY_MODES:
+        kwargs = dict(sim_time=2 * 24 * 60, seed=5, traces=True, urgency=urgency, shifts=SHIFTS)
+        a = run_er_simulation(3, 5, 7, engine='simpy', **kwargs)
+        for engine in ('numpy', 'kernel'):
+            b = run_er_simulation(3, 5, 7, engine=engine, **kwargs)
+            assert np.allclose(a['All Wait Times'], b['All Wait Times']), f"{engine} diverges with urgency={urgency}"
+            _assert_same_series(a, b, f"{engine} diverges with urgency={urgency}", names=('doctor',))
+            for level in URGENCY_LEVELS:
+                assert a[f'{level} Patients Treated'] == b[f'{level} Patients Treated']
+        assert sum(a[f'{level} Patients Treated'] for level in URGENCY_LEVELS) == a['Total Patients Treated']
+
+
+def test_urgency_moves_waiting_time():
+    # Serving by urgency moves waiting time from critical to low-urgency patients
+    fifo, priority, preemptive = (run_er_simulation(4, 5, 4, sim_time=WEEK, engine='numpy', seed=5, urgency=urgency)
+                                  for urgency in URGENCY_MODES)
+    assert preemptive['Critical Average Wait Time (min)'] < priority['Critical Average Wait Time (min)'] \
+        < fifo['Critical Average Wait Time (min)']
+    assert priority['Low Average Wait Time (min)'] > fifo['Low Average Wait Time (min)']
+
+
+# -------------------------------
+# Incremental engine
+# -------------------------------
+def test_incremental_matches_batch():
+    # Hourly steps give the batch engines' sample path
+    for seed in range(3):
+        batch = run_er_simulation(3, 5, 10, sim_time=24 * 60, seed=seed, traces=True)
+        sim = IncrementalSimulation(3, 5, 10, seed=seed)
+        waits = np.concatenate([sim.advance(60 * (hour + 1))['waits'] for hour in range(24)])
+        assert np.allclose(np.sort(waits), np.sort(batch['All Wait Times'])), "incremental engine diverges"
+
+
+def test_incremental_restore_replays():
+    sim = IncrementalSimulation(3, 5, 10, seed=2)
+    sim.advance(24 * 60)
+    sim.set_staffing(5, 7)
+    checkpoint = sim.checkpoint()
+    first = sim.advance(sim.now + 120)
+    sim.restore(checkpoint)
+    assert np.array_equal(sim.advance(sim.now + 120)['waits'], first['waits']), "restore does not replay the episode"
+
+
+def test_incremental_on_duty_after_staffing_cut():
+    # Staff still finishing a patient after a cut count as on duty
+    sim = IncrementalSimulation(5, 7, 10, seed=2)
+    sim.advance(24 * 60)
+    sim.set_staffing(1, 1)
+    cut = sim.advance(sim.now + 60)
+    for r in ('nurse', 'doctor'):
+        assert cut['on_duty'][r] > sim.capacity[r] and cut['busy'][r] <= cut['on_duty'][r]
+
+
+# -------------------------------
+# Hospital network: diversion, and results independent of the worker count
+# -------------------------------
+def test_network_diversion():
+    local = run_network_simulation(60, 24 * 60, diversion_threshold=8, workers=1, seed=1)
+    parallel = run_network_simulation(60, 24 * 60, diversion_threshold=8, workers=2, seed=1)
+    assert local == parallel, "network results depend on the number of workers"
+    hospitals = local['Hospitals'].values()
+    assert local['Patients Diverted'] > 0
+    assert sum(h['Patients Diverted In'] for h in hospitals) + local['Patients In Transfer'] \
+        == local['Patients Diverted']
+    assert sum(h['Total Patients Treated'] for h in hospitals) == local['Total Patients Treated']
+
+
+# -------------------------------
+# Result store: stored replications are reused exactly, queries skip the traces
+# -------------------------------
+def test_result_store_reuses_runs():
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = ResultStore(store_dir)
+        config = {'num_doctors': 3, 'num_nurses': 5, 'arrival_rate': 10, 'sim_time': 240, 'engine': 'numpy'}
+        first = run_replications(config, 4, workers=1, seed=5, store=store)
+        assert len(store) == 4
+        with instrumented() as instr:
+            again = run_replications(config, 4, workers=1, seed=5, store=store)
+        assert 'runs' not in instr.report()['counters'], "stored replications were simulated again"
+        assert np.array_equal(first['wait_times'], again['wait_times'], equal_nan=True)
+        pooled = run_replications(config, 4, workers=2, seed=5, store=store)  # the store pickles to the workers
+        assert first['means'] == again['means'] == pooled['means'] and len(store) == 4
+        stored = store.get({**config, 'traces': True}, np.random.SeedSequence(5).spawn(1)[0], traces=True)
+        assert isinstance(stored['All Wait Times'], np.memmap)
+        assert store.get({**config, 'sim_time': 480}, 5) is None
+        assert len(store.find(config, traces=True)) == 4 and not store.query(num_doctors=(4, 10))
+        run_replications({**config, 'num_doctors': 4}, 2, workers=1, seed=5, store=store)
+        groups = store.aggregate(by=('num_doctors',), arrival_rate=10)
+        assert [(g['num_doctors'], g['n']) for g in groups] == [(3, 4), (4, 2)]
+        assert abs(groups[0]['mean'] - first['means']['Average Wait Time (min)']) < 1e-9
+
+
+def test_env_stores_only_seeded_runs():
+    # Only the runs a later session can ask for again are stored
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = ResultStore(store_dir)
+        env = EREnv(engine='numpy', result_store=store)
+        env.reset()
+        env.step(np.array([2, 4]))
+        assert len(store) == 0, "an unseeded env filled the result store"
+        env.reset(seed=3)
+        env.step(np.array([2, 4]))
+        assert len(store) == 1
+
+
+# -------------------------------
+# Instrumentation: counters match the run and leave its results unchanged
+# -------------------------------
+def test_instrumentation_counts_run():
+    with instrumented() as instr:
+        a = run_er_simulation(3, 5, 10, engine='simpy', seed=11, traces=True)
+    report = instr.report()
+    b = run_er_simulation(3, 5, 10, engine='simpy', seed=11, traces=True)
+    assert np.array_equal(a['All Wait Times'], b['All Wait Times']), "instrumentation changes the run"
+    assert report['counters']['patients_treated'] == a['Total Patients Treated']
+    # One registration draw per arrival, and the arrivals stream is one ahead
+    assert report['counters']['draws/arrivals'] == report['counters']['draws/registration'] + 1
+    assert report['counters']['simpy/events'] > 0 and report['timers']['simulate/simpy']['calls'] == 1
+    # Disabled again after the block: b was not recorded
+    assert instr.report()['timers']['simulate/simpy']['calls'] == 1
+
+
+# -------------------------------
+# Streaming statistics vs exact values from the traces
+# -------------------------------
+def test_streaming_statistics_match_traces():
+    big = run_er_simulation(10, 10, 60, sim_time=WEEK, engine='numpy', seed=1, traces=True)
+    waits = big['All Wait Times']
+    assert abs(big['Average Wait Time (min)'] - waits.mean()) < 0.01
+    assert abs(big['Wait Time Std (min)'] - waits.std(ddof=1)) < 0.01
+    for p in (50, 90, 95):
+        exact = np.percentile(waits, p)
+        assert abs(big[f'Wait Time P{p} (min)'] - exact) < 0.05 * exact, f"P{p} estimate is off"
+    assert big['Wait Time Histogram']['counts'].sum() == big['Total Patients Treated']
+    lean = run_er_simulation(10, 10, 60, sim_time=WEEK, engine='numpy', seed=1)
+    assert 'All Wait Times' not in lean and lean['Average Wait Time (min)'] == big['Average Wait Time (min)']
+
+
+def test_small_run_quantiles_exact():
+    # A dashboard-sized run has a few dozen patients at most: its quantiles must be exact on every engine
+    for engine in ('simpy', 'numpy', 'kernel'):
+        small = run_er_simulation(3, 5, 10, engine=engine, seed=1, traces=True)
+        for p in (50, 90, 95):
+            exact = round(float(np.percentile(small['All Wait Times'], p)), 2)
+            assert small[f'Wait Time P{p} (min)'] == exact, f"{engine} P{p} is not exact for a small run"
+        assert small['Wait Time P50 (min)'] < small['Wait Time P90 (min)'] <= small['Max Wait Time (min)']
+
+
+def test_p2_handover():
+    # Streaming pushes hand over from the exact sample to P^2 without a jump
+    estimator = P2Quantile(0.9)
+    values = np.random.default_rng(0).exponential(60, 5000)
+    for x in values:
+        estimator.push(x)
+    assert abs(estimator.value - np.quantile(values, 0.9)) < 0.05 * np.quantile(values, 0.9)
+
+
+def test_batched_quantiles_bounded():
+    # Engines that record waits in batches keep the collector's quantile memory bounded
+    for engine in ('numpy', 'kernel'):
+        collector = StatsCollector()
+        run_er_simulation(10, 10, 60, sim_time=WEEK, engine=engine, seed=1, urgency='priority', collector=collector)
+        estimators = [*collector.quantiles.values(), *(estimator for _, estimator in collector.classes.values())]
+        assert collector.waits.count > 10 * EXACT_QUANTILE_SAMPLE
+        assert all(e._sample is None or len(e._sample) <= EXACT_QUANTILE_SAMPLE for e in estimators), \
+            f"{engine} keeps every wait for its quantiles"
+
+
+# -------------------------------
+# Engine agreement: SimPy vs vectorized NumPy
+# -------------------------------
+N_RUNS = 200
+METRICS = ['Average Wait Time (min)', 'Total Patients Treated', 'Doctor Utilization (%)', 'Nurse Utilization (%)',
+           'Wait Time P90 (min)', 'Avg Queue Length']
+SCENARIOS = [(3, 5, 10, 240), (2, 3, 12, 480), (1, 1, 2, 240)]
+
+
+def test_engines_agree_statistically():
+    for num_doctors, num_nurses, arrival_rate, sim_time in SCENARIOS:
+        samples = {}
+        timings = {}
+        # Disjoint seeds per engine so the comparison is between independent samples
+        for offset, engine in enumerate(('simpy', 'numpy')):
+            start = time.perf_counter()
+            runs = [run_er_simulation(num_doctors, num_nurses, arrival_rate, sim_time, engine=engine, seed=seed)
+                    for seed in range(offset * N_RUNS, (offset + 1) * N_RUNS)]
+            timings[engine] = time.perf_counter() - start
+            samples[engine] = {m: np.array([r[m] for r in runs]) for m in METRICS}
+
+        print(f"\nScenario doctors={num_doctors} nurses={num_nurses} rate={arrival_rate}/h time={sim_time}min")
+        for metric, a in samples['simpy'].items():
+            b = samples['numpy'][metric]
+            # Welch two-sample z statistic on the replication means
+            se = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+            z = abs(a.mean() - b.mean()) / se if se > 0 else 0.0
+            print(f"  {metric:<28} simpy={a.mean():9.2f}  numpy={b.mean():9.2f}  z={z:.2f}")
+            assert z < 4, f"Engines disagree on {metric} (z={z:.2f})"
+        print(f"  time per run: simpy={timings['simpy'] / N_RUNS * 1000:.2f} ms  "
+              f"numpy={timings['numpy'] / N_RUNS * 1000:.2f} ms  "
+              f"speedup={timings['simpy'] / timings['numpy']:.1f}x")
+
+
+# -------------------------------
+# Engine speed: the faster engines keep their lead on a realistic week
+# -------------------------------
+def test_engine_speedups():
+    # Small runs are dominated by per-run setup shared by every engine; the
+    # minimum speedups apply to runs of thousands of patients (see benchmark.py)
+    timings = {}
+    for engine in ('simpy', *MIN_SPEEDUPS):
+        run_er_simulation(27, 22, 30, sim_time=WEEK, engine=engine, seed=0)
+        best = np.inf
+        for seed in range(3):
+            start = time.perf_counter()
+            run = run_er_simulation(27, 22, 30, sim_time=WEEK, engine=engine, seed=seed)
+            best = min(best, time.perf_counter() - start)
+        timings[engine] = best
+    assert run['Total Patients Treated'] >= SPEEDUP_MIN_PATIENTS
+    for engine, minimum in MIN_SPEEDUPS.items():
+        speedup = timings['simpy'] / timings[engine]
+        print(f"\nWeek at 30/h, 27 doctors, 22 nurses: {engine} is {speedup:.1f}x faster than simpy")
+        assert speedup >= minimum, f"{engine} engine is only {speedup:.1f}x faster than simpy"
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith('test_') and callable(fn)]
+    failed = []
+    for name, fn in tests:
+        try:
+            fn()
+        except Exception:
+            traceback.print_exc()
+            failed.append(name)
+            print(f"FAILED {name}")
+        else:
+            print(f"ok {name}")
+    summary = f"\n{len(tests) - len(failed)} of {len(tests)} checks passed"
+    print(summary + (f"; failed: {', '.join(failed)}" if failed else ""))
+    sys.exit(1 if failed else 0)